@@ -0,0 +1 @@
+# 2PicMerge 性能基准 (python -m benchmarks)
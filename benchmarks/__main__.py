@@ -0,0 +1,7 @@
+import sys
+
+from .run import main
+
+# 进程池基准使用 spawn，子进程会以 __mp_main__ 重新导入本模块
+if __name__ == "__main__":
+    sys.exit(main())
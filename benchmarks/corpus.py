@@ -0,0 +1,89 @@
+import os
+import json
+import random
+import datetime
+
+from PIL import Image
+
+TAG_EXIF_IFD = 0x8769
+TAG_DATETIME_ORIGINAL = 0x9003
+
+
+# --------------------------
+# 合成测试图片
+# --------------------------
+def synthetic_image(size, seed=0):
+    """带噪声和渐变的 RGB 图 (纯色图的 JPEG 编解码快得不真实)"""
+    w, h = size
+    noise = Image.effect_noise((w, h), 24 + seed % 16)
+    gradient = Image.linear_gradient("L").resize((w, h))
+    radial = Image.radial_gradient("L").resize((w, h))
+    channels = [noise, gradient, radial]
+    rng = random.Random(seed)
+    rng.shuffle(channels)
+    return Image.merge("RGB", channels)
+
+
+def make_corpus(folder, count, size=(640, 480), png_ratio=0.0, exif=True,
+                done_ratio=0.0, seed=0):
+    """
+    在 folder 中生成 count 张图片并返回文件名列表 (按生成顺序)。
+    - png_ratio：PNG 所占比例，其余为 JPEG
+    - exif：JPEG 是否写入 DateTimeOriginal；拍摄时间和 mtime 都是打乱的，排序才有事可做
+    - done_ratio：这部分文件名会在 processed/ 中放同名空文件，模拟已处理的图片
+    同样参数的语料已存在时直接复用 (用 .corpus.json 标记)。
+    """
+    params = {"count": count, "size": list(size), "png_ratio": png_ratio,
+              "exif": exif, "done_ratio": done_ratio, "seed": seed}
+    marker = os.path.join(folder, ".corpus.json")
+    try:
+        with open(marker, encoding="utf-8") as f:
+            saved = json.load(f)
+        if saved["params"] == params:
+            return saved["names"]
+    except (OSError, ValueError, KeyError):
+        pass
+
+    os.makedirs(folder, exist_ok=True)
+    rng = random.Random(seed)
+    base_time = datetime.datetime(2024, 1, 1)
+    offsets = list(range(count))
+    rng.shuffle(offsets)
+
+    # 大量小图时复用几张底图，生成语料的时间不至于喧宾夺主
+    templates = [synthetic_image(size, seed + i) for i in range(min(count, 4))]
+
+    names = []
+    for i in range(count):
+        is_png = rng.random() < png_ratio
+        name = f"img{i:05d}.{'png' if is_png else 'jpg'}"
+        path = os.path.join(folder, name)
+        img = templates[i % len(templates)]
+        # 交替使用两种尺寸，拼接时需要缩放
+        if i % 2:
+            img = img.resize((size[0] * 3 // 4, size[1] * 3 // 4))
+        taken = base_time + datetime.timedelta(minutes=offsets[i])
+
+        if is_png:
+            img.save(path)
+        else:
+            options = {"quality": 90}
+            if exif:
+                tags = Image.Exif()
+                tags.get_ifd(TAG_EXIF_IFD)[TAG_DATETIME_ORIGINAL] = taken.strftime(
+                    "%Y:%m:%d %H:%M:%S")
+                options["exif"] = tags
+            img.save(path, **options)
+        stamp = taken.timestamp()
+        os.utime(path, (stamp, stamp))
+        names.append(name)
+
+    if done_ratio:
+        for sub in ("processed", "result"):
+            os.makedirs(os.path.join(folder, sub), exist_ok=True)
+        for name in rng.sample(names, int(count * done_ratio)):
+            open(os.path.join(folder, "processed", name), "wb").close()
+
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump({"params": params, "names": names}, f)
+    return names
@@ -0,0 +1,729 @@
+"""
+2PicMerge 性能基准
+
+    python -m benchmarks                  # 完整运行，结果写入 bench-<时间>.json
+    python -m benchmarks --quick          # 小规模，一两分钟内跑完
+    python -m benchmarks --only merge     # 只跑名称包含 merge 的项目
+    python -m benchmarks --compare a.json b.json   # 对比两次结果
+    python -m benchmarks --only startup --check    # 启动时间超出目标时返回非 0
+
+测试图片在临时目录中合成 (--workdir 可指定目录以便复用)。
+界面相关的项目使用 Qt 的 offscreen 平台，无需显示器。
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import datetime
+import tempfile
+import importlib.util
+import statistics
+import subprocess
+
+import PIL
+
+from .corpus import make_corpus
+
+# 仓库根目录 (子进程在这里运行，才能导入 twopicmerge)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# --------------------------
+# 计时
+# --------------------------
+class Runner:
+    def __init__(self, workdir, repeat=3, only=None, quick=False):
+        self.workdir = workdir
+        self.repeat = repeat
+        self.only = only or []
+        self.quick = quick
+        self.results = []
+
+    def wants(self, name):
+        return not self.only or any(key in name for key in self.only)
+
+    def corpus(self, label, **params):
+        folder = os.path.join(self.workdir, "corpus", label)
+        names = make_corpus(folder, **params)
+        return folder, names
+
+    def scratch(self, label):
+        """每次调用都返回一个清空的临时目录"""
+        path = os.path.join(self.workdir, "scratch", label)
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+        return path
+
+    def measure(self, name, func, params=None, setup=None, repeat=None, items=None,
+                check=None):
+        """
+        运行 func 若干次并记录耗时；setup 在每次计时前执行 (不计入)。
+        items：每次处理的数量 (图片数、组数)，会额外给出单个的平均耗时。
+        check(func 的返回值)：结果不对时返回错误信息，这一项记为失败 (不计时间)，
+        避免把没干活的代码测成“很快”。
+        """
+        if not self.wants(name):
+            return None
+        times = []
+        for _ in range(repeat or self.repeat):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            value = func()
+            times.append(time.perf_counter() - start)
+            error = check(value) if check else None
+            if error:
+                self.results.append({"name": name, "params": params or {}, "failed": error})
+                print(f"{name:<28} {_format_params(params):<44} 失败：{error}",
+                      file=sys.stderr, flush=True)
+                return None
+
+        result = {
+            "name": name,
+            "params": params or {},
+            "times": times,
+            "min": min(times),
+            "median": statistics.median(times),
+        }
+        if items:
+            result["items"] = items
+            result["per_item"] = result["median"] / items
+        self.results.append(result)
+
+        extra = f"  ({result['per_item'] * 1000:.2f} ms/个)" if items else ""
+        print(f"{name:<28} {_format_params(params):<44} "
+              f"median {result['median']:.4f}s  min {result['min']:.4f}s{extra}",
+              file=sys.stderr, flush=True)
+        return result
+
+    def skip(self, name, reason):
+        if self.wants(name):
+            self.results.append({"name": name, "skipped": reason})
+            print(f"{name:<28} 跳过：{reason}", file=sys.stderr, flush=True)
+
+
+def _format_params(params):
+    return " ".join(f"{k}={v}" for k, v in (params or {}).items())
+
+
+def _all_bytes(values):
+    """check：每一项都是非空的 bytes"""
+    if not values or not all(isinstance(v, bytes) and v for v in values):
+        return "有结果为空"
+    return None
+
+
+def _key(result):
+    return result["name"], json.dumps(result.get("params", {}), sort_keys=True)
+
+
+# --------------------------
+# 拼接
+# --------------------------
+def bench_merge(r):
+    from twopicmerge.inmemory import merge_pair
+    from twopicmerge.merge import CanvasPool, merge_images
+    from twopicmerge.lossless import find_jpegtran
+
+    resolutions = [(800, 600), (1600, 1200)] if r.quick else [(1600, 1200), (4000, 3000)]
+    out_dir = r.scratch("merge")
+    for size in resolutions:
+        for fmt in ("jpg", "png"):
+            folder, names = r.corpus(f"merge-{size[0]}x{size[1]}-{fmt}", count=2, size=size,
+                                     png_ratio=1.0 if fmt == "png" else 0.0)
+            a, b = (os.path.join(folder, n) for n in names)
+            data = []
+            for path in (a, b):
+                with open(path, "rb") as f:
+                    data.append(f.read())
+            for direction in ("horizontal", "vertical"):
+                params = {"size": f"{size[0]}x{size[1]}", "format": fmt, "direction": direction}
+                out = os.path.join(out_dir, "out.jpg")
+                r.measure("merge.pixel", lambda: merge_images(a, b, out, direction, lossless=False),
+                          params)
+                # 批量中的情形：同尺寸的各组复用一块画布
+                pool = CanvasPool()
+                r.measure("merge.pooled", lambda: merge_images(
+                    a, b, out, direction, lossless=False, canvas_pool=pool), params)
+                r.measure("merge.streaming", lambda: merge_images(
+                    a, b, out, direction, lossless=False, streaming=True), params)
+                # 输入 bytes、输出 bytes，不读写文件
+                r.measure("merge.memory", lambda: merge_pair(data[0], data[1], direction), params)
+
+    # 无损拼接需要尺寸对齐 MCU 的同规格 JPEG
+    if not find_jpegtran():
+        r.skip("merge.lossless", "没有找到支持 -drop 的 jpegtran")
+        return
+    for size in resolutions:
+        folder, names = r.corpus(f"lossless-{size[0]}x{size[1]}", count=3, size=size)
+        a, c = os.path.join(folder, names[0]), os.path.join(folder, names[2])
+        out = os.path.join(out_dir, "lossless.jpg")
+        r.measure("merge.lossless", lambda: merge_images(a, c, out, "horizontal"),
+                  {"size": f"{size[0]}x{size[1]}"})
+
+
+def bench_merge_mixed(r):
+    """两台相机分辨率不同：大图要缩小到小图的高度 (draft + reducing_gap 的收益)"""
+    from twopicmerge.merge import merge_images
+
+    big, small = ((1600, 1200), (400, 300)) if r.quick else ((4000, 3000), (1000, 750))
+    folder_big, names_big = r.corpus(f"merge-{big[0]}x{big[1]}-jpg", count=2, size=big,
+                                     png_ratio=0.0)
+    folder_small, names_small = r.corpus(f"merge-{small[0]}x{small[1]}-jpg", count=2,
+                                         size=small, png_ratio=0.0)
+    a = os.path.join(folder_big, names_big[0])
+    b = os.path.join(folder_small, names_small[0])
+    out = os.path.join(r.scratch("merge-mixed"), "out.jpg")
+    for resample in ("bicubic", "lanczos", "box"):
+        params = {"sizes": f"{big[0]}x{big[1]}+{small[0]}x{small[1]}", "resample": resample}
+        r.measure("merge.mixed", lambda: merge_images(
+            a, b, out, "horizontal", lossless=False, resample=resample), params)
+        r.measure("merge.mixed.no_gap", lambda: merge_images(
+            a, b, out, "horizontal", lossless=False, resample=resample, reducing_gap=None),
+            params)
+
+
+def bench_derivatives(r):
+    """
+    派生版本：一次拼接逐级缩小出几种尺寸 (derive.fanout)，
+    对照先拼接、再为每种尺寸重新打开结果从全尺寸缩小 (derive.reopen)。
+    """
+    from PIL import Image
+    from twopicmerge.derivatives import (derivative_options, derivative_path, derivative_size,
+                                         resolve_derivatives)
+    from twopicmerge.merge import merge_images
+
+    size = (1600, 1200) if r.quick else (4000, 3000)
+    folder, names = r.corpus(f"merge-{size[0]}x{size[1]}-jpg", count=2, size=size,
+                             png_ratio=0.0)
+    a, b = (os.path.join(folder, n) for n in names)
+    out = os.path.join(r.scratch("derivatives"), "out.jpg")
+    specs = resolve_derivatives(["web", "small:1024:fast", "thumb"])
+
+    def reopen():
+        merge_images(a, b, out, lossless=False)
+        for d in specs:
+            with Image.open(out) as img:
+                path = derivative_path(out, d)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                img.resize(derivative_size(img.size, d.max_side)).save(
+                    path, **derivative_options(d))
+
+    params = {"size": f"{size[0]}x{size[1]}", "derivatives": len(specs)}
+    r.measure("derive.fanout", lambda: merge_images(a, b, out, lossless=False,
+                                                    derivatives=specs), params)
+    r.measure("derive.reopen", reopen, params)
+
+
+# --------------------------
+# 输出编码配置：吞吐量和每像素字节数
+# --------------------------
+def bench_encode(r):
+    import io
+    from PIL import Image
+    from twopicmerge.encoders import PROFILES, save_options, source_tables
+    from twopicmerge.merge import target_sizes
+
+    resolutions = [(800, 600), (1600, 1200)] if r.quick else [(1600, 1200), (4000, 3000)]
+    for size in resolutions:
+        folder, names = r.corpus(f"merge-{size[0]}x{size[1]}-jpg", count=2, size=size,
+                                 png_ratio=0.0)
+        sources = [Image.open(os.path.join(folder, n)) for n in names]
+        tables = [source_tables(img) for img in sources]
+        # 只计编码：画布事先拼好
+        s1, s2, canvas_size = target_sizes(sources[0].size, sources[1].size)
+        canvas = Image.new("RGB", canvas_size)
+        canvas.paste(sources[0].resize(s1), (0, 0))
+        canvas.paste(sources[1].resize(s2), (s1[0], 0))
+        pixels = canvas_size[0] * canvas_size[1]
+
+        for name in PROFILES:
+            options = save_options(name, tables)
+            out = io.BytesIO()
+
+            def encode():
+                out.seek(0)
+                out.truncate()
+                canvas.save(out, **options)
+
+            result = r.measure("encode", encode,
+                               {"size": f"{canvas_size[0]}x{canvas_size[1]}", "profile": name})
+            if result:
+                result["bytes"] = out.tell()
+                result["bytes_per_pixel"] = out.tell() / pixels
+                result["mpix_per_s"] = pixels / 1e6 / result["median"]
+                print(f"{'':<28} {result['mpix_per_s']:.1f} MP/s, "
+                      f"{result['bytes_per_pixel']:.3f} 字节/像素", file=sys.stderr)
+
+
+# --------------------------
+# 扫描 + 排序
+# --------------------------
+def _sort_corpora(r):
+    counts = [50, 500] if r.quick else [100, 1000, 5000]
+    for count in counts:
+        for exif in (True, False):
+            label = f"sort-{count}-{'exif' if exif else 'noexif'}"
+            folder, names = r.corpus(label, count=count, size=(160, 120), png_ratio=0.2,
+                                     exif=exif, done_ratio=0.3)
+            yield {"count": count, "exif": exif}, folder, names
+
+
+def bench_scan(r):
+    from twopicmerge.scan import FolderIndex, prepare_folders
+
+    for params, folder, names in _sort_corpora(r):
+        processed, result = prepare_folders(folder)
+
+        # 原来 load_images 的写法 (原样照搬)：每个文件都重新 listdir 一次 processed/result，
+        # 再在列表里线性查找，O(文件数 × 已处理数)
+        def legacy():
+            exts = (".jpg", ".jpeg", ".png")
+            return [
+                f for f in os.listdir(folder)
+                if f.lower().endswith(exts)
+                and f not in os.listdir(processed)
+                and f not in os.listdir(result)
+            ]
+
+        r.measure("scan.legacy_listdir", legacy, params, items=params["count"])
+        r.measure("scan.folder_index",
+                  lambda: FolderIndex(folder, processed, result).pending(),
+                  params, items=params["count"])
+        index = FolderIndex(folder, processed, result)
+        r.measure("scan.refresh_unchanged", index.refresh, params, items=params["count"])
+
+
+def bench_sort(r):
+    from twopicmerge.metadata import MetadataIndex
+    from twopicmerge.scan import FolderIndex, get_capture_time, prepare_folders, sort_files
+
+    for params, folder, names in _sort_corpora(r):
+        processed, result = prepare_folders(folder)
+        folder_index = FolderIndex(folder, processed, result)
+        files, stats = folder_index.pending(), folder_index.stats()
+        db = os.path.join(r.workdir, "scratch", "sort-index.sqlite")
+
+        r.measure("sort.get_capture_time",
+                  lambda: sorted(files, key=lambda f: get_capture_time(os.path.join(folder, f))),
+                  params, items=len(files))
+
+        def remove_index():
+            for suffix in ("", "-journal", "-wal"):
+                if os.path.exists(db + suffix):
+                    os.remove(db + suffix)
+
+        def sort_with_new_index():
+            index = MetadataIndex(folder, db)
+            try:
+                sort_files(folder, files, index=index, stats=stats)
+            finally:
+                index.close()
+
+        os.makedirs(os.path.dirname(db), exist_ok=True)
+        r.measure("sort.index_cold", sort_with_new_index, params, setup=remove_index,
+                  items=len(files))
+        r.measure("sort.index_reopen", sort_with_new_index, params, items=len(files))
+        warm = MetadataIndex(folder, db)
+        r.measure("sort.index_warm", lambda: sort_files(folder, files, index=warm, stats=stats),
+                  params, items=len(files))
+        warm.close()
+
+
+# --------------------------
+# 缩略图
+# --------------------------
+def bench_thumbs(r):
+    from twopicmerge.thumbs import ThumbnailCache, make_thumbnail
+
+    resolutions = [(640, 480), (1600, 1200)] if r.quick else [(640, 480), (4000, 3000)]
+    count = 4 if r.quick else 8
+    for size in resolutions:
+        for fmt in ("jpg", "png"):
+            folder, names = r.corpus(f"thumbs-{size[0]}x{size[1]}-{fmt}", count=count, size=size,
+                                     png_ratio=1.0 if fmt == "png" else 0.0)
+            paths = [os.path.join(folder, n) for n in names]
+            params = {"size": f"{size[0]}x{size[1]}", "format": fmt}
+
+            r.measure("thumbs.make", lambda: [make_thumbnail(p) for p in paths],
+                      params, items=count, check=_all_bytes)
+
+            cache_dir = os.path.join(r.workdir, "scratch", "thumbs-cache")
+            r.measure("thumbs.cache_cold",
+                      lambda: [ThumbnailCache(cache_dir).get(p) for p in paths],
+                      params, setup=lambda: shutil.rmtree(cache_dir, ignore_errors=True),
+                      items=count, check=_all_bytes)
+            disk = ThumbnailCache(cache_dir)
+            r.measure("thumbs.cache_disk",
+                      lambda: [ThumbnailCache(cache_dir).get(p) for p in paths],
+                      params, items=count, check=_all_bytes)
+            [disk.get(p) for p in paths]
+            r.measure("thumbs.cache_memory", lambda: [disk.get(p) for p in paths],
+                      params, items=count, check=_all_bytes)
+
+
+# --------------------------
+# 完整批量
+# --------------------------
+def bench_batch(r):
+    from twopicmerge.batch import BatchEngine, make_pairs
+    from twopicmerge.scan import FolderIndex, prepare_folders, sort_files
+
+    count = 8 if r.quick else 24
+    size = (800, 600) if r.quick else (1600, 1200)
+    folder, names = r.corpus(f"batch-{count}", count=count, size=size, png_ratio=0.2)
+    processed, result = prepare_folders(folder)
+
+    def run(pool):
+        index = FolderIndex(folder, processed, result)
+        pairs = make_pairs(sort_files(folder, index.pending(), stats=index.stats()))
+        # 保留源图，不写日志：每次运行处理的内容完全相同
+        engine = BatchEngine(folder, processed, result, pool=pool, keep_sources=True,
+                             merge_options={"lossless": False})
+        engine.run(pairs)
+
+    for pool in ("thread", "process"):
+        r.measure("batch.run", lambda: run(pool),
+                  {"pool": pool, "pairs": count // 2, "workers": os.cpu_count() or 1},
+                  items=count // 2)
+
+
+# --------------------------
+# 界面 (offscreen)
+# --------------------------
+def bench_gui(r):
+    if not any(r.wants(n) for n in ("gui.load_images", "gui.get_sorted_files", "gui.thumbnails")):
+        return
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt6.QtCore import QEventLoop, QTimer
+        from PyQt6.QtWidgets import QApplication, QFileDialog
+        from twopicmerge.gui.batch_dialog import BatchDialog
+        from twopicmerge.gui.window import ImageSelector
+        from twopicmerge.thumbs import ThumbnailCache
+    except ImportError as e:
+        r.skip("gui", f"无法导入界面：{e}")
+        return
+
+    app = QApplication.instance() or QApplication([])
+
+    def spin(ms):
+        loop = QEventLoop()
+        QTimer.singleShot(ms, loop.quit)
+        loop.exec()
+
+    counts = [500] if r.quick else [1000, 5000]
+    for count in counts:
+        folder, names = r.corpus(f"gui-{count}", count=count, size=(160, 120),
+                                 png_ratio=0.2, done_ratio=0.3)
+        params = {"count": count}
+
+        win = ImageSelector()
+        win.resize(1200, 900)
+        win.show()
+        original = QFileDialog.getExistingDirectory
+        QFileDialog.getExistingDirectory = lambda *a, **k: folder
+        try:
+            r.measure("gui.load_images", win.choose_folder, params, items=count)
+        finally:
+            QFileDialog.getExistingDirectory = original
+
+        dlg = BatchDialog(win)
+        r.measure("gui.get_sorted_files", dlg.get_sorted_files, params, items=count)
+        dlg.deleteLater()
+
+        # 首屏缩略图：从打开文件夹到可见格子全部出图 (缩略图缓存为冷/热两种情况)
+        def visible_pixmaps():
+            """可见格子的缩略图；还有没加载完的返回 None"""
+            app.processEvents()
+            view, model = win.view, win.model
+            rect = view.viewport().rect()
+            rows = [i for i in range(min(model.rowCount(), 400))
+                    if view.visualRect(model.index(i)).intersects(rect)]
+            pixmaps = [model._pixmaps.get(model.paths[i]) for i in rows]
+            return pixmaps if rows and all(p is not None for p in pixmaps) else None
+
+        def first_screen():
+            QFileDialog.getExistingDirectory = lambda *a, **k: folder
+            try:
+                win.choose_folder()
+            finally:
+                QFileDialog.getExistingDirectory = original
+            deadline = time.perf_counter() + 60
+            pixmaps = visible_pixmaps()
+            while pixmaps is None and time.perf_counter() < deadline:
+                spin(5)
+                pixmaps = visible_pixmaps()
+            return pixmaps
+
+        def all_drawn(pixmaps):
+            if pixmaps is None:
+                return "60 秒内没有加载完"
+            if any(p.isNull() for p in pixmaps):
+                return "有缩略图是空图"
+            return None
+
+        def clear_thumbs():
+            win.thumb_cache = ThumbnailCache(os.path.join(r.workdir, "scratch", "gui-thumbs"))
+            shutil.rmtree(win.thumb_cache.directory, ignore_errors=True)
+
+        r.measure("gui.thumbnails_cold", first_screen, params, setup=clear_thumbs,
+                  check=all_drawn)
+        r.measure("gui.thumbnails_warm", first_screen, params,
+                  setup=lambda: win.thumb_cache.clear_memory(), check=all_drawn)
+        win.close()
+        win.deleteLater()
+        spin(10)
+
+
+# --------------------------
+# 常驻服务：热进程处理请求 vs 每组都启动一个新进程
+# --------------------------
+def _multipart(fields):
+    boundary = "2picmerge-bench-boundary"
+    parts = []
+    for name, data in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; '
+                     f'filename="{name}.jpg"\r\n\r\n'.encode() + data + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def bench_service(r):
+    if not r.wants("service"):
+        return
+    import http.client
+    import threading
+
+    size = (800, 600) if r.quick else (1600, 1200)
+    folder, names = r.corpus(f"merge-{size[0]}x{size[1]}-jpg", count=2, size=size,
+                             png_ratio=0.0)
+    a, b = (os.path.join(folder, n) for n in names)
+    fields = {}
+    for key, path in (("image1", a), ("image2", b)):
+        with open(path, "rb") as f:
+            fields[key] = f.read()
+    body, content_type = _multipart(fields)
+    requests = 20 if r.quick else 100
+    params = {"size": f"{size[0]}x{size[1]}", "requests": requests}
+
+    proc = subprocess.Popen([sys.executable, "-m", "twopicmerge", "serve", "--port", "0",
+                             "--queue", "256"], stdout=subprocess.PIPE, text=True, cwd=ROOT)
+    try:
+        port = int(json.loads(proc.stdout.readline())["url"].rsplit(":", 1)[1])
+
+        def send(conn):
+            conn.request("POST", "/merge", body, {"Content-Type": content_type})
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200:
+                raise RuntimeError(f"服务返回 {response.status}")
+
+        def sequential():
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            for _ in range(requests):
+                send(conn)
+            conn.close()
+
+        def concurrent(clients=4):
+            def client(n):
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+                for _ in range(n):
+                    send(conn)
+                conn.close()
+            threads = [threading.Thread(target=client, args=(requests // clients,))
+                       for _ in range(clients)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        warmup = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        send(warmup)  # 工作进程启动后的第一个请求
+        warmup.close()
+        r.measure("service.sequential", sequential, params, items=requests)
+        r.measure("service.concurrent", concurrent, dict(params, clients=4), items=requests)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=60)
+
+    # 对照：每组启动一次 Python 并导入 Pillow (原先脚本调用的方式)
+    out = os.path.join(r.scratch("service"), "out.jpg")
+    code = ("import sys; from twopicmerge.merge import merge_images; "
+            "merge_images(sys.argv[1], sys.argv[2], sys.argv[3], lossless=False)")
+    cold = max(3, requests // 10)
+    r.measure("service.cold_process", lambda: [
+        subprocess.run([sys.executable, "-c", code, a, b, out], cwd=ROOT, check=True)
+        for _ in range(cold)], dict(params, requests=cold), items=cold)
+
+
+# --------------------------
+# 启动时间：在新进程中导入核心包 / 打开主窗口
+# --------------------------
+# 目标：比空的 python 进程多出的秒数 (wall time，含解释器退出前的部分)
+STARTUP_TARGETS = {"startup.core": 0.10, "startup.gui": 0.25}
+# 启动时不应该导入的模块：Pillow、多进程和性能分析工具都等到第一次用到时才导入
+_CORE_LAZY = ["PIL", "PyQt6", "multiprocessing", "cProfile", "tracemalloc"]
+_GUI_LAZY = ["PIL", "multiprocessing", "cProfile", "tracemalloc",
+             "twopicmerge.gui.viewer", "twopicmerge.gui.batch_dialog"]
+
+_STARTUP_SCRIPTS = {
+    "startup.python": "pass",
+    "startup.core": """
+import sys, json
+import twopicmerge.cli
+print(json.dumps([m for m in {lazy!r} if m in sys.modules]))
+""",
+    # 建好主窗口、处理完第一轮事件就退出 (os._exit 跳过 Qt 的清理，不计入)
+    "startup.gui": """
+import os, sys, json
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+from twopicmerge.gui.app import build
+app, win = build([])
+app.processEvents()
+print(json.dumps([m for m in {lazy!r} if m in sys.modules]), flush=True)
+os._exit(0)
+""",
+}
+
+
+def bench_startup(r):
+    if not r.wants("startup"):
+        return
+    outputs = {}
+
+    def launch(name, lazy):
+        code = _STARTUP_SCRIPTS[name].format(lazy=lazy)
+        env = dict(os.environ, PYTHONPATH=ROOT)
+
+        def run():
+            proc = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                                  text=True, cwd=ROOT, env=env, timeout=60)
+            if proc.returncode:
+                raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+            outputs[name] = proc.stdout.strip()
+        return run
+
+    repeat = max(5, r.repeat)
+    base = r.measure("startup.python", launch("startup.python", []), repeat=repeat)
+    for name, lazy in (("startup.core", _CORE_LAZY), ("startup.gui", _GUI_LAZY)):
+        if name == "startup.gui" and importlib.util.find_spec("PyQt6") is None:
+            r.skip(name, "未安装 PyQt6")
+            continue
+        result = r.measure(name, launch(name, lazy), repeat=repeat)
+        if result is None:
+            continue
+        # 用最小值比较，减少其他进程干扰带来的波动
+        result["over_python"] = result["min"] - (base["min"] if base else 0.0)
+        result["eager_modules"] = json.loads(outputs[name] or "[]")
+        result["target"] = STARTUP_TARGETS[name]
+        result["ok"] = result["over_python"] <= result["target"] and not result["eager_modules"]
+        print(f"{'':<28} 比空进程多 {result['over_python'] * 1000:.0f} ms "
+              f"(目标 {result['target'] * 1000:.0f} ms)"
+              + (f"，提前导入了 {', '.join(result['eager_modules'])}"
+                 if result["eager_modules"] else "")
+              + ("" if result["ok"] else "  未达标"), file=sys.stderr, flush=True)
+
+
+SUITES = [bench_startup, bench_merge, bench_merge_mixed, bench_derivatives, bench_encode,
+          bench_scan, bench_sort, bench_thumbs, bench_batch, bench_service, bench_gui]
+
+
+# --------------------------
+# 结果
+# --------------------------
+def environment(quick):
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    try:
+        from PyQt6.QtCore import PYQT_VERSION_STR
+    except ImportError:
+        PYQT_VERSION_STR = None
+    from twopicmerge.lossless import find_jpegtran
+
+    return {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "pillow": PIL.__version__,
+        "pyqt": PYQT_VERSION_STR,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "jpegtran": find_jpegtran(),
+        "quick": quick,
+    }
+
+
+def compare(base_path, new_path):
+    """按 (名称, 参数) 对齐两次结果，打印中位数之比 (>1 表示变慢)"""
+    with open(base_path, encoding="utf-8") as f:
+        base = {_key(x): x for x in json.load(f)["results"] if "median" in x}
+    with open(new_path, encoding="utf-8") as f:
+        new = [x for x in json.load(f)["results"] if "median" in x]
+
+    for result in new:
+        old = base.get(_key(result))
+        if old is None:
+            continue
+        ratio = result["median"] / old["median"] if old["median"] else float("inf")
+        flag = "  慢" if ratio > 1.1 else ("  快" if ratio < 0.9 else "")
+        print(f"{result['name']:<28} {_format_params(result['params']):<44} "
+              f"{old['median']:.4f}s -> {result['median']:.4f}s  x{ratio:.2f}{flag}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks",
+                                     description="2PicMerge 性能基准")
+    parser.add_argument("--quick", action="store_true", help="小规模快速运行")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数 (默认 3)")
+    parser.add_argument("--only", action="append", metavar="NAME",
+                        help="只运行名称包含 NAME 的项目，可重复")
+    parser.add_argument("--output", "-o", help="结果 JSON 路径 (默认 bench-<时间>.json)")
+    parser.add_argument("--workdir", help="存放合成图片的目录 (默认临时目录，运行后删除)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"),
+                        help="对比两个结果文件，不运行基准")
+    parser.add_argument("--check", action="store_true",
+                        help="有项目未达到目标 (如启动时间) 时返回 1")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="2picmerge-bench-")
+    # 缩略图缓存、元数据索引都写到工作目录里，不碰用户自己的缓存
+    os.environ["XDG_CACHE_HOME"] = os.environ["LOCALAPPDATA"] = os.path.join(workdir, "cache")
+
+    runner = Runner(workdir, repeat=args.repeat, only=args.only, quick=args.quick)
+    try:
+        for suite in SUITES:
+            suite(runner)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or datetime.datetime.now().strftime("bench-%Y%m%d-%H%M%S.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(args.quick), "results": runner.results},
+                  f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {output}", file=sys.stderr)
+    failed = sorted({x["name"] for x in runner.results if "failed" in x})
+    if failed:
+        print(f"结果不对：{', '.join(failed)}", file=sys.stderr)
+        return 1
+    missed = [x["name"] for x in runner.results if x.get("ok") is False]
+    if args.check and missed:
+        print(f"未达到目标：{', '.join(missed)}", file=sys.stderr)
+        return 1
+    return 0
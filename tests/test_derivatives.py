@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from PIL import Image
+
+from twopicmerge.derivatives import (Derivative, derivative_key, derivative_path,
+                                     derivative_size, parse_derivative, resolve_derivatives,
+                                     save_with_derivatives)
+
+
+class ParseTest(unittest.TestCase):
+    def test_presets_and_overrides(self):
+        self.assertEqual(parse_derivative("web"), Derivative("web", 2048, "balanced", None))
+        self.assertEqual(parse_derivative("web:1600"), Derivative("web", 1600, "balanced", None))
+        self.assertEqual(parse_derivative("small:800:webp:70"),
+                         Derivative("small", 800, "webp", 70))
+        self.assertEqual(parse_derivative("full:0:png"), Derivative("full", None, "png", None))
+
+    def test_invalid_specs(self):
+        for spec in ("unknown", "a b:10", "x:ten", "x:10:nope", "x:10:fast:0", "x:-5",
+                     "x:1:fast:80:extra"):
+            with self.assertRaises(ValueError, msg=spec):
+                parse_derivative(spec)
+        with self.assertRaises(ValueError):
+            resolve_derivatives(["web", "web:100"])
+
+    def test_key_and_paths(self):
+        self.assertEqual(derivative_key(["thumb", "full:0:png"]),
+                         ["thumb:320:fast:80", "full:0:png"])
+        self.assertEqual(derivative_size((4000, 1000), 320), (320, 80))
+        self.assertEqual(derivative_size((200, 100), 320), (200, 100))
+        self.assertEqual(derivative_path(os.path.join("result", "a_b.jpg"),
+                                         parse_derivative("s:10:webp")),
+                         os.path.join("result", "s", "a_b.webp"))
+
+
+class SaveTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_main_and_derivatives(self):
+        image = Image.new("RGB", (1600, 400), (10, 200, 10))
+        out = os.path.join(self.tmp, "a_b.jpg")
+        # full 与主结果同尺寸，两个线程同时编码同一张图
+        paths = save_with_derivatives(image, out, "fast", derivatives=["full:0:png", "thumb"])
+        self.assertEqual(sorted(os.path.relpath(p, self.tmp) for p in paths),
+                         [os.path.join("full", "a_b.png"), os.path.join("thumb", "a_b.jpg")])
+        with Image.open(out) as main:
+            self.assertEqual((main.format, main.size), ("JPEG", (1600, 400)))
+        with Image.open(os.path.join(self.tmp, "full", "a_b.png")) as full:
+            self.assertEqual((full.format, full.size), ("PNG", (1600, 400)))
+            self.assertEqual(full.getpixel((5, 5)), (10, 200, 10))
+        with Image.open(os.path.join(self.tmp, "thumb", "a_b.jpg")) as thumb:
+            self.assertEqual(thumb.size, (320, 80))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import datetime
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from PIL import Image
+
+from twopicmerge.exif import capture_time_from_exif, read_header
+
+CAPTURED = datetime.datetime(2001, 2, 3, 4, 5, 6)
+
+
+def exif_bytes():
+    exif = Image.Exif()
+    exif.get_ifd(0x8769)[0x9003] = CAPTURED.strftime("%Y:%m:%d %H:%M:%S")
+    return exif.tobytes()
+
+
+def encoded(fmt):
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 48)).save(buf, fmt, exif=exif_bytes())
+    return buf.getvalue()
+
+
+class ReadHeaderTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def header_of(self, data, name):
+        path = os.path.join(self.tmp, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return read_header(path)
+
+    def test_complete_files(self):
+        self.assertEqual(self.header_of(encoded("JPEG"), "a.jpg"), ("JPEG", 64, 48, CAPTURED))
+        self.assertEqual(self.header_of(encoded("PNG"), "a.png"), ("PNG", 64, 48, CAPTURED))
+
+    def test_truncated_jpeg(self):
+        # 截在 SOF 之前 (含 EXIF 段中间)：读不出尺寸，抛出 OSError 而不是 struct.error；
+        # 截在图像数据中：头部完整，照常返回
+        data = encoded("JPEG")
+        sof = data.index(b"\xff\xc0") + 2
+        sof_end = sof + int.from_bytes(data[sof:sof + 2], "big")
+        for cut in range(2, sof_end):
+            with self.assertRaises(OSError, msg=cut):
+                self.header_of(data[:cut], "cut.jpg")
+        for cut in (sof_end, len(data) - 10):
+            self.assertEqual(self.header_of(data[:cut], "cut.jpg"), ("JPEG", 64, 48, CAPTURED))
+
+    def test_truncated_png_exif_is_ignored(self):
+        # IHDR 完整但 eXIf 块被截断：有尺寸，没有 (也不会读出半截的) 拍摄时间
+        data = encoded("PNG")
+        chunk = data.index(b"eXIf")
+        exif_end = chunk + 4 + int.from_bytes(data[chunk - 4:chunk], "big")
+        for cut in range(data.index(b"IHDR") + 17, exif_end):
+            self.assertEqual(self.header_of(data[:cut], "cut.png"), ("PNG", 64, 48, None), cut)
+
+    def test_truncated_exif_bytes(self):
+        raw = exif_bytes()
+        for cut in range(len(raw)):
+            self.assertIsNone(capture_time_from_exif(raw[:cut]), cut)
+        self.assertEqual(capture_time_from_exif(raw), CAPTURED)
+
+
+if __name__ == "__main__":
+    unittest.main()
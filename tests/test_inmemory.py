@@ -0,0 +1,65 @@
+import io
+import unittest
+
+from PIL import Image
+
+from twopicmerge.inmemory import merge_pair, merge_pairs
+from twopicmerge.merge import CanvasPool
+
+
+def encoded(size, color, fmt="JPEG"):
+    buf = io.BytesIO()
+    Image.new("RGB", size, color).save(buf, fmt)
+    return buf.getvalue()
+
+
+def near(pixel, color, tolerance=6):
+    return all(abs(a - b) <= tolerance for a, b in zip(pixel, color))
+
+
+class MergePairTest(unittest.TestCase):
+    def setUp(self):
+        self.red = encoded((400, 300), (220, 20, 20))
+        self.blue = encoded((200, 100), (20, 20, 220), "PNG")
+
+    def test_horizontal_round_trip(self):
+        data = merge_pair(self.red, self.blue)
+        result = Image.open(io.BytesIO(data))
+        # 对齐到较矮的一张：400x300 → 133x100
+        self.assertEqual((result.format, result.size), ("JPEG", (333, 100)))
+        self.assertTrue(near(result.getpixel((60, 50)), (220, 20, 20)))
+        self.assertTrue(near(result.getpixel((250, 50)), (20, 20, 220)))
+
+    def test_vertical_as_image_and_file_objects(self):
+        image = merge_pair(io.BytesIO(self.red), Image.open(io.BytesIO(self.blue)),
+                           "vertical", as_image=True)
+        self.assertEqual((image.mode, image.size), ("RGB", (200, 250)))
+        self.assertTrue(near(image.getpixel((100, 70)), (220, 20, 20)))
+        self.assertTrue(near(image.getpixel((100, 200)), (20, 20, 220)))
+
+    def test_encoder_profiles(self):
+        self.assertEqual(Image.open(io.BytesIO(
+            merge_pair(self.red, self.blue, encoder="png"))).format, "PNG")
+        self.assertEqual(Image.open(io.BytesIO(
+            merge_pair(self.red, self.blue, encoder="webp"))).format, "WEBP")
+
+    def test_pooled_canvas_gives_same_bytes(self):
+        pool = CanvasPool()
+        expected = merge_pair(self.red, self.blue)
+        self.assertEqual(merge_pair(self.red, self.blue, canvas_pool=pool), expected)
+        # 复用的画布还留着上一组的像素，结果也必须一样
+        merge_pair(self.blue, self.red, canvas_pool=pool)
+        self.assertEqual(merge_pair(self.red, self.blue, canvas_pool=pool), expected)
+
+    def test_merge_pairs_keeps_order_and_errors(self):
+        pairs = [(self.red, self.blue), (b"not an image", self.red), (self.blue, self.red)]
+        results = list(merge_pairs(pairs, workers=2, return_exceptions=True))
+        self.assertEqual(Image.open(io.BytesIO(results[0])).size, (333, 100))
+        self.assertIsInstance(results[1], Exception)
+        self.assertEqual(Image.open(io.BytesIO(results[2])).size, (333, 100))
+        with self.assertRaises(TypeError):
+            merge_pair(12345, self.red)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from PIL import Image
+
+from twopicmerge import merge
+from twopicmerge.lossless import can_join, mcu_size, read_layout
+
+
+class LayoutTest(unittest.TestCase):
+    """只读 JPEG 头部的部分，不需要 jpegtran"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def jpeg(self, name, size, mode="RGB", **options):
+        path = os.path.join(self.tmp, name)
+        Image.new(mode, size, 128).save(path, "JPEG", **options)
+        return read_layout(path)
+
+    def test_read_layout(self):
+        layout = self.jpeg("a.jpg", (64, 48), subsampling="4:2:0")
+        self.assertEqual((layout.width, layout.height), (64, 48))
+        self.assertEqual([c[1:3] for c in layout.components], [(2, 2), (1, 1), (1, 1)])
+        self.assertEqual(mcu_size(layout), (16, 16))
+
+    def test_can_join_needs_matching_height_and_aligned_seam(self):
+        a = self.jpeg("a.jpg", (64, 48), subsampling="4:2:0")
+        self.assertTrue(can_join(a, self.jpeg("b.jpg", (40, 48), subsampling="4:2:0")))
+        self.assertFalse(can_join(a, self.jpeg("c.jpg", (40, 32), subsampling="4:2:0")))
+        unaligned = self.jpeg("d.jpg", (60, 48), subsampling="4:2:0")
+        self.assertFalse(can_join(unaligned, a))
+        # 上下拼接看宽度和高度方向的 MCU
+        self.assertTrue(can_join(a, self.jpeg("e.jpg", (64, 20), subsampling="4:2:0"),
+                                 "vertical"))
+
+    def test_can_join_needs_same_tables_and_sampling(self):
+        a = self.jpeg("a.jpg", (64, 48), quality=90, subsampling="4:2:0")
+        self.assertFalse(can_join(a, self.jpeg("b.jpg", (64, 48), quality=70,
+                                               subsampling="4:2:0")))
+        self.assertFalse(can_join(a, self.jpeg("c.jpg", (64, 48), quality=90,
+                                               subsampling="4:4:4")))
+        grey = self.jpeg("d.jpg", (64, 48), mode="L")
+        self.assertFalse(can_join(grey, grey))
+
+    def test_not_a_jpeg_or_truncated(self):
+        png = os.path.join(self.tmp, "a.png")
+        Image.new("RGB", (16, 16)).save(png)
+        self.assertIsNone(read_layout(png))
+
+        path = os.path.join(self.tmp, "full.jpg")
+        Image.new("RGB", (64, 48)).save(path, "JPEG")
+        with open(path, "rb") as f:
+            data = f.read()
+        for cut in (3, 5, 30):
+            truncated = os.path.join(self.tmp, f"cut{cut}.jpg")
+            with open(truncated, "wb") as f:
+                f.write(data[:cut])
+            self.assertIsNone(read_layout(truncated), cut)
+        self.assertFalse(can_join(None, read_layout(path)))
+
+
+class ProfileGateTest(unittest.TestCase):
+    """指定了质量的编码配置不走无损拼接 (否则结果画质与配置不符)"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.a = os.path.join(self.tmp, "a.jpg")
+        self.b = os.path.join(self.tmp, "b.jpg")
+        for path in (self.a, self.b):
+            Image.new("RGB", (64, 48), 90).save(path, "JPEG")
+        self.out = os.path.join(self.tmp, "out.jpg")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def joined_with(self, encoder):
+        with mock.patch.object(merge, "join_jpegs", return_value=False) as join:
+            merge.merge_images(self.a, self.b, self.out, encoder=encoder)
+        self.assertTrue(os.path.exists(self.out))
+        return join.called
+
+    def test_default_and_archive_try_lossless(self):
+        self.assertTrue(self.joined_with("default"))
+        self.assertTrue(self.joined_with("archive"))
+
+    def test_quality_profiles_reencode(self):
+        self.assertFalse(self.joined_with("fast"))
+        self.assertFalse(self.joined_with("balanced"))
+
+
+if __name__ == "__main__":
+    unittest.main()
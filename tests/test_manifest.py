@@ -0,0 +1,119 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from twopicmerge.manifest import MANIFEST_NAME, BatchManifest, fingerprint
+
+
+class BatchManifestTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.processed = os.path.join(self.tmp, "processed")
+        self.result = os.path.join(self.tmp, "result")
+        os.makedirs(self.processed)
+        os.makedirs(self.result)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def touch(self, folder, name, data=b"x"):
+        path = os.path.join(folder, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def lines(self):
+        with open(os.path.join(self.result, MANIFEST_NAME), encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_last_record_wins_and_is_current(self):
+        sources = [fingerprint(self.touch(self.tmp, n)) for n in ("a.jpg", "b.jpg")]
+        manifest = BatchManifest(self.result)
+        manifest.started(("a.jpg", "b.jpg"), sources, "a_b.jpg", "horizontal")
+        self.assertFalse(manifest.is_current(("a.jpg", "b.jpg"), sources, "horizontal"))
+        self.touch(self.result, "a_b.jpg")
+        manifest.finished(("a.jpg", "b.jpg"))
+        manifest.close()
+
+        reloaded = BatchManifest(self.result)
+        self.assertEqual(reloaded.get(("a.jpg", "b.jpg"))["status"], "done")
+        self.assertTrue(reloaded.is_current(("a.jpg", "b.jpg"), sources, "horizontal"))
+        self.assertFalse(reloaded.is_current(("a.jpg", "b.jpg"), sources, "vertical"))
+        self.assertFalse(reloaded.is_current(("a.jpg", "b.jpg"), sources, "horizontal",
+                                             encoder="webp"))
+
+    def test_half_written_last_line_is_ignored(self):
+        manifest = BatchManifest(self.result)
+        manifest.started(("a.jpg", "b.jpg"), [None, None], "a_b.jpg", "horizontal")
+        manifest.close()
+        with open(manifest.path, "a", encoding="utf-8") as f:
+            f.write('{"inputs": ["c.jpg", "d')
+        reloaded = BatchManifest(self.result)
+        self.assertEqual([r["inputs"] for r in reloaded.incomplete()], [["a.jpg", "b.jpg"]])
+
+    def test_recover_moves_the_remaining_source(self):
+        # 上次在两次 move 之间被杀：结果已写好，a 已在 processed/，b 还在原处
+        manifest = BatchManifest(self.result)
+        manifest.started(("a.jpg", "b.jpg"), [None, None], "a_b.jpg", "horizontal")
+        manifest.started(("c.jpg", "d.jpg"), [None, None], "c_d.jpg", "horizontal")
+        manifest.close()
+        self.touch(self.result, "a_b.jpg")
+        self.touch(self.processed, "a.jpg")
+        self.touch(self.tmp, "b.jpg")
+        # c/d 两张都还在原处：不恢复，重新运行时重做
+        self.touch(self.result, "c_d.jpg")
+        self.touch(self.tmp, "c.jpg")
+        self.touch(self.tmp, "d.jpg")
+
+        manifest = BatchManifest(self.result)
+        self.assertEqual(manifest.recover(self.tmp, self.processed), [("a.jpg", "b.jpg")])
+        self.assertEqual(sorted(os.listdir(self.processed)), ["a.jpg", "b.jpg"])
+        self.assertEqual(manifest.get(("a.jpg", "b.jpg"))["status"], "done")
+        self.assertEqual(manifest.get(("c.jpg", "d.jpg"))["status"], "started")
+        manifest.close()
+
+    def test_recover_skips_missing_output_and_keep_sources(self):
+        manifest = BatchManifest(self.result)
+        manifest.started(("a.jpg", "b.jpg"), [None, None], "a_b.jpg", "horizontal")
+        manifest.started(("c.jpg", "d.jpg"), [None, None], "c_d.jpg", "horizontal",
+                         keep_sources=True)
+        self.touch(self.processed, "a.jpg")
+        self.touch(self.result, "c_d.jpg")
+        self.touch(self.processed, "c.jpg")
+        self.assertEqual(manifest.recover(self.tmp, self.processed), [])
+        manifest.close()
+
+    def test_compact_keeps_latest_record_per_pair(self):
+        manifest = BatchManifest(self.result)
+        for _ in range(3):
+            manifest.started(("a.jpg", "b.jpg"), [None, None], "a_b.jpg", "horizontal")
+            manifest.finished(("a.jpg", "b.jpg"), "failed", "boom")
+        manifest.started(("c.jpg", "d.jpg"), [None, None], "c_d.jpg", "vertical")
+        self.assertEqual(len(self.lines()), 7)
+
+        manifest.compact()
+        records = self.lines()
+        self.assertEqual([r["inputs"] for r in records], [["a.jpg", "b.jpg"], ["c.jpg", "d.jpg"]])
+        self.assertEqual((records[0]["status"], records[0]["error"]), ("failed", "boom"))
+        # 压缩之后还能继续追加
+        manifest.finished(("c.jpg", "d.jpg"))
+        manifest.close()
+        self.assertEqual(len(self.lines()), 3)
+        self.assertEqual(BatchManifest(self.result).get(("c.jpg", "d.jpg"))["status"], "done")
+
+    def test_load_compacts_long_logs(self):
+        manifest = BatchManifest(self.result)
+        for _ in range(60):
+            manifest.started(("a.jpg", "b.jpg"), [None, None], "a_b.jpg", "horizontal")
+            manifest.finished(("a.jpg", "b.jpg"))
+        manifest.close()
+        BatchManifest(self.result).close()
+        self.assertEqual(len(self.lines()), 1)
+        BatchManifest(self.result, compact=False).close()
+        self.assertEqual(len(self.lines()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from twopicmerge.scan import FolderIndex, list_images, prepare_folders
+
+
+class FolderIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.processed, self.result = prepare_folders(self.tmp)
+        for name in ("a.jpg", "b.JPEG", "c.png", "notes.txt"):
+            self.touch(self.tmp, name)
+        os.makedirs(os.path.join(self.tmp, "sub.jpg"))  # 目录不算图片
+        self.index = FolderIndex(self.tmp, self.processed, self.result)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def touch(self, folder, name):
+        with open(os.path.join(folder, name), "wb") as f:
+            f.write(b"x")
+
+    def test_initial_scan(self):
+        self.assertEqual(sorted(self.index.pending()), ["a.jpg", "b.JPEG", "c.png"])
+        self.assertEqual(sorted(self.index.stats()), ["a.jpg", "b.JPEG", "c.png"])
+        self.assertEqual(sorted(list_images(self.tmp, self.processed, self.result)),
+                         ["a.jpg", "b.JPEG", "c.png"])
+
+    def test_refresh_reports_added_and_removed(self):
+        self.touch(self.tmp, "d.jpg")
+        os.remove(os.path.join(self.tmp, "b.JPEG"))
+        self.assertEqual(self.index.refresh([self.tmp]), (["d.jpg"], ["b.JPEG"]))
+        self.assertEqual(self.index.refresh(), ([], []))
+        self.assertIn("d.jpg", self.index.stats())
+        self.assertNotIn("b.JPEG", self.index.stats())
+
+    def test_files_in_processed_or_result_are_not_pending(self):
+        # 源图还留在主文件夹 (例如拷贝而不是移动)，只要 processed/ 里有同名文件就不算待处理
+        self.touch(self.processed, "a.jpg")
+        self.touch(self.result, "c.png")
+        self.assertEqual(self.index.refresh([self.processed]), ([], ["a.jpg"]))
+        self.assertEqual(self.index.refresh([self.result]), ([], ["c.png"]))
+        self.assertFalse(self.index.is_pending("a.jpg"))
+        self.assertTrue(self.index.is_pending("b.JPEG"))
+
+        os.remove(os.path.join(self.processed, "a.jpg"))
+        self.assertEqual(self.index.refresh(), (["a.jpg"], []))
+
+    def test_refresh_only_lists_given_dirs(self):
+        self.touch(self.tmp, "d.jpg")
+        self.assertEqual(self.index.refresh([self.processed]), ([], []))
+        self.assertEqual(self.index.refresh([self.tmp]), (["d.jpg"], []))
+
+    def test_add_done_without_listing(self):
+        self.index.add_done(self.processed, ["a.jpg", "b.JPEG"])
+        self.assertEqual(self.index.pending(), ["c.png"])
+
+
+if __name__ == "__main__":
+    unittest.main()
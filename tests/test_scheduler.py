@@ -0,0 +1,48 @@
+import unittest
+
+from twopicmerge.scheduler import AdmissionQueue, PairEstimate, simulate
+
+MB = 1024 * 1024
+
+
+def estimate(name, peak_mb, seconds):
+    return PairEstimate((name + "1", name + "2"), peak_mb * MB, seconds, False, False)
+
+
+class AdmissionQueueTest(unittest.TestCase):
+    def test_no_limit_keeps_order(self):
+        items = [estimate("a", 10, 1), estimate("b", 500, 9), estimate("c", 1, 5)]
+        queue = AdmissionQueue(items)
+        self.assertEqual([queue.take(i) for i in range(3)], items)
+        self.assertIsNone(queue.take(3))
+
+    def test_longest_first_within_memory_limit(self):
+        big, medium, small = estimate("big", 60, 9), estimate("mid", 50, 5), estimate("s", 30, 1)
+        queue = AdmissionQueue([small, medium, big], memory_limit=100 * MB)
+        self.assertIs(queue.take(0), big)
+        # 60 + 50 超出预算：跳过 medium，先用放得下的小组填满
+        self.assertIs(queue.take(1), small)
+        self.assertEqual(queue.in_use, 90 * MB)
+        self.assertIsNone(queue.take(2))
+        queue.release(big)
+        self.assertIs(queue.take(1), medium)
+        self.assertEqual(queue.in_use, 80 * MB)
+        self.assertEqual(len(queue), 0)
+
+    def test_oversized_pair_runs_alone(self):
+        huge, small = estimate("huge", 500, 3), estimate("s", 10, 9)
+        queue = AdmissionQueue([huge, small], memory_limit=100 * MB)
+        self.assertIs(queue.take(0), small)
+        self.assertIsNone(queue.take(1))  # 在途还有组时不放行超预算的组
+        queue.release(small)
+        self.assertIs(queue.take(0), huge)
+
+    def test_simulate_respects_limit(self):
+        items = [estimate(str(i), 40, 1) for i in range(4)]
+        seconds, peak = simulate(items, workers=4, memory_limit=100 * MB)
+        self.assertEqual((seconds, peak), (2, 80 * MB))
+        self.assertEqual(simulate(items, workers=4), (1, 160 * MB))
+
+
+if __name__ == "__main__":
+    unittest.main()
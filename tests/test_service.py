@@ -0,0 +1,59 @@
+import asyncio
+import unittest
+
+from twopicmerge.service import HTTPError, read_request
+
+
+def request_bytes(body):
+    return (b"POST /merge?direction=v HTTP/1.1\r\nHost: x\r\n"
+            b"Content-Length: %d\r\n\r\n" % len(body)) + body
+
+
+class ReadRequestTest(unittest.TestCase):
+    def read(self, data, max_body=1024, idle_timeout=0.2, gap=0.0, pieces=1):
+        async def run():
+            reader = asyncio.StreamReader()
+
+            async def feed():
+                step = -(-len(data) // pieces)
+                for i in range(0, len(data), step):
+                    reader.feed_data(data[i:i + step])
+                    await asyncio.sleep(gap)
+                reader.feed_eof()
+
+            feeder = asyncio.create_task(feed())
+            try:
+                return await read_request(reader, max_body, idle_timeout)
+            finally:
+                feeder.cancel()
+        return asyncio.run(run())
+
+    def test_parses_request(self):
+        method, path, query, headers, body = self.read(request_bytes(b"hello"))
+        self.assertEqual((method, path, query, body), ("POST", "/merge", {"direction": "v"},
+                                                       b"hello"))
+        self.assertEqual(headers["content-length"], "5")
+
+    def test_slow_upload_is_not_cut_off(self):
+        # 总耗时超过超时时间，但每次读取都等到了数据
+        body = bytes(range(256)) * 4
+        request = self.read(request_bytes(body), max_body=4096, pieces=8, gap=0.05)
+        self.assertEqual(request[4], body)
+
+    def test_stalled_upload_times_out(self):
+        with self.assertRaises(asyncio.TimeoutError):
+            self.read(request_bytes(b"x" * 100), pieces=2, gap=0.5)
+
+    def test_body_over_limit(self):
+        with self.assertRaises(HTTPError) as cm:
+            self.read(request_bytes(b"x" * 2048))
+        self.assertEqual(cm.exception.status, 413)
+
+    def test_truncated_body(self):
+        data = request_bytes(b"x" * 100)[:-10]
+        with self.assertRaises(asyncio.IncompleteReadError):
+            self.read(data)
+
+
+if __name__ == "__main__":
+    unittest.main()
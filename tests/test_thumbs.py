@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+import unittest
+from io import BytesIO
+
+from PIL import Image
+
+from twopicmerge.thumbs import ThumbnailCache, make_thumbnail
+
+
+class ThumbnailCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, "a.jpg")
+        Image.new("RGB", (640, 480), (200, 30, 30)).save(self.path)
+        self.cache = ThumbnailCache(os.path.join(self.tmp, "cache"))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_cold_get_makes_thumbnail(self):
+        data = self.cache.get(self.path)
+        self.assertTrue(data)
+        self.assertTrue(data.startswith(b"\xff\xd8"))  # JPEG
+        self.assertEqual((self.cache.misses, self.cache.hits_memory, self.cache.hits_disk),
+                         (1, 0, 0))
+
+    def test_second_get_hits_memory_then_disk(self):
+        data = self.cache.get(self.path)
+        self.assertEqual(self.cache.get(self.path), data)
+        self.assertEqual(self.cache.hits_memory, 1)
+
+        fresh = ThumbnailCache(self.cache.directory)
+        self.assertEqual(fresh.get(self.path), data)
+        self.assertEqual((fresh.hits_disk, fresh.misses), (1, 0))
+
+    def test_large_palette_png(self):
+        # reduce() 不支持 P 模式，大调色板图要先转换
+        path = os.path.join(self.tmp, "palette.png")
+        img = Image.new("RGB", (1600, 900), (30, 120, 200)).quantize(16)
+        img.save(path)
+        thumb = Image.open(BytesIO(make_thumbnail(path)))
+        self.assertEqual(thumb.size, (160, 90))
+        r, g, b = thumb.convert("RGB").getpixel((80, 45))
+        self.assertTrue(abs(r - 30) < 8 and abs(g - 120) < 8 and abs(b - 200) < 8)
+
+    def test_large_transparent_palette_png_keeps_alpha(self):
+        path = os.path.join(self.tmp, "palette_alpha.png")
+        img = Image.new("P", (1200, 1200), 0)
+        img.putpalette([0, 0, 0, 255, 0, 0])
+        img.save(path, transparency=0)
+        thumb = Image.open(BytesIO(make_thumbnail(path)))
+        self.assertEqual((thumb.format, thumb.mode, thumb.size), ("PNG", "RGBA", (160, 160)))
+        self.assertEqual(thumb.getpixel((10, 10))[3], 0)
+
+    def test_large_bilevel_and_16bit_images(self):
+        for mode, value in (("1", 1), ("I;16", 40000)):
+            path = os.path.join(self.tmp, f"{mode.replace(';', '')}.png")
+            Image.new(mode, (1000, 700), value).save(path)
+            thumb = Image.open(BytesIO(make_thumbnail(path)))
+            self.assertEqual(thumb.size, (160, 112), mode)
+
+
+if __name__ == "__main__":
+    unittest.main()
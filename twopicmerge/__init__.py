@@ -0,0 +1 @@
+# 2PicMerge 核心包：拼接、批量处理等不依赖界面的逻辑
@@ -0,0 +1,263 @@
+import os
+import shutil
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from . import instrument
+from .derivatives import derivative_key, resolve_derivatives
+from .encoders import get_profile
+from .merge import canvas_pool, merge_images
+from .manifest import fingerprint
+from .scheduler import AdmissionQueue, PairEstimate, estimate_pairs
+
+
+# --------------------------
+# 配对 + 单组处理
+# --------------------------
+def make_pairs(files):
+    """按顺序两两配对（奇数张时最后一张不参与）"""
+    return [(files[i], files[i + 1]) for i in range(0, len(files) - 1, 2)]
+
+
+def output_name_for(p1, p2, extension=".jpg"):
+    """拼接结果文件名：<名1>_<名2>.jpg (扩展名随编码配置)"""
+    base1 = os.path.splitext(os.path.basename(p1))[0]
+    base2 = os.path.splitext(os.path.basename(p2))[0]
+    return f"{base1}_{base2}{extension}"
+
+
+def process_pair(folder, processed_folder, result_folder, p1, p2, direction,
+                 merge_options=None, keep_sources=False):
+    """
+    拼接一组图片并把两张源图移动到 processed/ (keep_sources 时留在原处)，返回输出文件名。
+    merge_options 原样传给 merge_images (memory_budget、lossless、encoder 等)。
+    画布在同一进程处理的各组之间复用 (见 merge.CanvasPool)。
+    """
+    path1 = os.path.join(folder, p1)
+    path2 = os.path.join(folder, p2)
+
+    merge_options = merge_options or {}
+    profile = get_profile(merge_options.get("encoder"))
+    output_name = output_name_for(p1, p2, profile.extension)
+    output_path = os.path.join(result_folder, output_name)
+
+    merge_images(path1, path2, output_path, direction, canvas_pool=canvas_pool,
+                 **merge_options)
+    if keep_sources:
+        return output_name
+
+    # 移动源文件 (结果写好之后才移动，中断时可以据此恢复)
+    if instrument.enabled():
+        _count_move(path1, path2, processed_folder)
+    with instrument.stage("batch.move"):
+        shutil.move(path1, os.path.join(processed_folder, p1))
+        shutil.move(path2, os.path.join(processed_folder, p2))
+    return output_name
+
+
+def _count_move(path1, path2, processed_folder):
+    """记录移动的字节数；跨文件系统时 shutil.move 实际是复制 + 删除"""
+    try:
+        st1, st2 = os.stat(path1), os.stat(path2)
+        instrument.count("bytes.moved", st1.st_size + st2.st_size)
+        if st1.st_dev != os.stat(processed_folder).st_dev:
+            instrument.count("batch.move_cross_device", 2)
+    except OSError:
+        pass
+
+
+def make_executor(pool='process', workers=1):
+    """'process' 且不止一个并行时用 spawn 进程池，否则用线程池"""
+    if pool == 'process' and workers > 1:
+        # spawn 在各平台行为一致，也避免在 GUI 进程的子线程里 fork；
+        # 多进程相关模块只在真正用进程池时导入 (线程池和单进程启动更快)
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        ctx = multiprocessing.get_context('spawn')
+        return ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
+    return ThreadPoolExecutor(max_workers=workers)
+
+
+def _process_pair_traced(trace, profile_path, *args):
+    """
+    带统计地处理一组：trace 为 True 时 (进程池子进程) 单独收集，
+    返回 (输出文件名, 统计快照) 交给主进程合并；profile_path 给出时同时做 cProfile。
+    """
+    run = process_pair
+    if profile_path:
+        run = lambda *a: instrument.profile_call(profile_path, process_pair, *a)
+    pair = list(args[3:5])
+    if not trace:
+        with instrument.context(pair=pair):
+            return run(*args), None
+    with instrument.collect() as recorder, instrument.context(pair=pair):
+        output_name = run(*args)
+    return output_name, recorder.snapshot()
+
+
+# --------------------------
+# 批量拼接引擎 (不依赖 Qt)
+# --------------------------
+class BatchEngine:
+    """
+    在进程池/线程池中并行处理配对，通过回调汇报进度和错误。
+    给出 manifest (BatchManifest) 时每组的开始和结果都会记入日志，
+    已完成且输入没变的组直接跳过 (数量见 skipped)。
+    给出 memory_limit (字节) 时按文件头估计每组的峰值内存，在途各组之和不超过它，
+    并按估计耗时从长到短处理 (见 scheduler)。
+    """
+
+    def __init__(self, folder, processed_folder, result_folder,
+                 direction='horizontal', workers=None, pool='process',
+                 max_pending=None, merge_options=None, keep_sources=False,
+                 manifest=None, profile_pair=None, profile_path=None,
+                 memory_limit=None):
+        self.folder = folder
+        self.processed_folder = processed_folder
+        self.result_folder = result_folder
+        self.direction = direction
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        # 'process' 适合 CPU 密集的解码/编码，'thread' 启动更快
+        self.pool = pool
+        # 整个批量的内存预算；已提交的组都计入，所以此时不再多排队
+        self.memory_limit = memory_limit
+        # 已提交但未完成的任务上限，避免一次性把几千组都塞进队列
+        self.max_pending = max_pending or (self.workers if memory_limit else self.workers * 2)
+        # 传给 merge_images 的额外参数，如 memory_budget、lossless、encoder
+        self.merge_options = dict(merge_options or {})
+        if memory_limit and self.merge_options.get("memory_budget") is None:
+            # 单组就超出总预算时改用流式拼接
+            self.merge_options["memory_budget"] = memory_limit
+        self.encoder = get_profile(self.merge_options.get("encoder"))
+        # 派生版本提前解析：设置有误时在提交之前报错，子进程也不必重复解析
+        self.merge_options["derivatives"] = resolve_derivatives(
+            self.merge_options.get("derivatives"))
+        self.derivatives = derivative_key(self.merge_options["derivatives"])
+        # 不移动源图 (非破坏模式)，重复运行时只重建输入有变化的组
+        self.keep_sources = keep_sources
+        self.manifest = manifest
+        # 对这一组做 cProfile + tracemalloc，统计写入 profile_path
+        self.profile_pair = tuple(profile_pair) if profile_pair else None
+        self.profile_path = profile_path
+        self.skipped = 0
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        """请求取消：不再提交新任务，正在处理的组会完成"""
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def plan(self, pairs):
+        """去掉日志中已完成且输入没变的组，返回 [(pair, 输入文件标识)]"""
+        todo = []
+        self.skipped = 0
+        for pair in pairs:
+            sources = [fingerprint(os.path.join(self.folder, name)) for name in pair]
+            if self.manifest and self.manifest.is_current(pair, sources, self.direction,
+                                                           self.encoder.name,
+                                                           self.derivatives):
+                self.skipped += 1
+                continue
+            todo.append((tuple(pair), sources))
+        return todo
+
+    def run(self, pairs, on_progress=None, on_error=None):
+        """
+        处理全部配对 (跳过已完成的)，返回 (成功数, 失败数)。
+        on_progress(已完成, 总数, (p1, p2), 输出文件名)
+        on_error(已完成, 总数, (p1, p2), 错误信息)
+        """
+        with instrument.stage("batch.run"):
+            return self._run(pairs, on_progress, on_error)
+
+    def _run(self, pairs, on_progress, on_error):
+        with instrument.stage("batch.plan"):
+            todo = self.plan(pairs)
+        instrument.count("batch.skipped", self.skipped)
+        total = len(todo)
+        done = ok = failed = 0
+        sources_of = dict(todo)
+        if self.memory_limit:
+            with instrument.stage("batch.estimate"):
+                estimates = estimate_pairs(self.folder, list(sources_of), self.direction,
+                                           self.merge_options)
+        else:
+            estimates = [PairEstimate(pair, 0, 0.0, False, False) for pair in sources_of]
+        queue = AdmissionQueue(estimates, self.memory_limit)
+        pending = {}
+        manifest = self.manifest
+        recorder = instrument.recorder()
+
+        with make_executor(self.pool, self.workers) as executor:
+            # 进程池子进程里的统计要随结果带回来；线程池直接记在本进程
+            traced = recorder is not None and not isinstance(executor, ThreadPoolExecutor)
+
+            while True:
+                # 有界提交：在途任务不超过 max_pending (和内存预算)
+                while not self.cancelled and len(pending) < self.max_pending:
+                    estimate = queue.take(len(pending))
+                    if estimate is None:
+                        break
+                    pair, sources = estimate.pair, sources_of[estimate.pair]
+                    if manifest:
+                        manifest.started(pair, sources,
+                                         output_name_for(*pair, self.encoder.extension),
+                                         self.direction, self.keep_sources,
+                                         self.encoder.name, self.derivatives)
+                    args = (self.folder, self.processed_folder, self.result_folder,
+                            pair[0], pair[1], self.direction,
+                            self.merge_options, self.keep_sources)
+                    profile_path = self.profile_path if pair == self.profile_pair else None
+                    if recorder is not None or profile_path:
+                        future = executor.submit(_process_pair_traced, traced,
+                                                 profile_path, *args)
+                    else:
+                        future = executor.submit(process_pair, *args)
+                    pending[future] = estimate
+
+                if not pending:
+                    break
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    estimate = pending.pop(future)
+                    queue.release(estimate)
+                    pair = estimate.pair
+                    if future.cancelled():
+                        if manifest:
+                            manifest.finished(pair, "cancelled")
+                        continue
+                    done += 1
+                    try:
+                        output_name = future.result()
+                    except Exception as e:
+                        failed += 1
+                        instrument.count("batch.failed")
+                        if manifest:
+                            manifest.finished(pair, "failed", str(e))
+                        if on_error:
+                            on_error(done, total, pair, str(e))
+                    else:
+                        if isinstance(output_name, tuple):
+                            output_name, snapshot = output_name
+                            if snapshot and recorder is not None:
+                                recorder.merge(snapshot)
+                        ok += 1
+                        instrument.count("batch.done")
+                        if manifest:
+                            manifest.finished(pair)
+                        if on_progress:
+                            on_progress(done, total, pair, output_name)
+
+                if self.cancelled:
+                    # 丢弃还没开始的任务，已在运行的等它们结束后照常汇报
+                    for future in pending:
+                        future.cancel()
+
+        # 线程池在本进程 (例如界面) 里拼接，批量结束后不再留着空闲画布
+        canvas_pool.clear()
+        return ok, failed
@@ -0,0 +1,338 @@
+import os
+import sys
+import json
+import signal
+import argparse
+
+from . import instrument
+from .batch import BatchEngine, make_pairs
+from .derivatives import PRESETS, parse_derivative
+from .encoders import DEFAULT_PROFILE, PROFILES
+from .manifest import BatchManifest
+from .merge import RESAMPLE_FILTERS
+from .scan import FolderIndex, prepare_folders, sort_files
+from .scheduler import calibrate, estimate_pairs, simulate
+
+DIRECTIONS = {'h': 'horizontal', 'v': 'vertical'}
+
+
+# --------------------------
+# 机器可读输出：每行一个 JSON 事件
+# --------------------------
+def emit(event, **fields):
+    print(json.dumps({"event": event, **fields}, ensure_ascii=False), flush=True)
+
+
+# --------------------------
+# batch 子命令
+# --------------------------
+def merge_options(args):
+    """命令行参数 → merge_images 的额外参数"""
+    options = {"lossless": args.lossless, "encoder": args.encoder,
+               "resample": args.resample}
+    if args.memory_budget:
+        options["memory_budget"] = args.memory_budget * 1024 * 1024
+    if args.derivatives:
+        options["derivatives"] = tuple(args.derivatives)
+    return options
+
+
+def derivative_arg(value):
+    """--derivative 的取值检查，格式不对时由 argparse 报错"""
+    try:
+        return parse_derivative(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+
+def memory_limit(args):
+    return args.max_memory * 1024 * 1024 if args.max_memory else None
+
+
+def sorted_pairs(folder, processed_folder, result_folder, by):
+    with instrument.stage("scan"):
+        index = FolderIndex(folder, processed_folder, result_folder)
+        pending = index.pending()
+    with instrument.stage("sort"):
+        files = sort_files(folder, pending, by, stats=index.stats())
+    return files, make_pairs(files)
+
+
+def cmd_batch(args):
+    folder = os.path.abspath(args.folder)
+    if not os.path.isdir(folder):
+        emit("error", error=f"文件夹不存在: {folder}")
+        return 2
+
+    if args.stats or args.trace:
+        instrument.enable(args.trace)
+    else:
+        instrument.enable_from_env()
+
+    processed_folder, result_folder = prepare_folders(folder)
+    # 先收尾上次中断在移动源文件途中的组，再扫描配对
+    manifest = BatchManifest(result_folder)
+    for pair in manifest.recover(folder, processed_folder):
+        emit("recovered", inputs=list(pair))
+    files, pairs = sorted_pairs(folder, processed_folder, result_folder, args.sort)
+
+    profile_pair = profile_path = None
+    if args.profile_pair:
+        if not 1 <= args.profile_pair <= len(pairs):
+            emit("error", error=f"--profile-pair 超出范围 (共 {len(pairs)} 组)")
+            manifest.close()
+            instrument.disable()
+            return 2
+        profile_pair = pairs[args.profile_pair - 1]
+        profile_path = os.path.abspath(args.profile_out or f"pair-{args.profile_pair}.prof")
+
+    engine = BatchEngine(
+        folder, processed_folder, result_folder,
+        direction=DIRECTIONS[args.direction],
+        workers=args.workers,
+        pool=args.pool,
+        merge_options=merge_options(args),
+        keep_sources=args.keep_sources,
+        manifest=manifest,
+        profile_pair=profile_pair,
+        profile_path=profile_path,
+        memory_limit=memory_limit(args),
+    )
+    # Ctrl+C / SIGTERM：停止提交新任务，等正在处理的组完成
+    signal.signal(signal.SIGINT, lambda *_: engine.cancel())
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, lambda *_: engine.cancel())
+
+    emit("start", folder=folder, images=len(files), pairs=len(pairs),
+         workers=engine.workers, direction=engine.direction, encoder=engine.encoder.name,
+         derivatives=engine.derivatives)
+
+    try:
+        ok, failed = engine.run(
+            pairs,
+            on_progress=lambda done, total, pair, name: emit(
+                "merged", done=done, total=total, inputs=list(pair), output=name),
+            on_error=lambda done, total, pair, msg: emit(
+                "failed", done=done, total=total, inputs=list(pair), error=msg),
+        )
+    finally:
+        manifest.close()
+        recorder = instrument.disable()
+
+    emit("finished", merged=ok, failed=failed, skipped=engine.skipped,
+         cancelled=engine.cancelled)
+    if recorder is not None:
+        # 汇总作为事件输出，可读的表格写到 stderr，不干扰 stdout 的 JSON
+        emit("stats", **recorder.summary())
+        print(recorder.format_summary(), file=sys.stderr)
+    if profile_path:
+        emit("profile", inputs=list(profile_pair), path=profile_path)
+    if engine.cancelled:
+        return 130
+    return 1 if failed else 0
+
+
+# --------------------------
+# plan 子命令：只估计，不拼接、不移动文件
+# --------------------------
+def cmd_plan(args):
+    folder = os.path.abspath(args.folder)
+    if not os.path.isdir(folder):
+        emit("error", error=f"文件夹不存在: {folder}")
+        return 2
+
+    # 不创建 processed/ result/，也不收尾上次中断的组
+    processed_folder = os.path.join(folder, "processed")
+    result_folder = os.path.join(folder, "result")
+    manifest = BatchManifest(result_folder, compact=False)
+    files, pairs = sorted_pairs(folder, processed_folder, result_folder, args.sort)
+
+    engine = BatchEngine(
+        folder, processed_folder, result_folder,
+        direction=DIRECTIONS[args.direction],
+        workers=args.workers,
+        merge_options=merge_options(args),
+        manifest=manifest,
+        memory_limit=memory_limit(args),
+    )
+    todo = [pair for pair, _ in engine.plan(pairs)]
+    estimates = estimate_pairs(folder, todo, engine.direction, engine.merge_options)
+    rates = None
+    if args.calibrate:
+        rates = calibrate(folder, estimates, engine.direction, engine.merge_options)
+        estimates = estimate_pairs(folder, todo, engine.direction, engine.merge_options, rates)
+
+    for e in estimates:
+        emit("pair", inputs=list(e.pair), peak_bytes=e.peak_bytes, seconds=round(e.seconds, 3),
+             streaming=e.streaming, lossless=e.lossless)
+    seconds, peak = simulate(estimates, engine.workers, engine.memory_limit)
+    largest = max((e.peak_bytes for e in estimates), default=0)
+    emit("plan", folder=folder, images=len(files), pairs=len(pairs), skipped=engine.skipped,
+         workers=engine.workers, memory_limit=engine.memory_limit,
+         estimated_seconds=round(seconds, 1),
+         serial_seconds=round(sum(e.seconds for e in estimates), 1),
+         estimated_peak_bytes=peak, largest_pair_bytes=largest,
+         streaming=sum(e.streaming for e in estimates),
+         lossless=sum(e.lossless for e in estimates),
+         calibrated=rates is not None)
+
+    mb = 1024 * 1024
+    print(f"{len(estimates)} 组待处理 (跳过 {engine.skipped} 组)，{engine.workers} 个并行，"
+          f"预计 {seconds:.1f} 秒，峰值内存约 {peak / mb:.0f} MB "
+          f"(最大的一组 {largest / mb:.0f} MB)", file=sys.stderr)
+    return 0
+
+
+# --------------------------
+# watch 子命令：热文件夹，新图片写完后自动配对拼接
+# --------------------------
+def cmd_watch(args):
+    from .watch import HotFolder
+
+    folder = os.path.abspath(args.folder)
+    if not os.path.isdir(folder):
+        emit("error", error=f"文件夹不存在: {folder}")
+        return 2
+
+    options = merge_options(args)
+    if args.max_memory and "memory_budget" not in options:
+        # 与批量模式一致：单组就超出预算时改用流式拼接
+        options["memory_budget"] = memory_limit(args)
+    hot = HotFolder(folder, direction=DIRECTIONS[args.direction], sort_by=args.sort,
+                    workers=args.workers, pool=args.pool, merge_options=options,
+                    keep_sources=args.keep_sources, settle=args.settle,
+                    poll_interval=args.poll, on_event=emit)
+    # Ctrl+C / SIGTERM：停止监视，等正在处理的组完成
+    signal.signal(signal.SIGINT, lambda *_: hot.stop())
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, lambda *_: hot.stop())
+
+    ok, failed = hot.run()
+    emit("finished", merged=ok, failed=failed)
+    return 1 if failed else 0
+
+
+# --------------------------
+# serve 子命令：常驻的本地 HTTP 拼接服务
+# --------------------------
+def cmd_serve(args):
+    import asyncio
+    from .service import MergeService
+
+    service = MergeService(args.host, args.port, workers=args.workers, pool=args.pool,
+                           queue_size=args.queue, batch_size=args.batch,
+                           max_body=args.max_body * 1024 * 1024)
+
+    async def serve():
+        # Ctrl+C / SIGTERM：停止接收新请求，处理完排队中的再退出
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, getattr(signal, "SIGTERM", None)):
+            if sig is not None:
+                try:
+                    loop.add_signal_handler(sig, stop.set)
+                except NotImplementedError:  # Windows
+                    signal.signal(sig, lambda *_: loop.call_soon_threadsafe(stop.set))
+        await service.run(stop, on_ready=lambda s: emit(
+            "listening", url=f"http://{s.host}:{s.port}", workers=s.workers, pool=s.pool,
+            queue_size=s.queue_size, batch_size=s.batch_size))
+
+    asyncio.run(serve())
+    emit("stopped", **service.metrics.snapshot())
+    return 0
+
+
+def add_merge_arguments(p):
+    """batch、plan 和 watch 共用的参数"""
+    p.add_argument("folder", help="图片文件夹")
+    p.add_argument("--sort", choices=["time", "name"], default="time",
+                   help="排序方式：拍摄时间 (默认) 或文件名")
+    p.add_argument("--direction", choices=sorted(DIRECTIONS), default="h",
+                   help="拼接方向：h 左右 (默认)，v 上下")
+    p.add_argument("--workers", type=int, default=None,
+                   help="并行数，默认为 CPU 核心数")
+    p.add_argument("--memory-budget", type=int, default=None, metavar="MB",
+                   help="单组拼接的内存预算 (MB)，超出时按条带流式拼接")
+    p.add_argument("--max-memory", type=int, default=None, metavar="MB",
+                   help="同时处理的各组估计峰值内存之和上限 (MB)：大组少并行、小组多并行")
+    p.add_argument("--encoder", choices=list(PROFILES), default=DEFAULT_PROFILE,
+                   help="输出编码配置：" + "；".join(   # argparse 会把 % 当作格式符
+                       f"{p.name} {p.description}" for p in PROFILES.values()).replace("%", "%%"))
+    p.add_argument("--resample", choices=list(RESAMPLE_FILTERS), default=None,
+                   help="缩放滤镜，默认 bicubic；lanczos 更锐利，box 最快")
+    p.add_argument("--no-lossless", dest="lossless", action="store_false",
+                   help="不使用 jpegtran 无损拼接，总是解码后重新编码")
+    p.add_argument("--derivative", dest="derivatives", action="append", default=[],
+                   type=derivative_arg, metavar="NAME[:SIZE[:ENCODER[:QUALITY]]]",
+                   help="同时输出的派生版本，写入 result/NAME/，可重复；预设："
+                        + "；".join(f"{d.name} 长边 {d.max_side} {d.encoder}"
+                                    for d in PRESETS.values())
+                        + "。例如 --derivative web --derivative thumb:240:webp:70")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m twopicmerge",
+        description="2PicMerge 命令行模式 (无需图形界面)",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_batch = sub.add_parser("batch", help="批量拼接文件夹中的图片")
+    add_merge_arguments(p_batch)
+    p_batch.add_argument("--pool", choices=["process", "thread"], default="process",
+                         help="并行方式，默认多进程")
+    p_batch.add_argument("--keep-sources", action="store_true",
+                         help="不移动源图到 processed/；再次运行时只重建输入有变化的结果")
+    p_batch.add_argument("--stats", action="store_true",
+                         help="统计各阶段耗时、字节/像素数和缓存命中率，结束时输出汇总")
+    p_batch.add_argument("--trace", default=None, metavar="FILE",
+                         help="把每个阶段的计时追加写入 JSON Lines 文件 (隐含 --stats)")
+    p_batch.add_argument("--profile-pair", type=int, default=None, metavar="N",
+                         help="对第 N 组 (从 1 开始) 做 cProfile + tracemalloc")
+    p_batch.add_argument("--profile-out", default=None, metavar="FILE",
+                         help="--profile-pair 的 cProfile 输出文件，默认 pair-N.prof")
+    p_batch.set_defaults(func=cmd_batch)
+
+    p_plan = sub.add_parser("plan", help="预演批量拼接：按文件头估计耗时和峰值内存，不修改任何文件")
+    add_merge_arguments(p_plan)
+    p_plan.add_argument("--calibrate", action="store_true",
+                        help="先把一组实际拼接到临时目录，按本机速度估计耗时")
+    p_plan.set_defaults(func=cmd_plan)
+
+    p_watch = sub.add_parser("watch", help="监视文件夹，新图片写完后自动配对拼接 (Ctrl+C 停止)")
+    add_merge_arguments(p_watch)
+    p_watch.add_argument("--pool", choices=["process", "thread"], default="process",
+                         help="并行方式，默认多进程")
+    p_watch.add_argument("--keep-sources", action="store_true",
+                         help="不移动源图到 processed/")
+    p_watch.add_argument("--settle", type=float, default=1.0, metavar="SECONDS",
+                         help="文件大小和修改时间保持这么久不变才认为写完 (默认 1 秒)")
+    p_watch.add_argument("--poll", type=float, default=1.0, metavar="SECONDS",
+                         help="不支持 inotify 的系统上检查文件夹的间隔 (默认 1 秒)")
+    p_watch.set_defaults(func=cmd_watch)
+
+    p_serve = sub.add_parser("serve", help="常驻的本地 HTTP 拼接服务 (POST /merge、/health、/metrics)")
+    p_serve.add_argument("--host", default="127.0.0.1", help="监听地址，默认只接受本机连接")
+    p_serve.add_argument("--port", type=int, default=8765, help="端口，默认 8765 (0 为自动分配)")
+    p_serve.add_argument("--workers", type=int, default=None,
+                         help="并行数，默认为 CPU 核心数")
+    p_serve.add_argument("--pool", choices=["process", "thread"], default="process",
+                         help="并行方式，默认多进程")
+    p_serve.add_argument("--queue", type=int, default=64, metavar="N",
+                         help="排队请求上限，超出时返回 503 (默认 64)")
+    p_serve.add_argument("--batch", type=int, default=4, metavar="N",
+                         help="一个工作进程一次最多取走的排队请求数 (默认 4)")
+    p_serve.add_argument("--max-body", type=int, default=64, metavar="MB",
+                         help="单个请求的大小上限 (MB，默认 64)")
+    p_serve.set_defaults(func=cmd_serve)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
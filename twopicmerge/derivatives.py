@@ -0,0 +1,179 @@
+"""
+派生版本：一次拼接同时输出几种尺寸 / 格式 / 质量 (例如网页大图和缩略图)。
+
+    merge_images(a, b, "result/a_b.jpg", derivatives=["web", "thumb:240:webp"])
+    # → result/a_b.jpg、result/web/a_b.jpg、result/thumb/a_b.webp
+
+所有派生版本都从同一张拼好的画布生成，原图只解码一次。
+按尺寸从大到小逐级缩小，每一级从上一级缩小而不是从全尺寸画布缩小；
+各版本的编码在线程池中并行 (Pillow 编码时释放 GIL)。
+"""
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from . import instrument
+from .encoders import DEFAULT_PROFILE, check_size, get_profile, save_options
+
+# 名称 (结果所在的子文件夹)、长边上限 (None 为不缩小)、编码配置、质量 (None 为编码配置的质量)
+Derivative = namedtuple("Derivative", "name max_side encoder quality")
+
+PRESETS = {d.name: d for d in (
+    Derivative("web", 2048, "balanced", None),
+    Derivative("thumb", 320, "fast", 80),
+)}
+
+_NAME_RE = re.compile(r"[\w-]+")
+
+
+# --------------------------
+# 解析：预设名称或 名称:长边[:编码配置[:质量]]
+# --------------------------
+def parse_derivative(spec):
+    """
+    "web" → 预设；"web:1600" 只改预设的长边；"small:800:webp:70" 完整指定。
+    长边写 0 表示不缩小 (只换格式或质量)。格式不对时抛出 ValueError。
+    """
+    if isinstance(spec, Derivative):
+        return spec
+    name, *fields = str(spec).split(":")
+    if not _NAME_RE.fullmatch(name) or len(fields) > 3:
+        raise ValueError(f"派生版本格式不对: {spec} (应为 名称[:长边[:编码配置[:质量]]])")
+    preset = PRESETS.get(name)
+    if preset is None and not fields:
+        raise ValueError(f"未知的派生版本: {name} (预设: {', '.join(PRESETS)}，"
+                         "或写成 名称:长边[:编码配置[:质量]])")
+    max_side, encoder, quality = preset[1:] if preset else (None, DEFAULT_PROFILE, None)
+    try:
+        if fields and fields[0]:
+            max_side = int(fields[0]) or None
+        if len(fields) > 2 and fields[2]:
+            quality = int(fields[2])
+    except ValueError:
+        raise ValueError(f"派生版本的长边和质量必须是整数: {spec}") from None
+    if len(fields) > 1 and fields[1]:
+        encoder = fields[1]
+    encoder = get_profile(encoder).name
+    if (max_side is not None and max_side < 0) or (quality is not None
+                                                   and not 1 <= quality <= 100):
+        raise ValueError(f"派生版本的长边不能为负，质量应在 1~100: {spec}")
+    return Derivative(name, max_side, encoder, quality)
+
+
+def resolve_derivatives(specs):
+    """字符串或 Derivative 的列表 → Derivative 元组；名称不能重复"""
+    derivatives = tuple(parse_derivative(s) for s in specs or ())
+    names = [d.name for d in derivatives]
+    duplicated = sorted({n for n in names if names.count(n) > 1})
+    if duplicated:
+        raise ValueError(f"派生版本名称重复: {', '.join(duplicated)}")
+    return derivatives
+
+
+def derivative_key(derivatives):
+    """写入批量日志的标识 (与命令行写法相同)：派生版本设置变了要重新拼接"""
+    return [f"{d.name}:{d.max_side or 0}:{d.encoder}" + (f":{d.quality}" if d.quality else "")
+            for d in resolve_derivatives(derivatives)]
+
+
+# --------------------------
+# 尺寸和路径
+# --------------------------
+def derivative_size(size, max_side):
+    """按长边上限等比缩小后的尺寸；不需要缩小时原样返回"""
+    w, h = size
+    if not max_side or max(w, h) <= max_side:
+        return size
+    scale = max_side / max(w, h)
+    return max(1, round(w * scale)), max(1, round(h * scale))
+
+
+def derivative_path(output_path, derivative):
+    """result/a_b.jpg → result/<名称>/a_b.<派生版本的扩展名>"""
+    folder, name = os.path.split(output_path)
+    base = os.path.splitext(name)[0]
+    return os.path.join(folder, derivative.name,
+                        base + get_profile(derivative.encoder).extension)
+
+
+def _largest_first(derivatives):
+    return sorted(derivatives, key=lambda d: -(d.max_side or float("inf")))
+
+
+def decode_size(size, derivatives):
+    """生成所有派生版本至少需要的解码尺寸 (最大的一个)"""
+    sizes = [derivative_size(size, d.max_side) for d in derivatives]
+    return max(sizes, key=lambda s: s[0] * s[1], default=size)
+
+
+# --------------------------
+# 逐级缩小 + 并行编码
+# --------------------------
+def cascade(image, derivatives, resample=None, reducing_gap=None, full_size=None):
+    """
+    按尺寸从大到小产出 (Derivative, 图片)，每一级从上一级缩小。
+    目标尺寸都按 full_size (默认为 image 的尺寸) 计算，逐级缩小不会累积取整误差；
+    image 是低分辨率解码的结果时 full_size 给出原始尺寸。
+    """
+    full_size = full_size or image.size
+    current = image
+    for d in _largest_first(derivatives):
+        size = derivative_size(full_size, d.max_side)
+        if current.size != size:
+            with instrument.stage("merge.derive"):
+                current = current.resize(size, resample, reducing_gap=reducing_gap)
+            instrument.count("pixels.resized", size[0] * size[1])
+        yield d, current
+
+
+def derivative_options(derivative, tables=()):
+    """派生版本的 Image.save 参数：编码配置的参数，指定了质量时覆盖"""
+    options = save_options(derivative.encoder, tables)
+    if derivative.quality is not None:
+        options.pop("qtables", None)
+        options["quality"] = derivative.quality
+    return options
+
+
+def _encode(image, path, options):
+    with instrument.stage("merge.encode"):
+        image.save(path, **options)
+    instrument.count("pixels.encoded", image.width * image.height)
+
+
+def save_with_derivatives(image, output_path, encoder=None, tables=(), derivatives=(),
+                          resample=None, reducing_gap=None, save_main=True, full_size=None):
+    """
+    把 image 编码到 output_path (save_main=False 时跳过，例如无损拼接已经写好)，
+    并生成全部派生版本，返回派生版本的路径列表。full_size 见 cascade()。
+    主结果和已缩小好的各级一边缩小一边提交编码，线程数不超过 CPU 核心数。
+    """
+    derivatives = resolve_derivatives(derivatives)
+    profile = get_profile(encoder)
+    if save_main:
+        check_size(profile, image.size)
+    for d in derivatives:
+        check_size(d.encoder, derivative_size(full_size or image.size, d.max_side))
+
+    jobs = len(derivatives) + bool(save_main)
+    paths = []
+    with ThreadPoolExecutor(max_workers=max(1, min(jobs, os.cpu_count() or 1))) as pool:
+        futures = []
+        if save_main:
+            futures.append(pool.submit(_encode, image, output_path,
+                                       save_options(profile, tables)))
+        submitted = {id(image)} if save_main else set()
+        for d, level in cascade(image, derivatives, resample, reducing_gap, full_size):
+            path = derivative_path(output_path, d)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if id(level) in submitted:
+                # 同一张图 (不需要缩小的一级) 同时编码两次：save() 会把参数记在图片对象上，
+                # 两个线程不能共用一个图片对象，所以复制一份
+                level = level.copy()
+            submitted.add(id(level))
+            futures.append(pool.submit(_encode, level, path, derivative_options(d, tables)))
+            paths.append(path)
+        for future in futures:
+            future.result()
+    return paths
@@ -0,0 +1,103 @@
+from collections import namedtuple
+
+# 编码配置：名称、Pillow 格式、结果扩展名、传给 Image.save 的参数
+EncoderProfile = namedtuple("EncoderProfile", "name format extension options description")
+
+# quality="keep" 时源图不是 JPEG (或已转换过、拿不到量化表) 的回退参数
+_KEEP_FALLBACK = {"quality": 95, "subsampling": "4:4:4"}
+# WebP 单边最大像素数 (libwebp 限制)
+WEBP_MAX_SIDE = 16383
+
+PROFILES = {p.name: p for p in (
+    EncoderProfile("default", "JPEG", ".jpg", {},
+                   "JPEG，Pillow 默认参数 (质量 75)"),
+    EncoderProfile("fast", "JPEG", ".jpg",
+                   {"quality": 85, "subsampling": "4:2:0"},
+                   "JPEG 质量 85，编码最快"),
+    EncoderProfile("balanced", "JPEG", ".jpg",
+                   {"quality": 90, "subsampling": "4:2:0", "optimize": True},
+                   "JPEG 质量 90，优化霍夫曼表 (文件更小，编码稍慢)"),
+    EncoderProfile("archive", "JPEG", ".jpg",
+                   {"quality": "keep", "optimize": True, "progressive": True},
+                   "JPEG 沿用原图量化表和色度采样，渐进式"),
+    EncoderProfile("webp", "WEBP", ".webp",
+                   {"quality": 85, "method": 4},
+                   "WebP 质量 85，通常比 JPEG 小 25% 以上"),
+    EncoderProfile("png", "PNG", ".png",
+                   {"compress_level": 6},
+                   "PNG 无损，文件最大"),
+)}
+DEFAULT_PROFILE = "default"
+
+
+def get_profile(profile=None):
+    """名称或 EncoderProfile → EncoderProfile；None 为默认配置，未知名称抛出 ValueError"""
+    if isinstance(profile, EncoderProfile):
+        return profile
+    try:
+        return PROFILES[profile or DEFAULT_PROFILE]
+    except KeyError:
+        raise ValueError(f"未知的编码配置: {profile} (可选: {', '.join(PROFILES)})") from None
+
+
+# --------------------------
+# quality="keep"：沿用原图的量化表
+# --------------------------
+def source_tables(img):
+    """
+    JPEG 原图的 (量化表, 色度采样)，拿不到时返回 None。
+    必须在图片被缩放/转换之前调用 (新图片不再带有量化表)。
+    """
+    qtables = getattr(img, "quantization", None)
+    if not qtables:
+        return None
+    # 图片已经是 JPEG，插件早已加载，这里导入不额外花时间
+    from PIL import JpegImagePlugin
+
+    return qtables, JpegImagePlugin.get_sampling(img)
+
+
+def _finer(tables):
+    """几张原图中量化表最细 (亮度表之和最小，即画质最高) 的一张"""
+    tables = [t for t in tables if t]
+    if not tables:
+        return None
+    return min(tables, key=lambda t: sum(t[0][min(t[0])]))
+
+
+def save_options(profile, tables=()):
+    """
+    Image.save 的参数 (含 format)。
+    tables：各原图 source_tables() 的结果，profile 使用 quality="keep" 时
+    取其中最细的量化表和对应的色度采样，拼接结果画质不低于任何一张原图。
+    """
+    profile = get_profile(profile)
+    options = dict(profile.options, format=profile.format)
+    if options.get("quality") == "keep":
+        del options["quality"]
+        best = _finer(tables)
+        if best is None:
+            options.update(_KEEP_FALLBACK)
+        else:
+            qtables, sampling = best
+            options["qtables"] = qtables
+            if sampling != -1:
+                options["subsampling"] = sampling
+    return options
+
+
+def allows_lossless(profile):
+    """
+    JPEG 无损拼接保留原图的画质：只用于沿用原图画质 (archive) 或没有指定质量 (default)
+    的配置；fast / balanced 等按配置的质量重新编码。
+    """
+    profile = get_profile(profile)
+    return profile.format == "JPEG" and profile.options.get("quality", "keep") == "keep"
+
+
+def check_size(profile, size):
+    """画布尺寸超出格式限制时抛出 ValueError (避免编码到一半才失败)"""
+    profile = get_profile(profile)
+    if profile.format == "WEBP" and max(size) > WEBP_MAX_SIDE:
+        raise ValueError(f"WebP 单边不能超过 {WEBP_MAX_SIDE} 像素 ({size[0]}x{size[1]})，"
+                         "请改用 JPEG 或 PNG")
@@ -0,0 +1,221 @@
+import struct
+import datetime
+
+# EXIF (TIFF) 标签
+TAG_JPEG_IF_OFFSET = 0x0201  # IFD1: 内嵌缩略图偏移
+TAG_JPEG_IF_LENGTH = 0x0202  # IFD1: 内嵌缩略图长度
+TAG_EXIF_IFD = 0x8769        # IFD0: Exif 子 IFD 指针
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_DATETIME_DIGITIZED = 0x9004
+
+# 按顺序尝试的拍摄时间字段
+DATE_TAGS = (TAG_DATETIME_ORIGINAL, TAG_DATETIME_DIGITIZED)
+
+
+# --------------------------
+# 最小 TIFF/IFD 解析 (只读需要的标签，不解码图片)
+# --------------------------
+def _tiff_header(data):
+    """返回 (字节序, 去掉 'Exif' 前缀的 TIFF 数据)，格式不对返回 (None, None)"""
+    if data.startswith(b"Exif\x00\x00"):
+        data = data[6:]
+    if data[:2] == b"II":
+        return "<", data
+    if data[:2] == b"MM":
+        return ">", data
+    return None, None
+
+
+def read_ifd(data, offset, bo):
+    """读取一个 IFD，返回 ({标签: (类型, 数量, 值或偏移字段)}, 下一个 IFD 偏移)"""
+    (count,) = struct.unpack_from(bo + "H", data, offset)
+    entries = {}
+    pos = offset + 2
+    for _ in range(count):
+        tag, typ, n = struct.unpack_from(bo + "HHI", data, pos)
+        entries[tag] = (typ, n, data[pos + 8:pos + 12])
+        pos += 12
+    (next_offset,) = struct.unpack_from(bo + "I", data, pos)
+    return entries, next_offset
+
+
+def entry_long(entry, bo):
+    """SHORT/LONG 类型标签的整数值"""
+    typ, _, raw = entry
+    if typ == 3:  # SHORT
+        return struct.unpack_from(bo + "H", raw)[0]
+    return struct.unpack_from(bo + "I", raw)[0]
+
+
+# --------------------------
+# 内嵌缩略图 (IFD1)
+# --------------------------
+def embedded_thumbnail(exif_bytes):
+    """从 EXIF 数据中取出相机写入的 JPEG 缩略图字节，没有则返回 None"""
+    if not exif_bytes:
+        return None
+    try:
+        bo, data = _tiff_header(exif_bytes)
+        if bo is None:
+            return None
+        (ifd0,) = struct.unpack_from(bo + "I", data, 4)
+        _, ifd1 = read_ifd(data, ifd0, bo)
+        if not ifd1:
+            return None
+        entries, _ = read_ifd(data, ifd1, bo)
+        if TAG_JPEG_IF_OFFSET not in entries or TAG_JPEG_IF_LENGTH not in entries:
+            return None
+        start = entry_long(entries[TAG_JPEG_IF_OFFSET], bo)
+        length = entry_long(entries[TAG_JPEG_IF_LENGTH], bo)
+        thumb = data[start:start + length]
+    except struct.error:
+        return None
+
+    if len(thumb) != length or not thumb.startswith(b"\xff\xd8"):
+        return None
+    return thumb
+
+
+# --------------------------
+# 拍摄时间
+# --------------------------
+def _entry_ascii(data, entry, bo):
+    typ, n, raw = entry
+    if typ != 2:  # ASCII
+        return None
+    if n <= 4:
+        value = raw[:n]
+    else:
+        (offset,) = struct.unpack_from(bo + "I", raw)
+        value = data[offset:offset + n]
+        if len(value) < n:  # EXIF 数据被截断
+            return None
+    return value.split(b"\x00", 1)[0].decode("ascii", "replace").strip()
+
+
+def capture_time_from_exif(exif_bytes):
+    """从 EXIF 数据中读取拍摄时间 (DateTimeOriginal → DateTimeDigitized)，没有返回 None"""
+    if not exif_bytes:
+        return None
+    try:
+        bo, data = _tiff_header(exif_bytes)
+        if bo is None:
+            return None
+        (ifd0,) = struct.unpack_from(bo + "I", data, 4)
+        entries, _ = read_ifd(data, ifd0, bo)
+        if TAG_EXIF_IFD not in entries:
+            return None
+        sub, _ = read_ifd(data, entry_long(entries[TAG_EXIF_IFD], bo), bo)
+        for tag in DATE_TAGS:
+            if tag not in sub:
+                continue
+            value = _entry_ascii(data, sub[tag], bo)
+            try:
+                return datetime.datetime.strptime(value, "%Y:%m:%d %H:%M:%S")
+            except (TypeError, ValueError):
+                pass
+    except struct.error:
+        pass
+    return None
+
+
+# --------------------------
+# 只读文件头：尺寸、格式、EXIF (不解码像素)
+# --------------------------
+# 带尺寸信息的 JPEG SOF 标记 (排除 DHT/JPG/DAC)
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def _read_jpeg_header(f):
+    width = height = None
+    exif_bytes = None
+    while True:
+        byte = f.read(1)
+        if not byte:
+            break
+        if byte != b"\xff":
+            continue
+        marker = f.read(1)
+        while marker == b"\xff":  # 填充字节
+            marker = f.read(1)
+        if not marker:
+            break
+        code = marker[0]
+        if code == 0xD8 or 0xD0 <= code <= 0xD7 or code == 0x01:
+            continue  # 没有长度字段的标记
+        if code in (0xD9, 0xDA):  # EOI / SOS：头部结束
+            break
+        raw = f.read(2)
+        if len(raw) < 2:
+            break
+        (length,) = struct.unpack(">H", raw)
+        if length < 2:
+            break  # 长度字段损坏
+        if (code == 0xE1 and exif_bytes is None) or code in _SOF_MARKERS:
+            payload = f.read(length - 2)
+            if len(payload) < length - 2:
+                break  # 文件被截断
+            if code in _SOF_MARKERS:
+                if len(payload) >= 5:
+                    height, width = struct.unpack_from(">HH", payload, 1)
+                break  # EXIF 在 SOF 之前
+            if payload.startswith(b"Exif\x00\x00"):
+                exif_bytes = payload
+            continue
+        f.seek(length - 2, 1)
+    return width, height, exif_bytes
+
+
+def _read_png_header(f):
+    f.seek(8)
+    width = height = None
+    exif_bytes = None
+    while True:
+        head = f.read(8)
+        if len(head) < 8:
+            break
+        length, ctype = struct.unpack(">I4s", head)
+        if ctype in (b"IHDR", b"eXIf"):
+            payload = f.read(length)
+            if len(payload) < length:
+                break  # 文件被截断
+            if ctype == b"IHDR":
+                if length < 8:
+                    break
+                width, height = struct.unpack_from(">II", payload)
+            else:
+                exif_bytes = payload
+            f.seek(4, 1)
+        elif ctype in (b"IDAT", b"IEND"):
+            break
+        else:
+            f.seek(length + 4, 1)
+    return width, height, exif_bytes
+
+
+def read_header(path):
+    """
+    只读取文件头，返回 (格式, 宽, 高, 拍摄时间或 None)。
+    JPEG/PNG 用内置解析器，其他格式交给 Pillow (Image.open 也只读头部)。
+    """
+    with open(path, "rb") as f:
+        magic = f.read(8)
+        f.seek(0)
+        if magic.startswith(b"\xff\xd8"):
+            fmt = "JPEG"
+            f.seek(2)
+            width, height, exif_bytes = _read_jpeg_header(f)
+        elif magic == b"\x89PNG\r\n\x1a\n":
+            fmt = "PNG"
+            width, height, exif_bytes = _read_png_header(f)
+        else:
+            fmt = None
+
+    if fmt is None or width is None:
+        from PIL import Image
+        with Image.open(path) as img:
+            fmt, (width, height) = img.format, img.size
+            exif_bytes = img.info.get("exif")
+
+    return fmt, width, height, capture_time_from_exif(exif_bytes)
@@ -0,0 +1 @@
+# 2PicMerge 图形界面 (PyQt6)；核心逻辑在上层包中，不依赖这里
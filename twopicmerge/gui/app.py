@@ -0,0 +1,35 @@
+import sys
+import os
+
+from PyQt6.QtWidgets import QApplication
+from PyQt6.QtGui import QIcon
+
+from .. import instrument
+from .style import STYLE_SHEET
+from .window import ImageSelector
+
+
+def build(argv, icon_path=None):
+    """创建 QApplication 和主窗口 (不进入事件循环)，返回 (app, win)"""
+    app = QApplication(argv)
+
+    # 设置应用图标
+    if icon_path and os.path.exists(icon_path):
+        app.setWindowIcon(QIcon(icon_path))
+    app.setStyleSheet(STYLE_SHEET)
+
+    win = ImageSelector()
+    win.show()
+    return app, win
+
+
+def main(argv=None, icon_path=None):
+    # TWOPICMERGE_PROFILE=1 / TWOPICMERGE_TRACE=<文件>：统计各阶段耗时，退出时输出汇总
+    instrument.enable_from_env()
+
+    app, win = build(sys.argv if argv is None else argv, icon_path)
+    code = app.exec()
+    recorder = instrument.disable()
+    if recorder is not None:
+        print(recorder.format_summary(), file=sys.stderr)
+    return code
@@ -0,0 +1,318 @@
+import sys
+import os
+
+from PyQt6.QtWidgets import (
+    QApplication, QLabel, QPushButton, QVBoxLayout, QMessageBox, QDialog, QHBoxLayout,
+    QRadioButton, QGroupBox, QSpinBox, QProgressBar, QListView, QCheckBox
+)
+from PyQt6.QtCore import Qt, QObject, QThread, pyqtSignal, QSize
+
+from .. import instrument
+from ..merge import merge_preview
+from ..batch import BatchEngine, make_pairs
+from ..manifest import BatchManifest
+from ..scan import sort_files
+from .models import PairPreviewModel
+from .viewer import ImagePreviewDialog
+from .widgets import encoder_combo
+
+
+# --------------------------
+# 批量处理窗口
+# --------------------------
+class BatchDialog(QDialog):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("批量拼接设置")
+        
+        # Set size to 80% of screen
+        screen = QApplication.primaryScreen().availableGeometry()
+        self.resize(int(screen.width() * 0.8), int(screen.height() * 0.8))
+        
+        self.parent_win = parent
+
+        layout = QVBoxLayout(self)
+
+        # 1. 排序设置
+        group_sort = QGroupBox("1. 图片排序方式")
+        layout_sort = QHBoxLayout()
+        self.rb_time = QRadioButton("按拍摄时间 (默认)")
+        self.rb_name = QRadioButton("按文件名")
+        self.rb_time.setChecked(True)
+        layout_sort.addWidget(self.rb_time)
+        layout_sort.addWidget(self.rb_name)
+        group_sort.setLayout(layout_sort)
+        layout.addWidget(group_sort)
+
+        # 2. 拼接方向
+        group_dir = QGroupBox("2. 拼接方向")
+        layout_dir = QHBoxLayout()
+        self.rb_h_batch = QRadioButton("左右拼接")
+        self.rb_v_batch = QRadioButton("上下拼接")
+        self.rb_h_batch.setChecked(True)
+        self.rb_v_batch.toggled.connect(self.on_direction_changed)
+        layout_dir.addWidget(self.rb_h_batch)
+        layout_dir.addWidget(self.rb_v_batch)
+        group_dir.setLayout(layout_dir)
+        layout.addWidget(group_dir)
+
+        # 3. 预览区域
+        self.group_preview = QGroupBox("3. 预览 (全部配对，滚动到时生成)")
+        preview_container_layout = QVBoxLayout()
+
+        # 所有配对放在一个列表视图中，只有滚动到可见的组才会生成预览
+        self.preview_model = PairPreviewModel(self)
+        self.preview_view = QListView()
+        self.preview_view.setModel(self.preview_model)
+        self.preview_view.setIconSize(QSize(*PairPreviewModel.PREVIEW_SIZE))
+        self.preview_view.setUniformItemSizes(True)
+        self.preview_view.setSpacing(4)
+        self.preview_view.setFrameShape(QListView.Shape.NoFrame)
+        # 点击查看大图
+        self.preview_view.clicked.connect(self.open_large_preview)
+
+        preview_container_layout.addWidget(self.preview_view)
+        self.group_preview.setLayout(preview_container_layout)
+
+        layout.addWidget(self.group_preview)
+
+        # 进度条 (批量拼接时显示)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setVisible(False)
+        layout.addWidget(self.progress_bar)
+
+        # 按钮区
+        hbox_btn = QHBoxLayout()
+        self.cb_keep = QCheckBox("保留原图 (只重建有变化的组)")
+        self.cb_keep.setToolTip("不把源图移动到 processed/；再次运行时跳过输入没变的组")
+        hbox_btn.addWidget(self.cb_keep)
+        hbox_btn.addWidget(QLabel("输出:"))
+        self.combo_encoder = encoder_combo(self.parent_win.combo_encoder.currentData())
+        hbox_btn.addWidget(self.combo_encoder)
+        hbox_btn.addWidget(QLabel("并行数:"))
+        self.spin_workers = QSpinBox()
+        self.spin_workers.setRange(1, max(1, os.cpu_count() or 1) * 2)
+        self.spin_workers.setValue(os.cpu_count() or 1)
+        hbox_btn.addWidget(self.spin_workers)
+        # 内存上限：按文件头估计每组峰值，大组少并行、小组多并行
+        self.spin_memory = QSpinBox()
+        self.spin_memory.setRange(0, 1024 * 1024)
+        self.spin_memory.setSingleStep(512)
+        self.spin_memory.setSuffix(" MB")
+        self.spin_memory.setSpecialValueText("内存不限")
+        self.spin_memory.setToolTip("同时处理的各组估计峰值内存之和上限，0 为不限")
+        hbox_btn.addWidget(self.spin_memory)
+        self.btn_preview = QPushButton("生成预览")
+        self.btn_start = QPushButton("开始批量拼接")
+        self.btn_cancel = QPushButton("取消")
+        self.btn_cancel.setEnabled(False)
+        self.btn_preview.clicked.connect(self.generate_preview)
+        self.btn_start.clicked.connect(self.start_batch)
+        self.btn_cancel.clicked.connect(self.cancel_batch)
+        hbox_btn.addWidget(self.btn_preview)
+        hbox_btn.addWidget(self.btn_start)
+        hbox_btn.addWidget(self.btn_cancel)
+        layout.addLayout(hbox_btn)
+
+        self.pairs_to_process = []
+        self.manifest = None
+        self.engine = None
+        self.batch_thread = None
+        self.batch_worker = None
+        self.batch_errors = []
+
+    def get_sorted_files(self):
+        # 上次批量在移动源图途中被中断的组先收尾，否则落单的图会和别的图重新配对
+        parent = self.parent_win
+        manifest = BatchManifest(parent.result_folder)
+        try:
+            manifest.recover(parent.folder, parent.processed_folder)
+        finally:
+            manifest.close()
+
+        # 复用主窗口的文件夹索引，先把还没处理的文件变化同步进来
+        self.parent_win.refresh_folder()
+        index = self.parent_win.folder_index
+        by = 'time' if self.rb_time.isChecked() else 'name'
+        return sort_files(
+            self.parent_win.folder, index.pending(), by,
+            index=self.parent_win.metadata, stats=index.stats(),
+        )
+
+    def batch_direction(self):
+        return 'vertical' if self.rb_v_batch.isChecked() else 'horizontal'
+
+    def generate_preview(self):
+        files = self.get_sorted_files()
+        if len(files) < 2:
+            QMessageBox.warning(self, "提示", "图片数量不足 2 张，无法拼接")
+            return
+
+        # 生成配对 (预览图由列表视图按需生成)
+        self.pairs_to_process = make_pairs(files)
+        self.preview_model.set_pairs(
+            self.parent_win.folder, self.pairs_to_process, self.batch_direction()
+        )
+        self.group_preview.setTitle(f"3. 预览 (共 {len(self.pairs_to_process)} 组)")
+
+        # 视觉引导：生成预览后，焦点给到“开始批量拼接”按钮，并设为默认
+        if self.pairs_to_process:
+            self.btn_start.setFocus()
+            self.btn_start.setDefault(True)
+
+    def on_direction_changed(self):
+        if self.pairs_to_process:
+            self.preview_model.set_direction(self.batch_direction())
+
+    def open_large_preview(self, index):
+        p1, p2 = self.preview_model.pairs[index.row()]
+        QApplication.setOverrideCursor(Qt.CursorShape.WaitCursor)
+        try:
+            image = merge_preview(
+                os.path.join(self.parent_win.folder, p1),
+                os.path.join(self.parent_win.folder, p2),
+                self.batch_direction(), PairPreviewModel.LARGE_SIZE,
+            )
+        except Exception as e:
+            QApplication.restoreOverrideCursor()
+            QMessageBox.warning(self, "错误", f"无法生成预览：{e}")
+            return
+        QApplication.restoreOverrideCursor()
+        dlg = ImagePreviewDialog(parent=self, image=image)
+        dlg.exec()
+
+    def start_batch(self):
+        if not self.pairs_to_process:
+            QMessageBox.warning(self, "提示", "请先生成预览以确认配对")
+            return
+
+        direction = self.batch_direction()
+        # 每组的进度记入 result/ 中的日志，中断后重新运行会跳过已完成的组
+        self.manifest = BatchManifest(self.parent_win.result_folder)
+        self.engine = BatchEngine(
+            self.parent_win.folder,
+            self.parent_win.processed_folder,
+            self.parent_win.result_folder,
+            direction=direction,
+            workers=self.spin_workers.value(),
+            merge_options={"encoder": self.combo_encoder.currentData()},
+            keep_sources=self.cb_keep.isChecked(),
+            manifest=self.manifest,
+            memory_limit=self.spin_memory.value() * 1024 * 1024 or None,
+        )
+        self.batch_errors = []
+        self.batch_crash = None
+
+        self.progress_bar.setRange(0, len(self.pairs_to_process))
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.set_running(True)
+
+        # 在后台线程中运行引擎，界面保持响应
+        self.batch_thread = QThread(self)
+        self.batch_worker = BatchWorker(self.engine, self.pairs_to_process)
+        self.batch_worker.moveToThread(self.batch_thread)
+        self.batch_thread.started.connect(self.batch_worker.run)
+        self.batch_worker.progress.connect(self.on_batch_progress)
+        self.batch_worker.pair_failed.connect(self.on_batch_error)
+        self.batch_worker.error.connect(self.on_batch_crash)
+        # 先让线程退出，on_batch_finished 里才能 wait()
+        self.batch_worker.finished.connect(self.batch_thread.quit)
+        self.batch_worker.finished.connect(self.on_batch_finished)
+        self.batch_thread.start()
+
+    def set_running(self, running):
+        """批量运行期间锁定设置和按钮"""
+        self.btn_preview.setEnabled(not running)
+        self.btn_start.setEnabled(not running)
+        self.spin_workers.setEnabled(not running)
+        self.spin_memory.setEnabled(not running)
+        self.cb_keep.setEnabled(not running)
+        self.combo_encoder.setEnabled(not running)
+        self.btn_cancel.setEnabled(running)
+
+    def cancel_batch(self):
+        if self.engine:
+            self.engine.cancel()
+            self.btn_cancel.setEnabled(False)
+
+    def on_batch_progress(self, done, total, output_name):
+        self.set_progress(done, total)
+        self.progress_bar.setFormat(f"%v/%m  {output_name}")
+
+    def on_batch_error(self, done, total, p1, p2, message):
+        self.set_progress(done, total)
+        self.batch_errors.append(f"{p1} + {p2}: {message}")
+        print(f"Error merging {p1} and {p2}: {message}")
+
+    def set_progress(self, done, total):
+        # 跳过已完成的组后，实际要处理的组数可能比配对数少
+        self.progress_bar.setMaximum(total)
+        self.progress_bar.setValue(done)
+
+    def on_batch_crash(self, message):
+        self.batch_crash = message
+        print(f"Batch failed: {message}")
+
+    def on_batch_finished(self, count, failed, cancelled):
+        self.batch_thread.wait()
+        skipped = self.engine.skipped
+        self.engine = None
+        self.manifest.close()
+        self.set_running(False)
+        if instrument.enabled():
+            print(instrument.recorder().format_summary(), file=sys.stderr)
+
+        if self.batch_crash:
+            # 对话框留着，可以调整设置后重试；已经拼好的组照常从主界面移除
+            self.progress_bar.setVisible(False)
+            QMessageBox.critical(self, "错误",
+                                 f"批量处理中断：{self.batch_crash}\n\n已完成 {count} 组。")
+            self.parent_win.refresh_folder()
+            return
+
+        title = "已取消" if cancelled else "完成"
+        msg = f"批量处理{'已取消' if cancelled else '完成'}，共生成 {count} 张图片。"
+        if skipped:
+            msg += f"\n{skipped} 组此前已完成且输入没变，已跳过。"
+        if failed:
+            msg += f"\n\n{failed} 组失败：\n" + "\n".join(self.batch_errors[:10])
+        QMessageBox.information(self, title, msg)
+        self.accept()
+        self.parent_win.refresh_folder() # 刷新主界面 (只移除已处理的图片)
+
+    def reject(self):
+        # 运行中关闭窗口视为取消，等后台结束后再关闭
+        if self.engine:
+            self.cancel_batch()
+            return
+        super().reject()
+
+
+# --------------------------
+# 批量后台任务 (运行在 QThread 中)
+# --------------------------
+class BatchWorker(QObject):
+    progress = pyqtSignal(int, int, str)        # 已完成, 总数, 输出文件名
+    pair_failed = pyqtSignal(int, int, str, str, str)  # 已完成, 总数, 图1, 图2, 错误信息
+    error = pyqtSignal(str)                     # 引擎本身出错 (不是某一组失败)
+    finished = pyqtSignal(int, int, bool)       # 成功数, 失败数, 是否取消
+
+    def __init__(self, engine, pairs):
+        super().__init__()
+        self.engine = engine
+        self.pairs = list(pairs)
+
+    def run(self):
+        # 无论如何都要发出 finished，否则对话框一直处于运行状态、无法关闭
+        ok = failed = 0
+        try:
+            ok, failed = self.engine.run(
+                self.pairs,
+                on_progress=lambda done, total, pair, name: self.progress.emit(done, total, name),
+                on_error=lambda done, total, pair, msg: self.pair_failed.emit(done, total, pair[0], pair[1], msg),
+            )
+        except Exception as e:
+            self.error.emit(f"{type(e).__name__}: {e}")
+        finally:
+            self.finished.emit(ok, failed, self.engine.cancelled)
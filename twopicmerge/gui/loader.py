@@ -0,0 +1,75 @@
+from PyQt6.QtGui import QImage
+from PyQt6.QtCore import QObject, pyqtSignal, QRunnable, QThreadPool
+
+
+# --------------------------
+# 后台图片加载 (QThreadPool)
+# --------------------------
+class _LoadSignals(QObject):
+    loaded = pyqtSignal(int, str, QImage)  # 批次号, 键, 图片
+
+
+class _LoadTask(QRunnable):
+    def __init__(self, generation, key, func, signals):
+        super().__init__()
+        # 由 AsyncImageLoader 持有引用，便于 tryTake() 撤回排队中的任务
+        self.setAutoDelete(False)
+        self.generation = generation
+        self.key = key
+        self.func = func
+        self.signals = signals
+
+    def run(self):
+        try:
+            image = self.func()
+        except Exception as e:
+            print(f"Load error: {self.key}: {e}")
+            image = QImage()
+        self.signals.loaded.emit(self.generation, self.key, image)
+
+
+class AsyncImageLoader(QObject):
+    """
+    在线程池中执行返回 QImage 的加载函数，结果通过 loaded 信号回到主线程。
+    后请求的任务优先执行 (正在看的格子先出图)；reset() 丢弃排队中的任务和迟到的结果。
+    """
+
+    loaded = pyqtSignal(str, QImage)
+
+    def __init__(self, parent=None, max_threads=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        if max_threads:
+            self.pool.setMaxThreadCount(max_threads)
+        self.generation = 0
+        self._tasks = {}
+        self._priority = 0
+        self._signals = _LoadSignals()
+        self._signals.loaded.connect(self._on_loaded)
+
+    def request(self, key, func):
+        self._priority += 1
+        task = self._tasks.get(key)
+        if task is not None:
+            # 还在排队的话提到最前面；已经在跑就等它结束
+            if self.pool.tryTake(task):
+                self.pool.start(task, self._priority)
+            return
+        task = _LoadTask(self.generation, key, func, self._signals)
+        self._tasks[key] = task
+        self.pool.start(task, self._priority)
+
+    def is_pending(self, key):
+        return key in self._tasks
+
+    def reset(self):
+        """切换文件夹时调用：清空队列，忽略旧批次还在路上的结果"""
+        self.generation += 1
+        self.pool.clear()
+        self._tasks.clear()
+
+    def _on_loaded(self, generation, key, image):
+        if generation != self.generation:
+            return
+        self._tasks.pop(key, None)
+        self.loaded.emit(key, image)
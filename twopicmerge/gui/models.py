@@ -0,0 +1,271 @@
+import os
+from collections import OrderedDict
+
+from PyQt6.QtWidgets import QStyledItemDelegate, QStyle
+from PyQt6.QtGui import QPixmap, QImage, QPen, QColor, QPainter
+from PyQt6.QtCore import Qt, QAbstractListModel, QModelIndex, QSize
+
+from ..merge import merge_preview
+from ..thumbs import THUMB_SIZE
+from .loader import AsyncImageLoader
+
+
+# --------------------------
+# 缩略图网格：模型 + 绘制代理
+# --------------------------
+def placeholder_pixmap(width=THUMB_SIZE, height=None):
+    """缩略图加载完成前显示的灰色占位图 (默认 4:3)"""
+    pix = QPixmap(width, height or width * 3 // 4)
+    pix.fill(Qt.GlobalColor.transparent)
+    painter = QPainter(pix)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    painter.setPen(Qt.PenStyle.NoPen)
+    painter.setBrush(QColor("#E7E0EC"))
+    painter.drawRoundedRect(pix.rect(), 8, 8)
+    painter.end()
+    return pix
+
+
+class ThumbnailModel(QAbstractListModel):
+    """图片路径列表；缩略图只在视图需要绘制某一行时才在后台加载"""
+
+    PathRole = Qt.ItemDataRole.UserRole + 1
+    SelectedRole = Qt.ItemDataRole.UserRole + 2
+
+    def __init__(self, job, parent=None, max_pixmaps=600):
+        super().__init__(parent)
+        self.job = job  # path -> QImage，在线程池中执行
+        self.paths = []
+        self._rows = {}  # path -> 行号，row_of() 不用线性查找
+        self.selected = set()
+        # 已加载的缩略图 (LRU，滚出视野的行最终会被释放)
+        self._pixmaps = OrderedDict()
+        self.max_pixmaps = max_pixmaps
+        self._placeholder = None
+
+        self.loader = AsyncImageLoader(self)
+        self.loader.loaded.connect(self._on_loaded)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.paths)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.paths):
+            return None
+        path = self.paths[index.row()]
+
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self.pixmap(path)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return os.path.basename(path)
+        if role == self.PathRole:
+            return path
+        if role == self.SelectedRole:
+            return path in self.selected
+        return None
+
+    def pixmap(self, path):
+        pix = self._pixmaps.get(path)
+        if pix is not None:
+            self._pixmaps.move_to_end(path)
+            return pix
+
+        # 还没加载：先返回占位图，排队后台加载
+        self.loader.request(path, lambda: self.job(path))
+        if self._placeholder is None:
+            self._placeholder = placeholder_pixmap()
+        return self._placeholder
+
+    def _on_loaded(self, path, image):
+        row = self.row_of(path)
+        if row < 0:
+            return
+        self._pixmaps[path] = QPixmap.fromImage(image)
+        while len(self._pixmaps) > self.max_pixmaps:
+            self._pixmaps.popitem(last=False)
+        idx = self.index(row)
+        self.dataChanged.emit(idx, idx, [Qt.ItemDataRole.DecorationRole])
+
+    def set_paths(self, paths):
+        """整体替换列表 (切换文件夹/重新扫描时使用)"""
+        self.beginResetModel()
+        self.loader.reset()
+        self.paths = list(paths)
+        self._rows = {}
+        self._reindex()
+        self.selected.clear()
+        self._pixmaps.clear()
+        self.endResetModel()
+
+    def _reindex(self, start=0):
+        """重建 start 之后各行的 path -> 行号"""
+        for row in range(start, len(self.paths)):
+            self._rows[self.paths[row]] = row
+
+    def row_of(self, path):
+        return self._rows.get(path, -1)
+
+    def remove_paths(self, paths):
+        """原地删除若干行，其余行的缩略图保持不动"""
+        rows = sorted({r for r in map(self.row_of, paths) if r >= 0}, reverse=True)
+        for row in rows:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            path = self.paths.pop(row)
+            del self._rows[path]
+            self.selected.discard(path)
+            self._pixmaps.pop(path, None)
+            self.endRemoveRows()
+        if rows:
+            self._reindex(rows[-1])
+
+    def insert_path(self, row, path):
+        """在 row 处插入一行 (新文件出现时使用)"""
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.paths.insert(row, path)
+        self._reindex(row)
+        self.endInsertRows()
+
+    def set_selected(self, path, selected):
+        if selected:
+            self.selected.add(path)
+        else:
+            self.selected.discard(path)
+        row = self.row_of(path)
+        if row >= 0:
+            idx = self.index(row)
+            self.dataChanged.emit(idx, idx, [self.SelectedRole])
+
+
+# --------------------------
+# 批量预览：配对列表模型
+# --------------------------
+def pil_view_of(qimage):
+    """
+    返回与 qimage 共享像素内存的 PIL 图片，往里贴图就是直接写 QImage，
+    不需要 convert()/tobytes() 之类的中间复制。
+    qimage 必须是 Format_RGBX8888 (对应 PIL 的 RGBX) 或 Format_RGBA8888 (RGBA)。
+    """
+    from PIL import Image
+
+    mode = "RGBA" if qimage.format() == QImage.Format.Format_RGBA8888 else "RGBX"
+    ptr = qimage.bits()
+    ptr.setsize(qimage.sizeInBytes())
+    img = Image.frombuffer(mode, (qimage.width(), qimage.height()), ptr,
+                           "raw", mode, qimage.bytesPerLine(), 1)
+    # frombuffer 得到的图片是只读的，写入前会先复制一份；这里要的就是原地写入
+    img.readonly = 0
+    return img
+
+
+def render_preview(path1, path2, direction, max_size):
+    """按预览尺寸拼接两张图，直接画在 QImage 的内存上 (可在后台线程执行)"""
+    canvases = []
+
+    def make_canvas(size):
+        qimage = QImage(size[0], size[1], QImage.Format.Format_RGBX8888)
+        canvases.append(qimage)
+        return pil_view_of(qimage)
+
+    merge_preview(path1, path2, direction, max_size, make_canvas)
+    return canvases[0]
+
+
+class PairPreviewModel(QAbstractListModel):
+    """批量配对列表；每组的拼接预览在滚动到可见时才在后台按预览分辨率生成"""
+
+    PREVIEW_SIZE = (500, 300)
+    LARGE_SIZE = (8192, 8192)  # 点击查看大图时的分辨率 (分块显示，可放大看接缝)
+
+    def __init__(self, parent=None, max_pixmaps=200):
+        super().__init__(parent)
+        self.folder = ""
+        self.pairs = []
+        self.direction = 'horizontal'
+        self._pixmaps = OrderedDict()  # 行号 -> 预览图 (LRU)
+        self.max_pixmaps = max_pixmaps
+        self._placeholder = None
+
+        self.loader = AsyncImageLoader(self)
+        self.loader.loaded.connect(self._on_loaded)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.pairs)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.pairs):
+            return None
+        row = index.row()
+        p1, p2 = self.pairs[row]
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"组 {row + 1}: {p1} + {p2}"
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self.pixmap(row)
+        return None
+
+    def pixmap(self, row):
+        pix = self._pixmaps.get(row)
+        if pix is not None:
+            self._pixmaps.move_to_end(row)
+            return pix
+
+        p1, p2 = self.pairs[row]
+        path1 = os.path.join(self.folder, p1)
+        path2 = os.path.join(self.folder, p2)
+        direction = self.direction
+        self.loader.request(str(row), lambda: render_preview(
+            path1, path2, direction, self.PREVIEW_SIZE))
+        if self._placeholder is None:
+            self._placeholder = placeholder_pixmap(*self.PREVIEW_SIZE)
+        return self._placeholder
+
+    def _on_loaded(self, key, image):
+        row = int(key)
+        if row >= len(self.pairs):
+            return
+        self._pixmaps[row] = QPixmap.fromImage(image)
+        while len(self._pixmaps) > self.max_pixmaps:
+            self._pixmaps.popitem(last=False)
+        idx = self.index(row)
+        self.dataChanged.emit(idx, idx, [Qt.ItemDataRole.DecorationRole])
+
+    def set_pairs(self, folder, pairs, direction):
+        self.beginResetModel()
+        self.loader.reset()
+        self.folder = folder
+        self.pairs = list(pairs)
+        self.direction = direction
+        self._pixmaps.clear()
+        self.endResetModel()
+
+    def set_direction(self, direction):
+        """拼接方向改变：丢弃已生成的预览，可见的组会重新生成"""
+        self.set_pairs(self.folder, self.pairs, direction)
+
+
+class ThumbnailDelegate(QStyledItemDelegate):
+    """在 180×180 的格子中居中绘制缩略图，选中时画红框"""
+
+    CELL = 180
+
+    def sizeHint(self, option, index):
+        return QSize(self.CELL, self.CELL)
+
+    def paint(self, painter, option, index):
+        rect = option.rect
+        pix = index.data(Qt.ItemDataRole.DecorationRole)
+        if pix and not pix.isNull():
+            x = rect.x() + (rect.width() - pix.width()) // 2
+            y = rect.y() + (rect.height() - pix.height()) // 2
+            painter.drawPixmap(x, y, pix)
+
+        if index.data(ThumbnailModel.SelectedRole):
+            painter.save()
+            painter.setPen(QPen(QColor("red"), 3))
+            painter.drawRect(rect.adjusted(2, 2, -2, -2))
+            painter.restore()
+        elif option.state & QStyle.StateFlag.State_MouseOver:
+            painter.save()
+            painter.setPen(QPen(QColor("#CAC4D0"), 2))
+            painter.drawRect(rect.adjusted(2, 2, -2, -2))
+            painter.restore()
@@ -0,0 +1,106 @@
+# Material Design 3 (Pixel-like) Stylesheet
+# Colors:
+# Primary: #6750A4 (Purple) -> Buttons
+# On Primary: #FFFFFF
+# Primary Container: #EADDFF (Light Purple) -> Selected items
+# Background: #FFFBFE (Very light pinkish white)
+# Surface: #FFFBFE
+# Outline: #79747E (Gray)
+
+STYLE_SHEET = """
+QWidget {
+    background-color: #FFFBFE;
+    color: #1C1B1F;
+    font-family: "Segoe UI", "Roboto", "Helvetica Neue", sans-serif;
+    font-size: 14px;
+}
+
+/* Buttons (Filled - Primary) */
+QPushButton {
+    background-color: #6750A4;
+    color: #FFFFFF;
+    border: none;
+    border-radius: 20px; /* Pill shape */
+    padding: 10px 24px;
+    font-weight: bold;
+    font-size: 14px;
+}
+QPushButton:hover {
+    background-color: #7F67BE; /* Lighter purple */
+}
+QPushButton:pressed {
+    background-color: #4F378B; /* Darker purple */
+}
+QPushButton:disabled {
+    background-color: #E7E0EC;
+    color: #1C1B1F;
+    opacity: 0.5;
+}
+
+/* Radio Buttons */
+QRadioButton {
+    spacing: 8px;
+    font-size: 14px;
+}
+QRadioButton::indicator {
+    width: 18px;
+    height: 18px;
+    border-radius: 10px;
+    border: 2px solid #6750A4;
+}
+QRadioButton::indicator:checked {
+    background-color: #6750A4;
+    border: 2px solid #6750A4;
+    image: none; /* Custom dot handled by background */
+}
+QRadioButton::indicator:unchecked {
+    background-color: transparent;
+}
+
+/* GroupBox */
+QGroupBox {
+    border: 1px solid #CAC4D0;
+    border-radius: 12px;
+    margin-top: 12px; /* Leave space for title */
+    padding-top: 24px;
+    font-weight: bold;
+    color: #6750A4;
+}
+QGroupBox::title {
+    subcontrol-origin: margin;
+    subcontrol-position: top left;
+    padding: 0 8px;
+    left: 12px;
+    background-color: #FFFBFE; /* Mask border behind title */
+}
+
+/* Scroll Area */
+QScrollArea {
+    border: none;
+    background-color: #FFFBFE;
+}
+
+/* Thumbnail Grid */
+QListView {
+    border: none;
+    background-color: #FFFBFE;
+}
+
+/* Labels */
+QLabel {
+    color: #1C1B1F;
+}
+
+/* Dialogs */
+QDialog {
+    background-color: #FFFBFE;
+}
+
+/* Message Box */
+QMessageBox {
+    background-color: #FFFBFE;
+}
+QMessageBox QPushButton {
+    min-width: 80px;
+}
+"""
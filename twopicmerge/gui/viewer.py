@@ -0,0 +1,292 @@
+from collections import OrderedDict
+
+from PyQt6.QtWidgets import (
+    QPushButton, QVBoxLayout, QDialog, QHBoxLayout, QGraphicsView, QGraphicsScene,
+    QGraphicsItem
+)
+from PyQt6.QtGui import QPixmap, QImage, QPainter, QTransform
+from PyQt6.QtCore import pyqtSignal, QRectF
+
+from ..pyramid import ImagePyramid
+from .loader import AsyncImageLoader
+from .models import pil_view_of
+
+
+# --------------------------
+# 大图预览窗口
+# --------------------------
+class ImagePreviewDialog(QDialog):
+    # 打开时整张图缩放到这个范围内显示 (预取也按这个尺寸解码)
+    FIT_SIZE = (600, 550)
+
+    def __init__(self, img_path=None, parent=None, image=None, is_selected=False,
+                 pyramid=None):
+        super().__init__(parent)
+        self.setWindowTitle("图片预览")
+        self.img_path = img_path
+        self.is_selected = is_selected
+        self.deselect_mode = False
+
+        vbox = QVBoxLayout(self)
+
+        # 图片显示区域：多分辨率金字塔 + 分块绘制，缩放/拖动只画可见的图块
+        # pyramid 来自主窗口的解码缓存；image 为 PIL 图片 (批量预览)；否则按 img_path 读取
+        self.view = TiledImageView()
+        source = image if image is not None else img_path
+        if pyramid is None and source is not None:
+            try:
+                pyramid = ImagePyramid(source)
+            except Exception as e:
+                print(f"Preview error: {e}")
+        if pyramid is not None:
+            self.view.set_pyramid(pyramid)
+
+        vbox.addWidget(self.view)
+
+        # 缩放控制按钮
+        hbox_zoom = QHBoxLayout()
+        btn_zoom_in = QPushButton("放大 (+)")
+        btn_zoom_out = QPushButton("缩小 (-)")
+        btn_reset = QPushButton("复原 (1:1)")
+        
+        btn_zoom_in.clicked.connect(self.zoom_in)
+        btn_zoom_out.clicked.connect(self.zoom_out)
+        btn_reset.clicked.connect(self.zoom_reset)
+        
+        hbox_zoom.addWidget(btn_zoom_in)
+        hbox_zoom.addWidget(btn_zoom_out)
+        hbox_zoom.addWidget(btn_reset)
+        vbox.addLayout(hbox_zoom)
+
+        # 初始化显示
+        self.scale_factor = 1.0
+        self.initial_scale = 1.0
+
+        # 计算初始缩放比例以适应窗口
+        if self.view.pyramid:
+            # 目标显示区域大小 (预留一些边距)
+            target_w, target_h = self.FIT_SIZE
+
+            w, h = self.view.pyramid.size
+
+            # 计算适合的缩放比例
+            scale_w = target_w / w
+            scale_h = target_h / h
+            self.initial_scale = min(scale_w, scale_h, 1.0) # 不超过1.0
+            self.scale_factor = self.initial_scale
+
+        self.view.zoomed.connect(self.on_zoomed)
+        self.update_image()
+
+        # 底部按钮
+        hbox = QHBoxLayout()
+        
+        if image is not None:
+            # 批量预览模式
+            btn_ok = QPushButton("确定")
+            btn_cancel = QPushButton("关闭")
+            btn_ok.clicked.connect(self.accept)
+            btn_cancel.clicked.connect(self.reject)
+            hbox.addWidget(btn_ok)
+            hbox.addWidget(btn_cancel)
+        else:
+            # 手动预览模式
+            if self.is_selected:
+                # 已选中的图片：显示"取消选择"和"选择这张"
+                btn_deselect = QPushButton("取消选择")
+                btn_select = QPushButton("选择这张")
+                
+                btn_deselect.clicked.connect(self.deselect_and_close)
+                btn_select.clicked.connect(self.accept)
+                
+                btn_select.setDefault(True)  # 默认选中"选择这张"
+                
+                hbox.addWidget(btn_deselect)
+                hbox.addWidget(btn_select)
+            else:
+                # 未选中的图片
+                btn_ok = QPushButton("选择这张")
+                btn_cancel = QPushButton("取消")
+                
+                btn_ok.clicked.connect(self.accept)
+                btn_cancel.clicked.connect(self.reject)
+                
+                hbox.addWidget(btn_ok)
+                hbox.addWidget(btn_cancel)
+        
+        vbox.addLayout(hbox)
+
+        self.setFixedSize(650, 720)
+    
+    def update_image(self):
+        # 只改变视图变换，图块按需在后台生成
+        self.scale_factor = self.view.set_zoom(self.scale_factor)
+
+    def on_zoomed(self, scale):
+        # 滚轮缩放后同步按钮使用的比例
+        self.scale_factor = scale
+
+    def zoom_in(self):
+        self.scale_factor *= 1.2
+        self.update_image()
+
+    def zoom_out(self):
+        self.scale_factor /= 1.2
+        self.update_image()
+
+    def zoom_reset(self):
+        self.scale_factor = self.initial_scale # 复原到适应窗口的大小
+        self.update_image()
+
+    def done(self, result):
+        # 关闭前停掉还在生成图块的后台任务
+        self.view.shutdown()
+        super().done(result)
+
+    def deselect_and_close(self):
+        """取消选择并关闭对话框"""
+        self.deselect_mode = True
+        self.reject()
+
+
+# --------------------------
+# 分块缩放视图 (QGraphicsView)
+# --------------------------
+class TiledImageItem(QGraphicsItem):
+    """
+    按当前缩放比例选择金字塔中最接近的一层，只绘制可见的图块。
+    还没生成的图块先用已缓存的更粗一层放大顶替，后台生成好后再刷新那一块。
+    """
+
+    def __init__(self, pyramid, max_tiles=256):
+        super().__init__()
+        self.pyramid = pyramid
+        # 需要 exposedRect 来确定可见范围
+        self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemUsesExtendedStyleOption)
+        self._tiles = OrderedDict()  # (层, 列, 行) -> QPixmap (LRU)
+        self.max_tiles = max_tiles
+        self.loader = AsyncImageLoader()
+        self.loader.loaded.connect(self._on_loaded)
+
+    def boundingRect(self):
+        return QRectF(0, 0, self.pyramid.width, self.pyramid.height)
+
+    def tile_rect(self, key):
+        """图块在原图 (场景) 坐标中的位置"""
+        level, tx, ty = key
+        f = 1 << level
+        x, y, r, b = self.pyramid.tile_box(level, tx, ty)
+        return QRectF(x * f, y * f, (r - x) * f, (b - y) * f)
+
+    def paint(self, painter, option, widget=None):
+        scale = option.levelOfDetailFromTransform(painter.worldTransform())
+        level = self.pyramid.level_for(scale)
+        span = self.pyramid.tile_size << level  # 一个图块覆盖的原图边长
+        cols, rows = self.pyramid.tile_grid(level)
+        exposed = option.exposedRect.intersected(self.boundingRect())
+
+        painter.setClipRect(self.boundingRect())
+        for ty in range(max(0, int(exposed.top() // span)),
+                        min(rows, int(exposed.bottom() // span) + 1)):
+            for tx in range(max(0, int(exposed.left() // span)),
+                            min(cols, int(exposed.right() // span) + 1)):
+                key = (level, tx, ty)
+                pix = self._tiles.get(key)
+                if pix is not None:
+                    self._tiles.move_to_end(key)
+                    painter.drawPixmap(self.tile_rect(key), pix, QRectF(pix.rect()))
+                else:
+                    self._request(key)
+                    self._paint_fallback(painter, key)
+
+    def _paint_fallback(self, painter, key):
+        """用已缓存的较粗图块放大顶替 key"""
+        level, tx, ty = key
+        target = self.tile_rect(key)
+        for coarse in range(level + 1, self.pyramid.levels):
+            d = coarse - level
+            parent = (coarse, tx >> d, ty >> d)
+            pix = self._tiles.get(parent)
+            if pix is None:
+                continue
+            f = 1 << coarse
+            origin = self.tile_rect(parent).topLeft()
+            source = QRectF((target.x() - origin.x()) / f, (target.y() - origin.y()) / f,
+                            target.width() / f, target.height() / f)
+            painter.drawPixmap(target, pix, source)
+            return
+        # 连最粗一层都还没有：把它排到最前面 (只有一个图块，很快)
+        self._request((self.pyramid.levels - 1, 0, 0))
+
+    def _request(self, key):
+        name = "/".join(map(str, key))
+        if not self.loader.is_pending(name):
+            self.loader.request(name, lambda: self._render_tile(key))
+
+    def _render_tile(self, key):
+        """在线程池中执行：按需生成该层，再把图块直接贴进 QImage"""
+        level, tx, ty = key
+        x, y, r, b = self.pyramid.tile_box(level, tx, ty)
+        rgba = self.pyramid.level(level).mode == "RGBA"
+        fmt = QImage.Format.Format_RGBA8888 if rgba else QImage.Format.Format_RGBX8888
+        qimage = QImage(r - x, b - y, fmt)
+        self.pyramid.paste_tile(pil_view_of(qimage), level, tx, ty)
+        return qimage
+
+    def _on_loaded(self, name, image):
+        if image.isNull():
+            return
+        key = tuple(int(v) for v in name.split("/"))
+        self._tiles[key] = QPixmap.fromImage(image)
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+        self.update(self.tile_rect(key))
+
+    def shutdown(self):
+        self.loader.reset()
+        self.loader.pool.waitForDone()
+
+
+class TiledImageView(QGraphicsView):
+    """显示 ImagePyramid：滚轮以光标为中心缩放，按住拖动平移"""
+
+    zoomed = pyqtSignal(float)
+
+    MIN_SIDE = 50     # 缩小时图片短边不小于这么多像素
+    MAX_SCALE = 8.0
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setScene(QGraphicsScene(self))
+        self.setDragMode(QGraphicsView.DragMode.ScrollHandDrag)
+        self.setTransformationAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
+        self.setRenderHint(QPainter.RenderHint.SmoothPixmapTransform)
+        self.pyramid = None
+        self.item = None
+        self.zoom = 1.0
+
+    def set_pyramid(self, pyramid):
+        self.shutdown()
+        self.scene().clear()
+        self.pyramid = pyramid
+        self.item = TiledImageItem(pyramid)
+        self.scene().addItem(self.item)
+        self.setSceneRect(self.item.boundingRect())
+
+    def set_zoom(self, zoom):
+        """设置缩放比例 (会限制在合理范围内)，返回实际使用的比例"""
+        if self.pyramid:
+            min_zoom = self.MIN_SIDE / max(1, min(self.pyramid.size))
+            zoom = min(max(zoom, min(min_zoom, 1.0)), self.MAX_SCALE)
+        self.zoom = zoom
+        self.setTransform(QTransform.fromScale(zoom, zoom))
+        return zoom
+
+    def wheelEvent(self, event):
+        steps = event.angleDelta().y() / 120
+        if steps and self.pyramid:
+            self.zoomed.emit(self.set_zoom(self.zoom * 1.2 ** steps))
+
+    def shutdown(self):
+        if self.item:
+            self.item.shutdown()
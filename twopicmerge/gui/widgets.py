@@ -0,0 +1,18 @@
+from PyQt6.QtWidgets import QComboBox
+from PyQt6.QtCore import Qt
+
+from ..encoders import DEFAULT_PROFILE, PROFILES
+
+
+# --------------------------
+# 输出编码配置选择框 (手动和批量共用)
+# --------------------------
+def encoder_combo(current=DEFAULT_PROFILE):
+    combo = QComboBox()
+    for profile in PROFILES.values():
+        combo.addItem(profile.name, profile.name)
+        combo.setItemData(combo.count() - 1, profile.description,
+                          Qt.ItemDataRole.ToolTipRole)
+    combo.setCurrentIndex(max(0, combo.findData(current)))
+    combo.setToolTip("输出编码配置 (格式、质量与速度)")
+    return combo
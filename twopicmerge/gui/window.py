@@ -0,0 +1,370 @@
+import os
+import shutil
+import bisect
+import datetime
+
+from PyQt6.QtWidgets import (
+    QWidget, QLabel, QFileDialog, QPushButton, QVBoxLayout, QMessageBox, QDialog, QHBoxLayout,
+    QRadioButton, QButtonGroup, QListView
+)
+from PyQt6.QtGui import QImage
+from PyQt6.QtCore import QSize, QFileSystemWatcher, QTimer
+
+from .. import instrument
+from ..merge import merge_images
+from ..batch import output_name_for
+from ..encoders import get_profile
+from ..metadata import MetadataIndex, capture_time_of
+from ..pyramid import PyramidCache
+from ..scan import FolderIndex, prepare_folders
+from ..thumbs import ThumbnailCache
+from .models import ThumbnailModel, ThumbnailDelegate
+from .widgets import encoder_combo
+
+
+# --------------------------
+# 主窗口
+# --------------------------
+class ImageSelector(QWidget):
+    def __init__(self):
+        super().__init__()
+
+        self.folder = ""
+        self.processed_folder = ""
+        self.result_folder = ""
+        self.image_paths = []
+        self.selected = []
+        self.metadata = None  # 当前文件夹的元数据索引 (拍摄时间、尺寸)
+        self.folder_index = None  # 待处理图片集合，随文件变化增量更新
+        self.sort_times = {}  # 文件名 -> 排序用时间
+
+        # 监听文件夹变化；短时间内的多次通知合并成一次刷新
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_directory_changed)
+        self.changed_dirs = set()
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.setInterval(300)
+        self.refresh_timer.timeout.connect(lambda: self.refresh_folder(self.changed_dirs))
+        self.thumb_cache = ThumbnailCache()  # 缩略图缓存 (内存 + 磁盘)
+        # 已解码图片缓存：预览窗口和手动拼接共用，按内存上限淘汰
+        self.image_cache = PyramidCache()
+        self.full_prefetch = {}  # 已选中图片 -> 后台解码原图的 Future
+
+        self.initUI()
+
+    def initUI(self):
+        self.setWindowTitle("2PicMerge - 双图拼接工具")
+        self.setGeometry(200, 100, 1000, 700)
+
+        layout = QVBoxLayout(self)
+
+        # 顶部控制区
+        top_layout = QHBoxLayout()
+        
+        # 选择计数器
+        self.lbl_selection_count = QLabel("已选择: 0/2")
+        self.lbl_selection_count.setStyleSheet("font-weight: bold; color: #6750A4;")
+        top_layout.addWidget(self.lbl_selection_count)
+        
+        btn_choose = QPushButton("选择图片文件夹")
+        btn_choose.clicked.connect(self.choose_folder)
+        top_layout.addWidget(btn_choose)
+
+        # 手动拼接方向选择
+        self.group_dir = QButtonGroup(self)
+        self.rb_h = QRadioButton("左右拼接")
+        self.rb_v = QRadioButton("上下拼接")
+        self.rb_h.setChecked(True)
+        self.group_dir.addButton(self.rb_h)
+        self.group_dir.addButton(self.rb_v)
+        
+        top_layout.addWidget(QLabel("手动模式:"))
+        top_layout.addWidget(self.rb_h)
+        top_layout.addWidget(self.rb_v)
+        top_layout.addWidget(QLabel("输出:"))
+        self.combo_encoder = encoder_combo()
+        top_layout.addWidget(self.combo_encoder)
+        
+        top_layout.addStretch()
+
+        # 批量按钮
+        btn_batch = QPushButton("批量拼接...")
+        btn_batch.clicked.connect(self.open_batch_dialog)
+        top_layout.addWidget(btn_batch)
+
+        layout.addLayout(top_layout)
+
+        # 缩略图网格：只有可见的格子才会加载和绘制
+        self.model = ThumbnailModel(self.load_thumbnail, self)
+        self.view = QListView()
+        self.view.setViewMode(QListView.ViewMode.IconMode)
+        self.view.setResizeMode(QListView.ResizeMode.Adjust)
+        self.view.setMovement(QListView.Movement.Static)
+        self.view.setUniformItemSizes(True)
+        self.view.setGridSize(QSize(ThumbnailDelegate.CELL + 4, ThumbnailDelegate.CELL + 4))
+        self.view.setSelectionMode(QListView.SelectionMode.NoSelection)
+        self.view.setMouseTracking(True)
+        self.view.setItemDelegate(ThumbnailDelegate(self.view))
+        self.view.setModel(self.model)
+        self.view.clicked.connect(
+            lambda index: self.open_preview(index.data(ThumbnailModel.PathRole))
+        )
+        layout.addWidget(self.view)
+
+    # --------------------------
+    # 选择图片文件夹
+    # --------------------------
+    def choose_folder(self):
+        folder = QFileDialog.getExistingDirectory(self, "选择图片文件夹")
+        if not folder:
+            return
+
+        self.folder = folder
+        self.image_cache.clear()
+
+        # processed / result 文件夹
+        self.processed_folder, self.result_folder = prepare_folders(folder)
+
+        if self.metadata:
+            self.metadata.close()
+        self.metadata = MetadataIndex(folder)
+
+        if self.watcher.directories():
+            self.watcher.removePaths(self.watcher.directories())
+        self.folder_index = FolderIndex(folder, self.processed_folder, self.result_folder)
+        self.watcher.addPaths(self.folder_index.dirs())
+
+        self.load_images()
+
+    # --------------------------
+    # 关闭窗口：结束后台解码线程
+    # --------------------------
+    def closeEvent(self, event):
+        self.image_cache.close()
+        self.full_prefetch.clear()
+        super().closeEvent(event)
+
+    # --------------------------
+    # 打开批量窗口
+    # --------------------------
+    def open_batch_dialog(self):
+        if not self.folder:
+            QMessageBox.warning(self, "提示", "请先选择图片文件夹")
+            return
+        # 批量窗口 (连同批量引擎) 第一次打开时才导入
+        from .batch_dialog import BatchDialog
+
+        dlg = BatchDialog(self)
+        dlg.exec()
+
+    # --------------------------
+    # 获取图片拍摄时间（EXIF → mtime）
+    # --------------------------
+    def get_capture_time(self, filename):
+        # 走元数据索引：文件没变时不会再读文件
+        return capture_time_of(self.metadata.get(filename))
+
+    # --------------------------
+    # 加载 + 排序 + 显示图片缩略图
+    # --------------------------
+    def load_images(self):
+        self.selected = []
+        self.update_selection_count()
+
+        # 文件过滤
+        if not self.folder:
+            self.model.set_paths([])
+            return
+
+        with instrument.stage("load.scan"):
+            self.folder_index.refresh()
+            files = self.folder_index.pending()
+
+        # 按拍摄时间排序（核心）：索引只对新增或修改过的文件读文件头
+        with instrument.stage("load.sort", files=len(files)):
+            self.sort_times = self.metadata.capture_times(files, self.folder_index.stats(files))
+            files.sort(key=self.sort_key)
+            self.metadata.prune(files)
+
+        # 生成完整路径，交给模型 (缩略图在滚动到可见时才加载)
+        with instrument.stage("load.model"):
+            self.image_paths = [os.path.join(self.folder, f) for f in files]
+            self.model.set_paths(self.image_paths)
+
+    def sort_key(self, filename):
+        return self.sort_times.get(filename, datetime.datetime.min)
+
+    # --------------------------
+    # 文件夹变化：增量更新网格
+    # --------------------------
+    def on_directory_changed(self, path):
+        self.changed_dirs.add(path)
+        self.refresh_timer.start()
+
+    def refresh_folder(self, dirs=None):
+        """重新列出发生变化的目录，只插入/删除受影响的行"""
+        if not self.folder_index:
+            return
+        dirs = list(dirs) if dirs else None
+        self.changed_dirs = set()
+        added, removed = self.folder_index.refresh(dirs)
+
+        if removed:
+            gone = [os.path.join(self.folder, f) for f in removed]
+            for path in gone:
+                if path in self.selected:
+                    self.deselect_image(path)
+            self.model.remove_paths(gone)
+            for f in removed:
+                self.sort_times.pop(f, None)
+
+        if added:
+            self.sort_times.update(
+                self.metadata.capture_times(added, self.folder_index.stats(added))
+            )
+            keys = [self.sort_key(os.path.basename(p)) for p in self.model.paths]
+            for f in sorted(added, key=self.sort_key):
+                row = bisect.bisect_right(keys, self.sort_key(f))
+                keys.insert(row, self.sort_key(f))
+                self.model.insert_path(row, os.path.join(self.folder, f))
+
+        self.image_paths = list(self.model.paths)
+
+    def load_thumbnail(self, img_path):
+        """从缩略图缓存取图 (在后台线程中执行，所以返回 QImage)"""
+        return QImage.fromData(self.thumb_cache.get(img_path))
+
+    # --------------------------
+    # 弹出大图预览
+    # --------------------------
+    def open_preview(self, path):
+        from .viewer import ImagePreviewDialog
+
+        # 检查该图片是否已选中
+        is_selected = path in self.selected
+        pyramid = self.cached_pyramid(path)
+        # 看完这张多半会看相邻的，趁现在后台解码
+        self.prefetch_neighbours(path)
+
+        if is_selected:
+            # 已选中的图片：可以取消选择或重新确认
+            preview = ImagePreviewDialog(path, self, is_selected=True, pyramid=pyramid)
+            result = preview.exec()
+            
+            if preview.deselect_mode:
+                # 取消选择
+                self.deselect_image(path)
+            elif result == QDialog.DialogCode.Accepted:
+                # 重新确认选择（保持选中状态）
+                pass
+        else:
+            # 未选中的图片：正常预览和选择
+            preview = ImagePreviewDialog(path, self, is_selected=False, pyramid=pyramid)
+            if preview.exec() == QDialog.DialogCode.Accepted:
+                self.select_image(path)
+
+    # --------------------------
+    # 解码缓存 + 预取
+    # --------------------------
+    def cached_pyramid(self, path):
+        try:
+            return self.image_cache.get(path)
+        except OSError:
+            return None
+
+    def prefetch_neighbours(self, path):
+        """按排序顺序预取后一张和前一张 (预览分辨率)"""
+        from .viewer import ImagePreviewDialog
+
+        row = self.model.row_of(path)
+        for r in (row + 1, row - 1):
+            if row >= 0 and 0 <= r < len(self.model.paths):
+                self.image_cache.prefetch(self.model.paths[r], ImagePreviewDialog.FIT_SIZE)
+
+    def decoded_original(self, path):
+        """已解码 (或正在后台解码) 的原图；没有则返回 None，由拼接自己读文件"""
+        future = self.full_prefetch.pop(path, None)
+        if future is not None:
+            future.result()
+        pyramid = self.image_cache.peek(path)
+        return pyramid.cached_level(0) if pyramid else None
+
+    # --------------------------
+    # 确认选择一张
+    # --------------------------
+    def select_image(self, path):
+        if len(self.selected) == 2:
+            self.clear_selection()
+
+        self.selected.append(path)
+        self.model.set_selected(path, True)
+        self.update_selection_count()
+
+        if len(self.selected) == 2:
+            self.merge_selected()
+        else:
+            # 第一张选中后用户还要去找第二张，这段时间在后台解码原图供拼接使用
+            self.full_prefetch[path] = self.image_cache.prefetch(path)
+    
+    def deselect_image(self, path):
+        """取消选择某张图片"""
+        self.selected = [p for p in self.selected if p != path]
+        self.full_prefetch.pop(path, None)
+        self.model.set_selected(path, False)
+        self.update_selection_count()
+    
+    def update_selection_count(self):
+        """更新选择计数器"""
+        count = len(self.selected)
+        self.lbl_selection_count.setText(f"已选择: {count}/2")
+
+    def clear_selection(self):
+        for path in self.selected:
+            self.model.set_selected(path, False)
+        self.selected = []
+        self.full_prefetch.clear()
+        self.update_selection_count()
+
+    # --------------------------
+    # 拼接 + 移动源图 + 刷新界面
+    # --------------------------
+    def merge_selected(self):
+        img1 = self.selected[0]
+        img2 = self.selected[1]
+
+        encoder = get_profile(self.combo_encoder.currentData())
+        output_name = output_name_for(img1, img2, encoder.extension)
+
+        output_path = os.path.join(self.result_folder, output_name)
+        
+        # 获取当前选择的方向
+        direction = 'vertical' if self.rb_v.isChecked() else 'horizontal'
+
+        moved = []
+        try:
+            # 复用预览/预取时已经解码好的原图
+            images = (self.decoded_original(img1), self.decoded_original(img2))
+            merge_images(img1, img2, output_path, direction, images=images,
+                         encoder=encoder)
+
+            # 移动源图片到 processed/
+            shutil.move(img1, os.path.join(self.processed_folder, os.path.basename(img1)))
+            moved.append(img1)
+            shutil.move(img2, os.path.join(self.processed_folder, os.path.basename(img2)))
+            moved.append(img2)
+
+            QMessageBox.information(
+                self,
+                "完成",
+                f"拼接完成 ({'上下' if direction == 'vertical' else '左右'}) → result/{output_name}\n\n两张原图已移动到 processed/ 文件夹。"
+            )
+        except Exception as e:
+            QMessageBox.warning(self, "错误", str(e))
+
+        # 状态清空，只从网格中移除已移走的两张，其余缩略图不重建
+        for path in moved:
+            self.image_cache.discard(path)
+        self.clear_selection()
+        self.model.remove_paths(moved)
+        self.image_paths = [p for p in self.image_paths if p not in moved]
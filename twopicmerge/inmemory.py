@@ -0,0 +1,120 @@
+"""
+内存中拼接：输入和结果都不经过磁盘，便于嵌入到其他程序 (例如接收上传的服务) 里。
+
+    data = merge_pair(upload1, upload2, encoder="webp")        # 编码后的 bytes
+    image = merge_pair(img1, img2, as_image=True)              # PIL 图片
+    for data in merge_pairs(pairs, workers=4):                 # 生成器，按输入顺序
+        ...
+
+输入可以是 bytes / bytearray / memoryview、文件对象、路径或已打开的 PIL 图片。
+"""
+import io
+import os
+import contextlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from . import instrument
+from .encoders import check_size, get_profile, save_options
+from .merge import DEFAULT_REDUCING_GAP, compose
+
+
+# --------------------------
+# 输入 / 输出
+# --------------------------
+def open_image(source):
+    """
+    打开一个输入，返回 (PIL 图片, 是否由这里打开)。只读文件头，不解码。
+    由这里打开的图片用完要关闭；调用方传入的 PIL 图片和文件对象不会被关闭。
+    """
+    from PIL import Image
+
+    if isinstance(source, Image.Image):
+        return source, False
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    elif not isinstance(source, (str, os.PathLike)) and not hasattr(source, "read"):
+        raise TypeError(f"不支持的输入类型: {type(source).__name__} "
+                        "(可用 bytes、文件对象、路径或 PIL 图片)")
+    return Image.open(source), True
+
+
+def encode(image, encoder=None, tables=()):
+    """按编码配置把 PIL 图片编码为 bytes；tables 见 merge.compose()"""
+    profile = get_profile(encoder)
+    check_size(profile, image.size)
+    buf = io.BytesIO()
+    with instrument.stage("merge.encode"):
+        image.save(buf, **save_options(profile, tables))
+    instrument.count("pixels.encoded", image.width * image.height)
+    instrument.count("bytes.written", buf.tell())
+    return buf.getvalue()
+
+
+# --------------------------
+# 拼接一组 / 多组
+# --------------------------
+def merge_pair(source1, source2, direction='horizontal', encoder=None, resample=None,
+               reducing_gap=DEFAULT_REDUCING_GAP, as_image=False, canvas_pool=None):
+    """
+    拼接两张图片，返回编码后的 bytes (格式见 encoder)；as_image=True 时返回 RGB 的 PIL 图片，
+    不编码。缩放规则与 merge_images 相同 (需要缩小的 JPEG 用 draft() 低分辨率解码)。
+    传入的 PIL 图片如果还没解码，会在这里就地解码。
+    不做 jpegtran 无损拼接和流式拼接：两者都需要文件路径。
+    canvas_pool：编码结果时画布从这个 merge.CanvasPool 取用并归还 (as_image 时不用)。
+    """
+    profile = get_profile(encoder)
+    with contextlib.ExitStack() as stack:
+        images = []
+        for source in (source1, source2):
+            img, owned = open_image(source)
+            if owned:
+                stack.callback(img.close)
+            images.append(img)
+        if as_image:
+            merged, _ = compose(images[0], images[1], direction, resample, reducing_gap)
+            return merged
+        merged, tables = compose(images[0], images[1], direction, resample, reducing_gap,
+                                 canvas_pool)
+    try:
+        return encode(merged, profile, tables)
+    finally:
+        if canvas_pool is not None:
+            canvas_pool.release(merged)
+
+
+def merge_pairs(pairs, direction='horizontal', workers=None, return_exceptions=False,
+                **options):
+    """
+    逐组拼接 pairs 中的 (source1, source2)，按输入顺序产出 merge_pair() 的结果 (生成器)。
+    options 原样传给 merge_pair (encoder、resample、as_image 等)。
+    workers > 1 时在线程池中并行 (Pillow 解码、缩放、编码时释放 GIL)；
+    已提交未取走的组不超过 workers * 2，pairs 可以是读取上传的惰性迭代器。
+    return_exceptions=True 时失败的组产出异常对象，否则异常直接抛出并结束生成器。
+    """
+    def run(pair):
+        try:
+            return merge_pair(pair[0], pair[1], direction, **options)
+        except Exception as e:
+            if not return_exceptions:
+                raise
+            return e
+
+    if not workers or workers <= 1:
+        for pair in pairs:
+            yield run(pair)
+        return
+
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            for pair in pairs:
+                pending.append(executor.submit(run, pair))
+                if len(pending) >= workers * 2:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            # 调用方提前停止迭代 (或出错) 时丢弃还没开始的组
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,250 @@
+"""
+分阶段计时和计数 (默认关闭)。
+
+    with instrument.stage("merge.decode"):
+        ...
+    instrument.count("pixels.decoded", w * h)
+
+关闭时 stage() 返回同一个空上下文、count() 直接返回，几乎没有开销。
+enable() 之后汇总每个阶段的次数和耗时、各计数器，并可把每个阶段写成一行 JSON (trace)。
+"""
+import os
+import json
+import time
+import threading
+import contextlib
+from collections import Counter
+
+_enabled = False
+_recorder = None
+_local = threading.local()
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+# --------------------------
+# 记录器
+# --------------------------
+class Recorder:
+    """收集阶段耗时、计数器和事件；trace 为文件对象时每个事件写成一行 JSON"""
+
+    def __init__(self, trace=None, keep_events=False):
+        self.stages = {}         # 名称 -> [次数, 总耗时, 最长耗时]
+        self.counters = Counter()
+        self.events = [] if keep_events else None
+        self.trace = trace
+        self._lock = threading.Lock()
+
+    def add_stage(self, name, start, seconds, fields):
+        with self._lock:
+            entry = self.stages.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+        self.event({"stage": name, "time": start, "seconds": seconds, **fields})
+
+    def add(self, name, value=1):
+        with self._lock:
+            self.counters[name] += value
+
+    def event(self, record):
+        context = getattr(_local, "context", None)
+        if context:
+            record = {**context, **record}
+        record.setdefault("pid", os.getpid())
+        with self._lock:
+            if self.events is not None:
+                self.events.append(record)
+            if self.trace is not None:
+                self.trace.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def snapshot(self):
+        """可跨进程传递的数据 (进程池子进程用它把结果带回主进程)"""
+        with self._lock:
+            return {"stages": {k: list(v) for k, v in self.stages.items()},
+                    "counters": dict(self.counters),
+                    "events": list(self.events or [])}
+
+    def merge(self, snapshot):
+        with self._lock:
+            for name, (calls, total, longest) in snapshot["stages"].items():
+                entry = self.stages.setdefault(name, [0, 0.0, 0.0])
+                entry[0] += calls
+                entry[1] += total
+                entry[2] = max(entry[2], longest)
+            self.counters.update(snapshot["counters"])
+        for record in snapshot["events"]:
+            # 子进程的事件已经带了 pid 和组信息，直接写入
+            with self._lock:
+                if self.events is not None:
+                    self.events.append(record)
+                if self.trace is not None:
+                    self.trace.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def summary(self):
+        """{"stages": {名称: {calls, total, mean, max}}, "counters": {...}, "hit_rates": {...}}"""
+        with self._lock:
+            stages = {
+                name: {"calls": calls, "total": total, "mean": total / calls, "max": longest}
+                for name, (calls, total, longest) in sorted(self.stages.items())
+            }
+            counters = dict(sorted(self.counters.items()))
+        # 成对的 <名称>.hit / <名称>.miss 计数器给出命中率
+        hit_rates = {}
+        for name in counters:
+            if name.endswith(".hit"):
+                base = name[:-len(".hit")]
+                hits, misses = counters[name], counters.get(base + ".miss", 0)
+                if hits + misses:
+                    hit_rates[base] = hits / (hits + misses)
+        return {"stages": stages, "counters": counters, "hit_rates": hit_rates}
+
+    def format_summary(self):
+        data = self.summary()
+        lines = [f"{'阶段':<24}{'次数':>8}{'总计(s)':>12}{'平均(ms)':>12}{'最长(ms)':>12}"]
+        for name, s in data["stages"].items():
+            lines.append(f"{name:<26}{s['calls']:>8}{s['total']:>12.3f}"
+                         f"{s['mean'] * 1000:>12.2f}{s['max'] * 1000:>12.2f}")
+        if data["counters"]:
+            lines.append("")
+            for name, value in data["counters"].items():
+                lines.append(f"{name:<26}{value:>16,}")
+        if data["hit_rates"]:
+            lines.append("")
+            for name, rate in data["hit_rates"].items():
+                lines.append(f"{name + ' 命中率':<26}{rate:>15.1%}")
+        return "\n".join(lines)
+
+
+# --------------------------
+# 开关
+# --------------------------
+def enabled():
+    return _enabled
+
+
+def recorder():
+    return _recorder
+
+
+def enable(trace_path=None):
+    """开始记录；trace_path 不为空时把每个阶段追加写入该 JSON Lines 文件"""
+    global _enabled, _recorder
+    trace = open(trace_path, "a", encoding="utf-8") if trace_path else None
+    _recorder = Recorder(trace)
+    _enabled = True
+    return _recorder
+
+
+def disable():
+    """停止记录并关闭 trace 文件，返回记录器 (可继续读取汇总)"""
+    global _enabled, _recorder
+    rec, _enabled, _recorder = _recorder, False, None
+    if rec is not None and rec.trace is not None:
+        rec.trace.close()
+        rec.trace = None
+    return rec
+
+
+def enable_from_env():
+    """TWOPICMERGE_PROFILE=1 开启记录；TWOPICMERGE_TRACE=<文件> 同时写 trace"""
+    trace_path = os.environ.get("TWOPICMERGE_TRACE")
+    if trace_path or os.environ.get("TWOPICMERGE_PROFILE"):
+        return enable(trace_path)
+    return None
+
+
+# --------------------------
+# 计时 / 计数
+# --------------------------
+class _Stage:
+    __slots__ = ("name", "fields", "start", "t0")
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.fields = fields
+
+    def __enter__(self):
+        self.start = time.time()
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        rec = _recorder
+        if rec is not None:
+            rec.add_stage(self.name, self.start, time.perf_counter() - self.t0, self.fields)
+        return False
+
+
+def stage(name, **fields):
+    """计时一个阶段；fields 会写入 trace 事件"""
+    if not _enabled:
+        return _NULL_STAGE
+    return _Stage(name, fields)
+
+
+def count(name, value=1):
+    if _enabled:
+        _recorder.add(name, value)
+
+
+@contextlib.contextmanager
+def context(**fields):
+    """给当前线程中产生的事件附加字段 (例如正在处理的组)"""
+    saved = getattr(_local, "context", None)
+    _local.context = {**(saved or {}), **fields}
+    try:
+        yield
+    finally:
+        _local.context = saved
+
+
+@contextlib.contextmanager
+def collect():
+    """
+    在进程池子进程中临时开启记录，产出一个保留事件的 Recorder，
+    调用方用 snapshot() 把数据带回主进程再 merge()。
+    """
+    global _enabled, _recorder
+    saved = _enabled, _recorder
+    _recorder = Recorder(keep_events=True)
+    _enabled = True
+    try:
+        yield _recorder
+    finally:
+        _enabled, _recorder = saved
+
+
+# --------------------------
+# 单次调用的 cProfile + tracemalloc
+# --------------------------
+def profile_call(path, func, *args, **kwargs):
+    """
+    用 cProfile 和 tracemalloc 运行 func，统计写入 path (可用 pstats / snakeviz 查看)。
+    内存峰值和前 10 个分配位置作为 "profile" 事件记录。
+    注意 tracemalloc 只统计 Python 分配的内存，Pillow 的像素缓冲区不在其中。
+    """
+    import cProfile
+    import tracemalloc
+
+    tracemalloc.start()
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(func, *args, **kwargs)
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics("lineno")[:10]
+        tracemalloc.stop()
+        profiler.dump_stats(path)
+        if _recorder is not None:
+            _recorder.event({"profile": path, "python_peak_bytes": peak,
+                             "top_allocations": [str(s) for s in top]})
@@ -0,0 +1,169 @@
+import os
+import shutil
+import struct
+import tempfile
+import subprocess
+from collections import namedtuple
+
+# JPEG 帧结构：尺寸、各分量 (id, 水平采样, 垂直采样, 量化表号)、量化表内容、Adobe 颜色变换
+JpegLayout = namedtuple("JpegLayout", "width height components qtables adobe_transform")
+
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7,
+                0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# 只处理霍夫曼编码的基线/扩展/渐进 JPEG (jpegtran 也只支持这些)
+_HUFFMAN_SOF = {0xC0, 0xC1, 0xC2}
+
+_jpegtran_path = False  # False 表示还没检测过
+
+
+# --------------------------
+# jpegtran (libjpeg-turbo 2.1+ 或 IJG libjpeg 9)
+# --------------------------
+def find_jpegtran():
+    """返回支持 -drop 的 jpegtran 路径；没有安装则返回 None (结果会缓存)"""
+    global _jpegtran_path
+    if _jpegtran_path is False:
+        _jpegtran_path = None
+        path = os.environ.get("TWOPICMERGE_JPEGTRAN") or shutil.which("jpegtran")
+        if path:
+            try:
+                out = subprocess.run([path, "-h"], capture_output=True, text=True, timeout=10)
+                if "-drop" in out.stdout + out.stderr:
+                    _jpegtran_path = path
+            except (OSError, subprocess.SubprocessError):
+                pass
+    return _jpegtran_path
+
+
+# --------------------------
+# 读取 JPEG 帧结构 (只读头部)
+# --------------------------
+def read_layout(path):
+    """解析 JPEG 头部，不是可无损处理的 JPEG 时返回 None"""
+    qtables = {}
+    adobe_transform = None
+    frame = None
+    with open(path, "rb") as f:
+        if f.read(2) != b"\xff\xd8":
+            return None
+        while True:
+            marker = f.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                return None
+            code = marker[1]
+            if code in (0xD9, 0xDA):  # 头部结束 (DQT 可能在 SOF 之后，所以读到 SOS 为止)
+                break
+            header = f.read(2)
+            if len(header) < 2:
+                return None
+            (length,) = struct.unpack(">H", header)
+            payload = f.read(length - 2)
+            if len(payload) < length - 2:  # 文件被截断
+                return None
+
+            if code == 0xDB:  # DQT，一个段里可能有多张表
+                pos = 0
+                while pos < len(payload):
+                    precision, table_id = payload[pos] >> 4, payload[pos] & 0x0F
+                    size = 128 if precision else 64
+                    qtables[table_id] = payload[pos + 1:pos + 1 + size]
+                    pos += 1 + size
+            elif code == 0xEE and payload.startswith(b"Adobe") and len(payload) >= 12:
+                adobe_transform = payload[11]
+            elif code in _SOF_MARKERS:
+                if code not in _HUFFMAN_SOF:
+                    return None
+                height, width, count = struct.unpack_from(">HHB", payload, 1)
+                components = []
+                for i in range(count):
+                    cid, sampling, tq = struct.unpack_from(">BBB", payload, 6 + i * 3)
+                    components.append((cid, sampling >> 4, sampling & 0x0F, tq))
+                frame = (width, height, tuple(components))
+
+    if frame is None:
+        return None
+    return JpegLayout(*frame, qtables, adobe_transform)
+
+
+def mcu_size(layout):
+    """一个 MCU 的像素尺寸 (宽, 高)"""
+    return (8 * max(c[1] for c in layout.components),
+            8 * max(c[2] for c in layout.components))
+
+
+def _table_contents(layout):
+    tables = tuple(layout.qtables.get(c[3]) for c in layout.components)
+    return None if None in tables else tables
+
+
+def can_join(layout1, layout2, direction='horizontal'):
+    """两张 JPEG 能否在 DCT 系数域直接拼接 (不解码、不重新编码)"""
+    if layout1 is None or layout2 is None:
+        return False
+    # 只处理 YCbCr 彩色图 (灰度/CMYK/RGB 编码的 JPEG 走像素路径)
+    if len(layout1.components) != 3 or layout1.adobe_transform == 0:
+        return False
+    if layout2.adobe_transform == 0:
+        return False
+    # 分量、采样方式、量化表必须完全一致，否则需要重新量化
+    if [c[:3] for c in layout1.components] != [c[:3] for c in layout2.components]:
+        return False
+    tables = _table_contents(layout1)
+    if tables is None or tables != _table_contents(layout2):
+        return False
+
+    mcu_w, mcu_h = mcu_size(layout1)
+    if direction == 'horizontal':
+        # 高度相同，且第二张图的起点落在 MCU 边界上
+        return layout1.height == layout2.height and layout1.width % mcu_w == 0
+    return layout1.width == layout2.width and layout1.height % mcu_h == 0
+
+
+# --------------------------
+# 无损拼接
+# --------------------------
+def join_jpegs(img1_path, img2_path, output_path, direction='horizontal'):
+    """
+    条件满足时用 jpegtran 在系数域拼接两张 JPEG 并返回 True；
+    不满足条件或没有 jpegtran 时返回 False，由调用方走像素路径。
+    """
+    jpegtran = find_jpegtran()
+    if not jpegtran:
+        return False
+    layout1 = read_layout(img1_path)
+    layout2 = read_layout(img2_path)
+    if not can_join(layout1, layout2, direction):
+        return False
+
+    if direction == 'horizontal':
+        width, height = layout1.width + layout2.width, layout1.height
+        offset = f"+{layout1.width}+0"
+    else:
+        width, height = layout1.width, layout1.height + layout2.height
+        offset = f"+0+{layout1.height}"
+
+    # 1. 把第一张图的画布扩展到拼接后的尺寸
+    # 2. 把第二张图的系数块放到扩展出来的区域
+    # 两步通过管道串起来，中间结果不落盘
+    out_dir = os.path.dirname(os.path.abspath(output_path))
+    fd, joined = tempfile.mkstemp(suffix=".jpg", dir=out_dir)
+    os.close(fd)
+    try:
+        extend = subprocess.Popen(
+            [jpegtran, "-copy", "none", "-crop", f"{width}x{height}+0+0", img1_path],
+            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+        )
+        drop = subprocess.run(
+            [jpegtran, "-copy", "none", "-drop", offset, img2_path, "-outfile", joined],
+            stdin=extend.stdout, stderr=subprocess.DEVNULL,
+        )
+        extend.stdout.close()
+        if extend.wait() != 0 or drop.returncode != 0:
+            return False
+        os.replace(joined, output_path)
+    except OSError:
+        return False
+    finally:
+        if os.path.exists(joined):
+            os.remove(joined)
+    return True
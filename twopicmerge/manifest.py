@@ -0,0 +1,152 @@
+import os
+import json
+import shutil
+import datetime
+
+# 日志文件放在 result/ 中，和拼接结果在一起
+MANIFEST_NAME = ".2picmerge_batch.jsonl"
+
+
+def fingerprint(path):
+    """文件标识 [大小, mtime_ns]；文件不存在时返回 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+# --------------------------
+# 批量任务日志
+# --------------------------
+class BatchManifest:
+    """
+    批量拼接日志 (JSON Lines)：每组提交时追加一行 started，结束后追加一行
+    done / failed / cancelled，记录两张输入的大小和修改时间、输出文件名、拼接方向和编码配置。
+    只追加不改写，进程中途被杀也不会损坏已有记录；加载时同一组以最后一行为准。
+    """
+
+    def __init__(self, result_folder, path=None, compact=True):
+        """compact=False 时只读取，不重写日志 (预演用)"""
+        self.result_folder = result_folder
+        self.path = path or os.path.join(result_folder, MANIFEST_NAME)
+        self._records = {}  # (图1, 图2) -> 最新记录
+        self._file = None
+
+        lines = self._load()
+        # 重复运行会留下很多过时的行，超过一定比例时重写一次
+        if compact and lines > 2 * len(self._records) + 100:
+            self.compact()
+
+    def _load(self):
+        lines = 0
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # 被杀时最后一行可能只写了一半
+                    self._records[tuple(record["inputs"])] = record
+        except FileNotFoundError:
+            pass
+        return lines
+
+    def _append(self, record):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        self._records[tuple(record["inputs"])] = record
+
+    def compact(self):
+        """只保留每组的最新记录 (写临时文件后替换)"""
+        self.close()
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for record in self._records.values():
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp, self.path)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # --------------------------
+    # 查询
+    # --------------------------
+    def get(self, pair):
+        return self._records.get(tuple(pair))
+
+    def is_current(self, pair, sources, direction, encoder="default", derivatives=()):
+        """
+        这一组已经成功拼接过，且输入没变、方向、编码配置和派生版本相同、结果文件还在。
+        derivatives 是 derivatives.derivative_key() 的结果。
+        """
+        record = self._records.get(tuple(pair))
+        return (record is not None
+                and record["status"] == "done"
+                and record["direction"] == direction
+                and record.get("encoder", "default") == encoder
+                and record.get("derivatives", []) == list(derivatives)
+                and record["sources"] == sources
+                and os.path.exists(os.path.join(self.result_folder, record["output"])))
+
+    def incomplete(self):
+        """提交了但没有结束记录的组 (上次运行被中断)"""
+        return [r for r in self._records.values() if r["status"] == "started"]
+
+    # --------------------------
+    # 记录
+    # --------------------------
+    def started(self, pair, sources, output, direction, keep_sources=False,
+                encoder="default", derivatives=()):
+        self._append({
+            "inputs": list(pair),
+            "sources": sources,
+            "output": output,
+            "direction": direction,
+            "encoder": encoder,
+            "derivatives": list(derivatives),
+            "keep_sources": keep_sources,
+            "status": "started",
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        })
+
+    def finished(self, pair, status="done", error=None):
+        record = dict(self._records[tuple(pair)], status=status,
+                      time=datetime.datetime.now().isoformat(timespec="seconds"))
+        record.pop("error", None)
+        if error:
+            record["error"] = error
+        self._append(record)
+
+    # --------------------------
+    # 中断恢复
+    # --------------------------
+    def recover(self, folder, processed_folder):
+        """
+        上次运行在移动源文件途中被中断 (一张已在 processed/，另一张还在原处) 时，
+        结果文件已经写好，把剩下的一张也移走并标记完成，返回这些组。
+        必须在重新扫描和配对之前调用，否则落单的那张会和别的图配成新的一组。
+        两张都还在原处的组不用处理，重新运行时会照原样配对重做。
+        """
+        recovered = []
+        for record in self.incomplete():
+            if record.get("keep_sources"):
+                continue
+            if not os.path.exists(os.path.join(self.result_folder, record["output"])):
+                continue
+            names = record["inputs"]
+            moved = [os.path.exists(os.path.join(processed_folder, n)) for n in names]
+            if not any(moved):
+                continue
+            for name, done in zip(names, moved):
+                src = os.path.join(folder, name)
+                if not done and os.path.exists(src):
+                    shutil.move(src, os.path.join(processed_folder, name))
+            self.finished(names)
+            recovered.append(tuple(names))
+        return recovered
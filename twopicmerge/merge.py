@@ -0,0 +1,497 @@
+import os
+import threading
+import contextlib
+from collections import OrderedDict
+
+from . import instrument
+from .derivatives import decode_size, resolve_derivatives, save_with_derivatives
+from .encoders import allows_lossless, check_size, get_profile, save_options, source_tables
+from .exif import read_header
+from .lossless import join_jpegs
+
+# Pillow 中 RGB 图片每像素占 4 字节 (RGBX)
+BYTES_PER_PIXEL = 4
+# 流式拼接时每个条带至少这么多行，避免条带过窄导致重采样调用过多
+MIN_STRIP_ROWS = 16
+# 缩小时先用 reduce() 整数倍缩到目标的 3 倍以内再精细重采样，
+# 画质与直接重采样几乎没有差别，大幅缩小时快得多 (None 表示不用)
+DEFAULT_REDUCING_GAP = 3.0
+# 可选的重采样滤镜：名称 → Image.Resampling 成员名 (None 为 Pillow 默认的 bicubic)。
+# 只存名称，命令行列出可选项时不必导入 Pillow
+RESAMPLE_FILTERS = {
+    "nearest": "NEAREST",
+    "box": "BOX",
+    "bilinear": "BILINEAR",
+    "hamming": "HAMMING",
+    "bicubic": "BICUBIC",
+    "lanczos": "LANCZOS",
+}
+
+_large_image_lock = threading.Lock()
+
+
+# --------------------------
+# 尺寸计算
+# --------------------------
+def target_sizes(size1, size2, direction='horizontal'):
+    """两张图缩放后的尺寸和画布尺寸：((w1, h1), (w2, h2), (W, H))"""
+    (w1, h1), (w2, h2) = size1, size2
+    if direction == 'horizontal':
+        # 对齐高度
+        h = min(h1, h2)
+        s1 = (int(w1 * h / h1), h)
+        s2 = (int(w2 * h / h2), h)
+        return s1, s2, (s1[0] + s2[0], h)
+    # 对齐宽度
+    w = min(w1, w2)
+    s1 = (w, int(h1 * w / w1))
+    s2 = (w, int(h2 * w / w2))
+    return s1, s2, (w, s1[1] + s2[1])
+
+
+def draft_size(size, target):
+    """
+    JPEG 用 draft() 缩小解码后的尺寸：按 1/2、1/4、1/8 中
+    不低于目标尺寸的最大比例 (与 Pillow 的 JpegImageFile.draft 一致)。
+    """
+    scale = min(size[0] // max(1, target[0]), size[1] // max(1, target[1]))
+    scale = next(s for s in (8, 4, 2, 1) if scale >= s)
+    return -(-size[0] // scale), -(-size[1] // scale)
+
+
+def estimate_peak_bytes(size1, size2, direction='horizontal', formats=(None, None)):
+    """
+    普通拼接的峰值内存估计：两张原图 + 需要缩放的副本 + 画布。
+    formats 给出 "JPEG" 时按 draft() 缩小解码后的尺寸计算原图。
+    """
+    s1, s2, canvas = target_sizes(size1, size2, direction)
+    pixels = canvas[0] * canvas[1]
+    for size, target, fmt in zip((size1, size2), (s1, s2), formats):
+        decoded = draft_size(size, target) if fmt == "JPEG" else size
+        pixels += decoded[0] * decoded[1]
+        if decoded != target:
+            pixels += target[0] * target[1]
+    return pixels * BYTES_PER_PIXEL
+
+
+def estimate_streaming_peak_bytes(size1, size2, direction='horizontal',
+                                  formats=(None, None)):
+    """流式拼接的峰值内存估计：画布 + 较大的一张 (按 draft 缩小解码的) 原图，条带忽略不计"""
+    s1, s2, canvas = target_sizes(size1, size2, direction)
+    decoded = [draft_size(size, target) if fmt == "JPEG" else size
+               for size, target, fmt in zip((size1, size2), (s1, s2), formats)]
+    return (canvas[0] * canvas[1] + max(w * h for w, h in decoded)) * BYTES_PER_PIXEL
+
+
+def choose_strategy(size1, size2, direction='horizontal', formats=(None, None),
+                    memory_budget=None):
+    """
+    (是否流式拼接, 峰值内存估计)，与 merge_images 的自动选择规则一致：
+    普通拼接估计会超出 memory_budget、或原图超过 Pillow 的 MAX_IMAGE_PIXELS 时用流式。
+    """
+    from PIL import Image
+
+    limit = Image.MAX_IMAGE_PIXELS
+    too_large = limit and max(size1[0] * size1[1], size2[0] * size2[1]) > limit
+    peak = estimate_peak_bytes(size1, size2, direction, formats)
+    if too_large or (memory_budget is not None and peak > memory_budget):
+        return True, estimate_streaming_peak_bytes(size1, size2, direction, formats)
+    return False, peak
+
+
+def resample_filter(resample):
+    """名称 ("lanczos" 等) 或 Image.Resampling → Image.Resampling；None 原样返回"""
+    if resample is None or not isinstance(resample, str):
+        return resample
+    from PIL import Image
+
+    try:
+        return getattr(Image.Resampling, RESAMPLE_FILTERS[resample])
+    except KeyError:
+        raise ValueError(f"未知的重采样滤镜: {resample} "
+                         f"(可选: {', '.join(RESAMPLE_FILTERS)})") from None
+
+
+@contextlib.contextmanager
+def allow_large_images():
+    """临时关闭 Pillow 的 MAX_IMAGE_PIXELS 保护 (流式拼接自己按内存预算控制)"""
+    from PIL import Image
+
+    with _large_image_lock:
+        saved = Image.MAX_IMAGE_PIXELS
+        Image.MAX_IMAGE_PIXELS = None
+        try:
+            yield
+        finally:
+            Image.MAX_IMAGE_PIXELS = saved
+
+
+def probe_size(path):
+    """只读文件头获取 (宽, 高)"""
+    return probe(path)[1]
+
+
+def probe(path):
+    """只读文件头获取 (格式, (宽, 高))"""
+    with allow_large_images():
+        fmt, width, height, _ = read_header(path)
+    return fmt, (width, height)
+
+
+def _resize(img, size, resample, reducing_gap):
+    """缩放到 size；尺寸已经相同时直接返回原图，不复制"""
+    if img.size == size:
+        return img
+    instrument.count("pixels.resized", size[0] * size[1])
+    return _resizable(img).resize(size, resample, reducing_gap=reducing_gap)
+
+
+def _resizable(img):
+    """
+    Pillow 对 1 / P / PA 模式只能用最近邻缩放；贴到 RGB 画布时本来也要转换，
+    所以缩放之前先转成 RGB。其他模式原样返回。
+    """
+    if img.mode in ("1", "P", "PA"):
+        return img.convert("RGB")
+    return img
+
+
+# --------------------------
+# 画布复用：批量中同尺寸的各组共用一块画布
+# --------------------------
+class CanvasPool:
+    """
+    acquire(size) 取一张 RGB 画布，用完 release()。复用的画布保留着上一组的像素，
+    调用方必须把它整张覆盖 (拼接时两张图正好铺满画布)。
+    空闲画布按尺寸保留，最多为 曾经同时在用的数量 × sizes 张 (进程池每个进程、
+    线程池每个线程各算一个)，超出时丢掉最久没用的；批量里几种尺寸交替出现也能复用，
+    空闲时多占的内存有上限。省掉的是每组分配大块内存 (缺页) 和 Image.new 的清零。线程安全。
+    """
+
+    def __init__(self, sizes=2):
+        self.sizes = sizes
+        self._free = OrderedDict()    # 尺寸 -> [画布]，按最近使用排序
+        self._idle = 0
+        self._in_use = self._peak = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, size):
+        from PIL import Image
+
+        size = tuple(size)
+        with self._lock:
+            self._in_use += 1
+            self._peak = max(self._peak, self._in_use)
+            canvases = self._free.get(size)
+            if canvases:
+                canvas = canvases.pop()
+                if not canvases:
+                    del self._free[size]
+                self._idle -= 1
+                instrument.count("canvas.reused")
+                return canvas
+        instrument.count("canvas.allocated")
+        return Image.new("RGB", size)
+
+    def release(self, canvas):
+        with self._lock:
+            self._in_use -= 1
+            self._free.setdefault(canvas.size, []).append(canvas)
+            self._free.move_to_end(canvas.size)
+            self._idle += 1
+            while self._idle > self._peak * self.sizes:
+                oldest = next(iter(self._free))
+                canvases = self._free[oldest]
+                canvases.pop(0)
+                if not canvases:
+                    del self._free[oldest]
+                self._idle -= 1
+
+    def clear(self):
+        """丢掉空闲的画布 (例如批量结束后释放内存)"""
+        with self._lock:
+            self._free.clear()
+            self._idle = 0
+
+
+# 批量、热文件夹和拼接服务的工作进程 (线程) 共用
+canvas_pool = CanvasPool()
+
+
+# --------------------------
+# 工具：拼接两张图 (支持横向/纵向)
+# --------------------------
+def merge_images(img1_path, img2_path, output_path, direction='horizontal',
+                 memory_budget=None, streaming=None, lossless=True, images=None,
+                 encoder=None, resample=None, reducing_gap=DEFAULT_REDUCING_GAP,
+                 derivatives=(), canvas_pool=None):
+    """
+    拼接两张图并保存。
+    缩放：已经是目标尺寸的一张不再缩放；需要缩小的 JPEG 用 draft() 直接按
+    1/2、1/4、1/8 解码 (不低于目标尺寸)，再用 reducing_gap 加速剩下的缩小。
+    resample：重采样滤镜名称 (见 RESAMPLE_FILTERS) 或 Image.Resampling，默认 bicubic。
+    encoder：编码配置名称或 EncoderProfile (见 encoders.PROFILES)，决定格式、质量等；
+    调用方负责让 output_path 的扩展名与之一致 (profile.extension)。
+    images：已解码的 (图1, 图2) PIL 图片，某一项为 None 时从文件读取。
+    用于复用界面缓存里已经解码好的原图；提供了图片就不再考虑流式拼接。
+    lossless：两张 JPEG 同高 (同宽)、采样和量化表一致且边界对齐 MCU 时，
+    用 jpegtran 在 DCT 系数域直接拼接，不解码也不重新编码。
+    只用于 default 和 archive 配置 (见 encoders.allows_lossless)。
+    memory_budget：峰值内存预算 (字节)。普通拼接估计会超出预算、或原图超过
+    Pillow 的 MAX_IMAGE_PIXELS 时自动改用流式拼接；streaming=True/False 可强制选择。
+    derivatives：同时输出的派生版本 (预设名称、"名称:长边[:编码配置[:质量]]" 或
+    Derivative，见 derivatives 模块)，从同一张画布逐级缩小，写入 output_path 旁的子文件夹。
+    canvas_pool：给出 CanvasPool 时画布从中取用、保存后归还 (批量中复用，不再每组分配)。
+    """
+    from PIL import Image
+
+    profile = get_profile(encoder)
+    derivatives = resolve_derivatives(derivatives)
+    if (lossless and allows_lossless(profile)
+            and output_path.lower().endswith((".jpg", ".jpeg"))):
+        with instrument.stage("merge.lossless"):
+            joined = join_jpegs(img1_path, img2_path, output_path, direction)
+        if joined:
+            instrument.count("merge.lossless")
+            if derivatives:
+                _derive_from_file(output_path, derivatives, resample_filter(resample),
+                                  reducing_gap)
+            if instrument.enabled():
+                _count_file_bytes(img1_path, img2_path, output_path)
+            return
+
+    images = images or (None, None)
+    decoded = any(img is not None for img in images)
+    if streaming is None and not decoded and (memory_budget is not None
+                                              or Image.MAX_IMAGE_PIXELS):
+        fmt1, size1 = probe(img1_path)
+        fmt2, size2 = probe(img2_path)
+        streaming, _ = choose_strategy(size1, size2, direction, (fmt1, fmt2), memory_budget)
+
+    resample = resample_filter(resample)
+    if streaming:
+        instrument.count("merge.streaming")
+        merge_images_streaming(img1_path, img2_path, output_path, direction, memory_budget,
+                               profile, resample, reducing_gap, derivatives)
+        return
+
+    # open() 只读文件头，解码在 compose() 里计时
+    img1 = images[0] if images[0] is not None else Image.open(img1_path)
+    img2 = images[1] if images[1] is not None else Image.open(img2_path)
+    merged, tables = compose(img1, img2, direction, resample, reducing_gap, canvas_pool)
+    try:
+        if derivatives:
+            save_with_derivatives(merged, output_path, profile, tables, derivatives,
+                                  resample, reducing_gap)
+        else:
+            check_size(profile, merged.size)
+            with instrument.stage("merge.encode"):
+                merged.save(output_path, **save_options(profile, tables))
+            instrument.count("pixels.encoded", merged.width * merged.height)
+    finally:
+        if canvas_pool is not None:
+            canvas_pool.release(merged)
+    if instrument.enabled():
+        _count_file_bytes(img1_path, img2_path, output_path)
+
+
+def compose(img1, img2, direction='horizontal', resample=None,
+            reducing_gap=DEFAULT_REDUCING_GAP, canvas_pool=None):
+    """
+    把两张已打开的 PIL 图片缩放对齐后贴到 RGB 画布上，返回 (画布, 量化表)。
+    量化表是两张原图 source_tables() 的结果，供 save_options() 使用 (quality="keep")。
+    还没有解码的 JPEG 需要缩小时先用 draft() 低分辨率解码。
+    给出 canvas_pool 时画布从中取用，调用方用完要 release()；否则新建。
+    """
+    from PIL import Image
+
+    resample = resample_filter(resample)
+    with instrument.stage("merge.decode"):
+        s1, s2, canvas_size = target_sizes(img1.size, img2.size, direction)
+        # 要缩小的 JPEG 直接低分辨率解码 (已解码的图片上 draft 不起作用)
+        for img, target in ((img1, s1), (img2, s2)):
+            if img.format == "JPEG" and img.size != target:
+                img.draft(img.mode, target)
+        # 显式 load()，让解码和缩放分开计时 (否则解码发生在 resize 里)
+        img1.load()
+        img2.load()
+    # quality="keep" 需要原图的量化表，缩放之后就拿不到了
+    tables = (source_tables(img1), source_tables(img2))
+    instrument.count("pixels.decoded", img1.width * img1.height + img2.width * img2.height)
+
+    # 横向对齐高度、纵向对齐宽度 (目标尺寸按原图尺寸计算，与 draft 无关)
+    with instrument.stage("merge.resize"):
+        img1 = _resize(img1, s1, resample, reducing_gap)
+        img2 = _resize(img2, s2, resample, reducing_gap)
+
+    with instrument.stage("merge.compose"):
+        if canvas_pool is not None:
+            merged = canvas_pool.acquire(canvas_size)
+        else:
+            merged = Image.new("RGB", canvas_size)
+        try:
+            # 两张图正好铺满画布，复用的画布不用清空
+            merged.paste(img1, (0, 0))
+            merged.paste(img2, (s1[0], 0) if direction == 'horizontal' else (0, s1[1]))
+        except BaseException:
+            # 出错时调用方拿不到画布，在这里归还，否则它会一直算作在用
+            if canvas_pool is not None:
+                canvas_pool.release(merged)
+            raise
+    return merged, tables
+
+
+def _derive_from_file(output_path, derivatives, resample, reducing_gap):
+    """
+    无损拼接没有解码出画布：把写好的结果按最大的派生版本用 draft() 低分辨率解码一次，
+    再逐级缩小出各个版本。
+    """
+    from PIL import Image
+
+    with instrument.stage("merge.decode"):
+        with allow_large_images():
+            img = Image.open(output_path)
+        full_size = img.size
+        img.draft(img.mode, decode_size(full_size, derivatives))
+        img.load()
+    instrument.count("pixels.decoded", img.width * img.height)
+    try:
+        save_with_derivatives(img, output_path, tables=(source_tables(img),),
+                              derivatives=derivatives, resample=resample,
+                              reducing_gap=reducing_gap, save_main=False,
+                              full_size=full_size)
+    finally:
+        img.close()
+
+
+def _count_file_bytes(img1_path, img2_path, output_path):
+    """记录读入和写出的文件字节数 (只在开启统计时调用，省掉多余的 stat)"""
+    try:
+        instrument.count("bytes.read", os.path.getsize(img1_path) + os.path.getsize(img2_path))
+        instrument.count("bytes.written", os.path.getsize(output_path))
+    except OSError:
+        pass
+
+
+# --------------------------
+# 低分辨率预览：按预览尺寸解码和拼接，不生成全尺寸中间图
+# --------------------------
+def _scale_size(size, factor):
+    return max(1, int(size[0] * factor)), max(1, int(size[1] * factor))
+
+
+def merge_preview(img1_path, img2_path, direction='horizontal', max_size=(500, 300),
+                  make_canvas=None):
+    """
+    生成拼接效果的缩小预览，结果不超过 max_size。
+    JPEG 用 draft() 直接以接近预览的分辨率解码，然后缩放到位。
+    make_canvas(size) 可返回自备的画布 (例如与 QImage 共享内存的 PIL 图片)，
+    两张图直接贴进去，省掉之后的格式转换和字节复制；默认新建 RGB 画布。
+    """
+    from PIL import Image
+
+    with allow_large_images():
+        img1 = Image.open(img1_path)
+        img2 = Image.open(img2_path)
+
+    s1, s2, canvas_size = target_sizes(img1.size, img2.size, direction)
+    factor = min(max_size[0] / canvas_size[0], max_size[1] / canvas_size[1], 1.0)
+    s1, s2 = _scale_size(s1, factor), _scale_size(s2, factor)
+    if direction == 'horizontal':
+        canvas_size, offset = (s1[0] + s2[0], s1[1]), (s1[0], 0)
+    else:
+        canvas_size, offset = (s1[0], s1[1] + s2[1]), (0, s1[1])
+
+    merged = make_canvas(canvas_size) if make_canvas else Image.new("RGB", canvas_size)
+    for img, size, pos in ((img1, s1, (0, 0)), (img2, s2, offset)):
+        if img.format == "JPEG":
+            img.draft(img.mode, size)
+        # reducing_gap：先整数倍 reduce() 再精细缩放，预览质量足够且快得多
+        merged.paste(img.resize(size, reducing_gap=2.0), pos)
+        img.close()
+    return merged
+
+
+# --------------------------
+# 流式拼接：按条带缩放写入画布，一次只解码一张原图
+# --------------------------
+def _strip_rows(memory_budget, fixed_bytes, row_bytes):
+    """在预算内每个条带能处理多少行"""
+    if memory_budget is None:
+        return 256
+    spare = memory_budget - fixed_bytes
+    return max(MIN_STRIP_ROWS, spare // max(1, row_bytes))
+
+
+def merge_images_streaming(img1_path, img2_path, output_path,
+                           direction='horizontal', memory_budget=None, encoder=None,
+                           resample=None, reducing_gap=DEFAULT_REDUCING_GAP, derivatives=()):
+    """
+    大图拼接：不生成整张缩放副本，而是把每张原图按水平条带缩放后直接写入画布，
+    写完一张就释放它再解码下一张。峰值约为 画布 + 一张原图 + 一个条带。
+    Pillow 的 JPEG 编解码不支持分块，所以画布和单张原图仍需完整放在内存中；
+    JPEG 原图需要缩小时会用 draft() 以较低分辨率解码来进一步省内存。
+    """
+    from PIL import Image
+
+    size1 = probe_size(img1_path)
+    size2 = probe_size(img2_path)
+    s1, s2, canvas_size = target_sizes(size1, size2, direction)
+    if direction == 'horizontal':
+        offsets = [(0, 0), (s1[0], 0)]
+    else:
+        offsets = [(0, 0), (0, s1[1])]
+
+    profile = get_profile(encoder)
+    check_size(profile, canvas_size)
+    resample = resample_filter(resample)
+    tables = []
+
+    canvas_bytes = canvas_size[0] * canvas_size[1] * BYTES_PER_PIXEL
+    with instrument.stage("merge.compose"):
+        merged = Image.new("RGB", canvas_size)
+
+    for path, (tw, th), (x, y) in zip((img1_path, img2_path), (s1, s2), offsets):
+        with instrument.stage("merge.decode"):
+            with allow_large_images():
+                src = Image.open(path)
+            if src.format == "JPEG":
+                src.draft(src.mode, (tw, th))
+            src.load()
+        sw, sh = src.size
+        tables.append(source_tables(src))
+        instrument.count("pixels.decoded", sw * sh)
+        if (sw, sh) != (tw, th):
+            # 与 _resize 相同：调色板等模式先转 RGB，条带缩放才能用指定的滤镜
+            converted = _resizable(src)
+            if converted is not src:
+                src.close()
+                src = converted
+
+        src_bytes = sw * sh * BYTES_PER_PIXEL
+        # 每个输出行：缩放结果一行 + 对应的原图行 (纵向缩小时)
+        row_bytes = (tw + sw * max(1, sh // th)) * BYTES_PER_PIXEL
+        rows = _strip_rows(memory_budget, canvas_bytes + src_bytes, row_bytes)
+
+        # 条带缩放和贴入交替进行，合在一起计时
+        with instrument.stage("merge.resize"):
+            if (sw, sh) == (tw, th):
+                merged.paste(src, (x, y))
+            else:
+                for oy in range(0, th, rows):
+                    n = min(rows, th - oy)
+                    box = (0, oy * sh / th, sw, (oy + n) * sh / th)
+                    merged.paste(src.resize((tw, n), resample, box=box,
+                                            reducing_gap=reducing_gap), (x, y + oy))
+        src.close()
+        del src
+
+    if derivatives:
+        save_with_derivatives(merged, output_path, profile, tables, derivatives,
+                              resample, reducing_gap)
+    else:
+        with instrument.stage("merge.encode"):
+            merged.save(output_path, **save_options(profile, tables))
+        instrument.count("pixels.encoded", canvas_size[0] * canvas_size[1])
+    if instrument.enabled():
+        _count_file_bytes(img1_path, img2_path, output_path)
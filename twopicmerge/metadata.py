@@ -0,0 +1,164 @@
+import os
+import sqlite3
+import hashlib
+import datetime
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from . import instrument
+from .exif import read_header
+from .thumbs import cache_dir
+
+# 单个文件的元数据；capture_time 为 EXIF 拍摄时间，没有时为 None
+ImageMeta = namedtuple(
+    "ImageMeta", "size mtime_ns capture_time width height format"
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    name         TEXT PRIMARY KEY,
+    size         INTEGER NOT NULL,
+    mtime_ns     INTEGER NOT NULL,
+    capture_time TEXT,
+    width        INTEGER,
+    height       INTEGER,
+    format       TEXT
+)
+"""
+
+
+def index_path(folder):
+    """文件夹对应的索引文件位置 (放在用户缓存目录，不写入图片文件夹)"""
+    key = hashlib.sha1(os.path.abspath(folder).encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir(), "index", key + ".sqlite")
+
+
+def capture_time_of(meta):
+    """排序用的时间：EXIF 拍摄时间，没有时用文件修改时间"""
+    if meta.capture_time is not None:
+        return meta.capture_time
+    return datetime.datetime.fromtimestamp(meta.mtime_ns / 1e9)
+
+
+def _parse(path, st):
+    try:
+        fmt, width, height, captured = read_header(path)
+    except Exception:
+        fmt = width = height = captured = None
+    return ImageMeta(st.st_size, st.st_mtime_ns, captured, width, height, fmt)
+
+
+# --------------------------
+# 每个文件夹一份的元数据索引
+# --------------------------
+class MetadataIndex:
+    """
+    按 (文件名, 大小, 修改时间) 缓存拍摄时间、尺寸和格式，存放在 SQLite 中。
+    首次扫描用线程池并行只读文件头；之后文件没变就直接用索引里的值。
+    """
+
+    def __init__(self, folder, path=None, workers=8):
+        self.folder = folder
+        self.workers = workers
+        self._lock = threading.Lock()
+
+        path = path or index_path(folder)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(_SCHEMA)
+        except (OSError, sqlite3.Error):
+            # 缓存目录不可写时退化为只在内存中索引
+            self._db = sqlite3.connect(":memory:", check_same_thread=False)
+            self._db.execute(_SCHEMA)
+
+        self._rows = {}
+        for name, size, mtime_ns, captured, width, height, fmt in self._db.execute(
+            "SELECT name, size, mtime_ns, capture_time, width, height, format FROM files"
+        ):
+            if captured:
+                captured = datetime.datetime.fromisoformat(captured)
+            self._rows[name] = ImageMeta(size, mtime_ns, captured, width, height, fmt)
+
+    def lookup(self, names, stats=None):
+        """
+        返回 {文件名: ImageMeta}。stats 可传入已有的 os.stat 结果 ({文件名: stat})，
+        省去再次 stat。索引中没有或已变化的文件会被并行解析并写回索引。
+        """
+        result = {}
+        stale = []
+        for name in names:
+            st = stats.get(name) if stats else None
+            if st is None:
+                try:
+                    st = os.stat(os.path.join(self.folder, name))
+                except OSError:
+                    continue
+            with self._lock:
+                meta = self._rows.get(name)
+            if meta and meta.size == st.st_size and meta.mtime_ns == st.st_mtime_ns:
+                result[name] = meta
+            else:
+                stale.append((name, st))
+
+        instrument.count("metadata.hit", len(result))
+        instrument.count("metadata.miss", len(stale))
+        if stale:
+            with instrument.stage("metadata.parse", files=len(stale)):
+                with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                    parsed = list(pool.map(
+                        lambda item: _parse(os.path.join(self.folder, item[0]), item[1]),
+                        stale,
+                    ))
+            self._store([(name, meta) for (name, _), meta in zip(stale, parsed)])
+            for (name, _), meta in zip(stale, parsed):
+                result[name] = meta
+
+        return result
+
+    def get(self, name):
+        return self.lookup([name]).get(name)
+
+    def capture_times(self, names, stats=None):
+        """返回 {文件名: 排序用时间}"""
+        return {name: capture_time_of(meta)
+                for name, meta in self.lookup(names, stats).items()}
+
+    def _store(self, items):
+        rows = [
+            (name, m.size, m.mtime_ns,
+             m.capture_time.isoformat() if m.capture_time else None,
+             m.width, m.height, m.format)
+            for name, m in items
+        ]
+        with self._lock:
+            for name, meta in items:
+                self._rows[name] = meta
+            try:
+                with self._db:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+                    )
+            except sqlite3.Error:
+                pass
+
+    def prune(self, names):
+        """删除不在 names 中的记录 (已移动到 processed/ 或被删除的文件)"""
+        keep = set(names)
+        with self._lock:
+            gone = [name for name in self._rows if name not in keep]
+            for name in gone:
+                del self._rows[name]
+            if gone:
+                try:
+                    with self._db:
+                        self._db.executemany(
+                            "DELETE FROM files WHERE name = ?", [(n,) for n in gone]
+                        )
+                except sqlite3.Error:
+                    pass
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,236 @@
+import os
+import math
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from . import instrument
+from .merge import allow_large_images
+
+# 图块边长 (像素)
+TILE_SIZE = 256
+# JPEG 解码器能直接按 1/2、1/4、1/8 缩小解码 (draft)
+_JPEG_DRAFT_LEVELS = 3
+
+
+# --------------------------
+# 多分辨率图像金字塔
+# --------------------------
+class ImagePyramid:
+    """
+    第 0 层是原图，第 k 层边长为原图的 1/2^k (向上取整)，一直缩到整张图只有一个图块。
+    各层在第一次用到时才生成并缓存：JPEG 的较粗层用 draft() 直接低分辨率解码，
+    其余层由上一层 reduce(2) 得到，所以只看全图时不会解码全分辨率原图。
+    各层统一为 RGB/RGBA，可直接用于拼接。可在多个线程中同时调用。
+    """
+
+    def __init__(self, source, tile_size=TILE_SIZE):
+        """source：图片路径或 PIL 图片"""
+        from PIL import Image
+
+        self.tile_size = tile_size
+        self._levels = {}
+        self._lock = threading.Lock()
+
+        if isinstance(source, Image.Image):
+            self.path = None
+            self.format = None
+            self._levels[0] = self._normalize(source)
+            self.width, self.height = source.size
+        else:
+            self.path = source
+            with allow_large_images():
+                with Image.open(source) as img:
+                    self.format = img.format
+                    self.width, self.height = img.size
+
+        longest = max(self.width, self.height, 1)
+        self.levels = max(1, math.ceil(math.log2(longest / tile_size)) + 1)
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def level_size(self, level):
+        f = 1 << level
+        return -(-self.width // f), -(-self.height // f)
+
+    def fit_level(self, max_size):
+        """整张图缩放到 max_size 以内显示时用的层"""
+        scale = min(max_size[0] / self.width, max_size[1] / self.height, 1.0)
+        return self.level_for(scale)
+
+    def level_for(self, scale):
+        """显示比例为 scale 时该用哪一层：分辨率不低于屏幕需要的最粗一层"""
+        if scale <= 0:
+            return self.levels - 1
+        level = int(math.floor(math.log2(1 / scale))) if scale < 1 else 0
+        return min(max(level, 0), self.levels - 1)
+
+    def tile_grid(self, level):
+        """第 level 层的图块列数、行数"""
+        w, h = self.level_size(level)
+        return -(-w // self.tile_size), -(-h // self.tile_size)
+
+    def tile_box(self, level, tx, ty):
+        """图块在该层中的像素范围 (left, top, right, bottom)"""
+        w, h = self.level_size(level)
+        x, y = tx * self.tile_size, ty * self.tile_size
+        return x, y, min(x + self.tile_size, w), min(y + self.tile_size, h)
+
+    # --------------------------
+    # 各层图像
+    # --------------------------
+    @staticmethod
+    def _normalize(img):
+        mode = "RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB"
+        return img if img.mode == mode else img.convert(mode)
+
+    @property
+    def nbytes(self):
+        """已生成各层占用的内存 (字节)"""
+        return sum(img.width * img.height * 4 for img in list(self._levels.values()))
+
+    def cached_level(self, level):
+        """已生成的层，没有则返回 None (不会触发解码)"""
+        return self._levels.get(level)
+
+    def level(self, level):
+        img = self._levels.get(level)
+        if img is not None:
+            return img
+        with self._lock:
+            return self._build(level)
+
+    def _build(self, level):
+        img = self._levels.get(level)
+        if img is not None:
+            return img
+
+        with instrument.stage("pyramid.level", level=level):
+            return self._decode_level(level)
+
+    def _decode_level(self, level):
+        from PIL import Image
+
+        size = self.level_size(level)
+        if self.path and (level == 0 or (self.format == "JPEG"
+                                        and level <= _JPEG_DRAFT_LEVELS)):
+            with allow_large_images():
+                src = Image.open(self.path)
+                if level:
+                    src.draft(src.mode, size)
+                src.load()
+            img = src if src.size == size else src.resize(size, Image.Resampling.BOX)
+        else:
+            img = self._build(level - 1).reduce(2)
+            if img.size != size:
+                img = img.resize(size, Image.Resampling.BOX)
+
+        img = self._normalize(img)
+        self._levels[level] = img
+        return img
+
+    def paste_tile(self, canvas, level, tx, ty):
+        """把图块贴进 canvas (左上角对齐，大小应等于 tile_box)，只复制和转换这一块像素"""
+        canvas.paste(self.level(level).crop(self.tile_box(level, tx, ty)))
+        return canvas
+
+
+# --------------------------
+# 已解码图片的共享缓存 (按内存上限 LRU 淘汰)
+# --------------------------
+def _stat_key(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+class PyramidCache:
+    """
+    路径 -> ImagePyramid。预览窗口和手动拼接共用同一份解码结果：
+    屏幕分辨率的层供预览使用，第 0 层 (原图) 供拼接使用。
+    文件的 mtime/大小变化后自动作废；总内存超过 max_bytes 时淘汰最久没用的。
+    prefetch() 在后台线程中提前解码，不阻塞界面；不再使用时调用 close() 结束后台线程。
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024, workers=2):
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self._items = OrderedDict()  # 路径 -> (文件标识, ImagePyramid)
+        self._lock = threading.Lock()
+        self._executor = None  # 第一次预取时创建
+
+    def get(self, path):
+        """返回 path 的金字塔 (各层按需生成)；文件不可读时抛出 OSError"""
+        key = _stat_key(path)
+        with self._lock:
+            item = self._items.get(path)
+            if item is not None and item[0] == key:
+                self._items.move_to_end(path)
+                instrument.count("pyramid.hit")
+                return item[1]
+            instrument.count("pyramid.miss")
+            # 在锁内创建 (只读文件头)，避免预取线程和界面同时各解码一份
+            pyramid = ImagePyramid(path)
+            self._items[path] = (key, pyramid)
+            self._items.move_to_end(path)
+        self.trim()
+        return pyramid
+
+    def peek(self, path):
+        """只查缓存，不读文件"""
+        with self._lock:
+            item = self._items.get(path)
+        return item[1] if item else None
+
+    def prefetch(self, path, max_size=None):
+        """
+        后台解码：给出 max_size 时只生成适合该显示尺寸的层 (预览用)，
+        否则解码原图 (拼接用)。
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers)
+            return self._executor.submit(self._prefetch, path, max_size)
+
+    def _prefetch(self, path, max_size):
+        try:
+            pyramid = self.get(path)
+            pyramid.level(pyramid.fit_level(max_size) if max_size else 0)
+        except Exception as e:
+            print(f"Prefetch error: {path}: {e}")
+            return
+        self.trim()
+
+    def discard(self, path):
+        with self._lock:
+            self._items.pop(path, None)
+
+    def clear(self):
+        """清空缓存，并取消还在排队的预取 (切换文件夹时使用)"""
+        self.shutdown()
+        with self._lock:
+            self._items.clear()
+
+    def shutdown(self):
+        """取消排队中的预取并结束后台线程 (不等正在解码的那张)；之后再预取会重新创建"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def close(self):
+        self.clear()
+
+    def trim(self):
+        """超出内存上限时淘汰最久没用的 (至少保留最近一个)"""
+        with self._lock:
+            total = sum(p.nbytes for _, p in self._items.values())
+            while total > self.max_bytes and len(self._items) > 1:
+                _, (_, pyramid) = self._items.popitem(last=False)
+                total -= pyramid.nbytes
+
+    def stats(self):
+        with self._lock:
+            return {"items": len(self._items),
+                    "bytes": sum(p.nbytes for _, p in self._items.values())}
@@ -0,0 +1,133 @@
+import os
+import datetime
+
+from . import instrument
+from .exif import read_header
+from .metadata import MetadataIndex
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+
+# --------------------------
+# 工作目录：processed/ 与 result/
+# --------------------------
+def prepare_folders(folder):
+    """创建 processed/ 和 result/ 子文件夹，返回两者路径"""
+    processed_folder = os.path.join(folder, "processed")
+    os.makedirs(processed_folder, exist_ok=True)
+
+    result_folder = os.path.join(folder, "result")
+    os.makedirs(result_folder, exist_ok=True)
+
+    return processed_folder, result_folder
+
+
+# --------------------------
+# 待处理图片索引
+# --------------------------
+def _is_image(name):
+    return name.lower().endswith(IMAGE_EXTS)
+
+
+def _scan_dir(path):
+    """一次 os.scandir：返回 {文件名: DirEntry} (只含普通文件)"""
+    try:
+        with os.scandir(path) as it:
+            return {e.name: e for e in it if e.is_file()}
+    except OSError:
+        return {}
+
+
+class FolderIndex:
+    """
+    主文件夹中尚未处理的图片 (不在 processed/ 和 result/ 中)。
+    每个目录只用一次 os.scandir 建立集合；之后 refresh() 只重新列出发生变化的目录，
+    并返回增删的文件名，新增文件才会 stat。
+    """
+
+    def __init__(self, folder, processed_folder, result_folder):
+        self.folder = folder
+        self.processed_folder = processed_folder
+        self.result_folder = result_folder
+        self._images = {}   # 主文件夹中的图片: 文件名 -> os.stat_result
+        self._done = {processed_folder: set(), result_folder: set()}
+        self.refresh()
+
+    def dirs(self):
+        return [self.folder, self.processed_folder, self.result_folder]
+
+    def is_pending(self, name):
+        return name in self._images and not any(name in s for s in self._done.values())
+
+    def pending(self):
+        """待处理图片文件名 (无序)"""
+        done = self._done[self.processed_folder] | self._done[self.result_folder]
+        return [name for name in self._images if name not in done]
+
+    def stats(self, names=None):
+        """{文件名: os.stat_result}，供元数据索引使用，避免再次 stat"""
+        if names is None:
+            return dict(self._images)
+        return {name: self._images[name] for name in names if name in self._images}
+
+    def refresh(self, dirs=None):
+        """重新列出 dirs (默认全部三个目录)，返回待处理图片的 (新增, 移除) 文件名"""
+        before = set(self.pending())
+
+        for path in dirs or self.dirs():
+            entries = _scan_dir(path)
+            if path == self.folder:
+                names = {name for name in entries if _is_image(name)}
+                for name in set(self._images) - names:
+                    del self._images[name]
+                for name in names - set(self._images):
+                    try:
+                        self._images[name] = entries[name].stat()
+                    except OSError:
+                        pass
+            elif path in self._done:
+                self._done[path] = set(entries)
+
+        after = set(self.pending())
+        return sorted(after - before), sorted(before - after)
+
+    def add_done(self, path, names):
+        """记录刚移入 processed/ 或写入 result/ 的文件 (path 为其中之一)，不重新列目录"""
+        self._done[path].update(names)
+
+
+def list_images(folder, processed_folder, result_folder):
+    """列出尚未处理的图片文件名（不在 processed/ 和 result/ 中）"""
+    return FolderIndex(folder, processed_folder, result_folder).pending()
+
+
+# --------------------------
+# 获取图片拍摄时间（EXIF → mtime）
+# --------------------------
+def get_capture_time(full_path):
+    with instrument.stage("capture_time"):
+        try:
+            captured = read_header(full_path)[3]
+            if captured is not None:
+                instrument.count("capture_time.exif")
+                return captured
+        except Exception:
+            pass
+
+        # 无 EXIF → 文件修改时间
+        instrument.count("capture_time.mtime")
+        return datetime.datetime.fromtimestamp(os.path.getmtime(full_path))
+
+
+def sort_files(folder, files, by='time', index=None, stats=None):
+    """按拍摄时间 ('time') 或文件名 ('name') 排序，返回新列表"""
+    if by == 'name':
+        return sorted(files)
+    own_index = index is None
+    index = index or MetadataIndex(folder)
+    try:
+        times = index.capture_times(files, stats)
+    finally:
+        if own_index:
+            index.close()
+    return sorted(files, key=lambda f: times.get(f, datetime.datetime.min))
@@ -0,0 +1,222 @@
+"""
+按内存预算调度批量拼接。
+
+每组的峰值内存和耗时只根据文件头里的尺寸和格式估计 (不解码)：
+尺寸来自元数据索引，能否无损拼接只读 JPEG 头部判断。
+引擎按估计耗时从长到短提交 (最长的先做，最后不会剩一个大组拖尾)，
+在途各组的估计峰值之和不超过内存预算；最前面的组放不下时先用能放下的小组填满空闲。
+"""
+import os
+import heapq
+import shutil
+import tempfile
+from collections import namedtuple
+
+from . import instrument
+from .derivatives import derivative_size, resolve_derivatives
+from .encoders import allows_lossless, get_profile
+from .lossless import can_join, find_jpegtran, read_layout
+from .merge import BYTES_PER_PIXEL, choose_strategy, draft_size, merge_images, target_sizes
+from .metadata import MetadataIndex
+
+PairEstimate = namedtuple("PairEstimate", "pair peak_bytes seconds streaming lossless")
+
+# 单个进程的大致吞吐量：像素/秒 (无损拼接为输入字节/秒)。
+# 只用于排序和估计总时长，calibrate() 可按本机实测替换
+DEFAULT_RATES = {
+    "decode": 80e6,      # 解码 (draft 缩小之后的像素)
+    "resize": 120e6,     # 缩放 (输出像素)
+    "compose": 400e6,    # 新建画布 + 贴入 (画布像素)
+    "encode": {"JPEG": 50e6, "WEBP": 6e6, "PNG": 4e6},
+    "lossless": 60e6,
+}
+
+
+# --------------------------
+# 单组估计
+# --------------------------
+def _encode_rate(rates, fmt):
+    encode = rates["encode"]
+    return encode.get(fmt, encode["JPEG"]) if isinstance(encode, dict) else encode
+
+
+def estimate_pair(folder, pair, metas, direction='horizontal', merge_options=None,
+                  rates=None):
+    """
+    metas：{文件名: ImageMeta} (MetadataIndex.lookup 的结果)。
+    尺寸未知 (文件读不了) 时估计为 0，照常提交，由拼接本身报错。
+    """
+    options = merge_options or {}
+    rates = rates or DEFAULT_RATES
+    m1, m2 = metas.get(pair[0]), metas.get(pair[1])
+    if not (m1 and m2 and m1.width and m2.width):
+        return PairEstimate(tuple(pair), 0, 0.0, False, False)
+
+    size1, size2 = (m1.width, m1.height), (m2.width, m2.height)
+    formats = (m1.format, m2.format)
+    s1, s2, canvas = target_sizes(size1, size2, direction)
+    canvas_pixels = canvas[0] * canvas[1]
+    profile = get_profile(options.get("encoder"))
+
+    # 无损拼接：jpegtran 在内存中保留两张图的 DCT 系数，时间与文件大小成正比
+    aligned = size1[1] == size2[1] if direction == 'horizontal' else size1[0] == size2[0]
+    if (options.get("lossless", True) and allows_lossless(profile)
+            and formats == ("JPEG", "JPEG") and aligned and find_jpegtran()):
+        paths = [os.path.join(folder, name) for name in pair]
+        if can_join(read_layout(paths[0]), read_layout(paths[1]), direction):
+            peak = (size1[0] * size1[1] + size2[0] * size2[1]) * BYTES_PER_PIXEL
+            seconds = (m1.size + m2.size) / rates["lossless"]
+            extra_bytes, extra_seconds = _derivatives_cost(canvas, options, rates, True)
+            return PairEstimate(tuple(pair), max(peak, extra_bytes),
+                                seconds + extra_seconds, False, True)
+
+    streaming, peak = choose_strategy(size1, size2, direction, formats,
+                                      options.get("memory_budget"))
+    decoded = resized = 0
+    for size, target, fmt in zip((size1, size2), (s1, s2), formats):
+        w, h = draft_size(size, target) if fmt == "JPEG" else size
+        decoded += w * h
+        if (w, h) != target:
+            resized += target[0] * target[1]
+    seconds = (decoded / rates["decode"] + resized / rates["resize"]
+               + canvas_pixels / rates["compose"]
+               + canvas_pixels / _encode_rate(rates, profile.format))
+    extra_bytes, extra_seconds = _derivatives_cost(canvas, options, rates)
+    return PairEstimate(tuple(pair), peak + extra_bytes, seconds + extra_seconds,
+                        streaming, False)
+
+
+def _derivatives_cost(canvas, options, rates, decode=False):
+    """
+    派生版本额外的 (内存, 耗时)：逐级缩小的各级同时在内存中等待编码；
+    decode=True (无损拼接) 时还要把结果按最大的一级解码一次。
+    """
+    derivatives = resolve_derivatives(options.get("derivatives"))
+    sizes = [derivative_size(canvas, d.max_side) for d in derivatives]
+    scaled = sum(w * h for w, h in sizes if (w, h) != canvas)
+    seconds = scaled / rates["resize"] + sum(
+        w * h / _encode_rate(rates, get_profile(d.encoder).format)
+        for d, (w, h) in zip(derivatives, sizes))
+    pixels = scaled
+    if decode and sizes:
+        largest = max(w * h for w, h in sizes)
+        seconds += largest / rates["decode"]
+        pixels += largest
+    return pixels * BYTES_PER_PIXEL, seconds
+
+
+def estimate_pairs(folder, pairs, direction='horizontal', merge_options=None,
+                   rates=None, index=None):
+    """所有组的估计；尺寸和格式从元数据索引读取 (新文件只读文件头)"""
+    names = [name for pair in pairs for name in pair]
+    own_index = index is None
+    index = index or MetadataIndex(folder)
+    try:
+        metas = index.lookup(names)
+    finally:
+        if own_index:
+            index.close()
+    return [estimate_pair(folder, pair, metas, direction, merge_options, rates)
+            for pair in pairs]
+
+
+# --------------------------
+# 放行队列
+# --------------------------
+class AdmissionQueue:
+    """
+    memory_limit (字节) 为 None 时按原顺序放行、不限内存；
+    否则按估计耗时从长到短，只在 在途峰值之和 + 该组峰值 <= memory_limit 时放行。
+    单组就超过预算时，等其他组都结束后单独运行。
+    """
+
+    def __init__(self, estimates, memory_limit=None):
+        self.memory_limit = memory_limit
+        self._items = list(estimates)
+        if memory_limit is not None:
+            self._items.sort(key=lambda e: (e.seconds, e.peak_bytes), reverse=True)
+        self.in_use = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def take(self, running):
+        """下一组可以开始的 PairEstimate；需要等在途的组结束时返回 None"""
+        if not self._items:
+            return None
+        if self.memory_limit is None or running == 0:
+            item = self._items.pop(0)
+        else:
+            spare = self.memory_limit - self.in_use
+            index = next((i for i, e in enumerate(self._items) if e.peak_bytes <= spare), None)
+            if index is None:
+                return None
+            item = self._items.pop(index)
+        self.in_use += item.peak_bytes
+        return item
+
+    def release(self, item):
+        self.in_use -= item.peak_bytes
+
+
+# --------------------------
+# 预演：估计总耗时和峰值内存
+# --------------------------
+def simulate(estimates, workers, memory_limit=None):
+    """按引擎同样的放行规则模拟运行，返回 (预计总耗时, 预计峰值内存)"""
+    queue = AdmissionQueue(estimates, memory_limit)
+    running = []  # (结束时间, 序号, PairEstimate)
+    now = peak = 0
+    seq = 0
+    while len(queue) or running:
+        while len(running) < workers:
+            item = queue.take(len(running))
+            if item is None:
+                break
+            seq += 1
+            heapq.heappush(running, (now + item.seconds, seq, item))
+            peak = max(peak, queue.in_use)
+        now, _, item = heapq.heappop(running)
+        queue.release(item)
+    return now, peak
+
+
+def calibrate(folder, estimates, direction='horizontal', merge_options=None):
+    """
+    把估计耗时居中的一组 (不走无损拼接的) 实际拼接到临时目录，
+    用各阶段的计时和像素数换算出本机的吞吐量。不移动、不修改任何文件。
+    """
+    candidates = sorted((e for e in estimates if not e.lossless and e.peak_bytes),
+                        key=lambda e: e.seconds)
+    if not candidates:
+        return DEFAULT_RATES
+    pair = candidates[len(candidates) // 2].pair
+    options = dict(merge_options or {})
+    profile = get_profile(options.get("encoder"))
+    # 只测主结果：派生版本的缩小和编码会混进各阶段的计时
+    options.pop("derivatives", None)
+
+    tmp = tempfile.mkdtemp(prefix="2picmerge-calibrate-")
+    try:
+        with instrument.collect() as recorder:
+            merge_images(os.path.join(folder, pair[0]), os.path.join(folder, pair[1]),
+                         os.path.join(tmp, "out" + profile.extension), direction,
+                         **options)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    data = recorder.summary()
+    stages, counters = data["stages"], data["counters"]
+
+    def rate(stage, counter, default):
+        seconds = stages.get(stage, {}).get("total")
+        value = counters.get(counter)
+        return value / seconds if seconds and value else default
+
+    rates = dict(DEFAULT_RATES, encode=dict(DEFAULT_RATES["encode"]))
+    rates["decode"] = rate("merge.decode", "pixels.decoded", rates["decode"])
+    rates["resize"] = rate("merge.resize", "pixels.resized", rates["resize"])
+    rates["compose"] = rate("merge.compose", "pixels.encoded", rates["compose"])
+    rates["encode"][profile.format] = rate("merge.encode", "pixels.encoded",
+                                           _encode_rate(rates, profile.format))
+    return rates
@@ -0,0 +1,421 @@
+"""
+常驻的本地 HTTP 拼接服务 (asyncio，只用标准库)。
+
+    python -m twopicmerge serve --port 8765
+
+    curl -F image1=@a.jpg -F image2=@b.jpg "http://127.0.0.1:8765/merge?direction=h" -o out.jpg
+    curl http://127.0.0.1:8765/health
+    curl http://127.0.0.1:8765/metrics
+
+事件循环只负责收发请求；解码、缩放、编码在进程池中执行。
+请求先进入有界队列，队列满时直接返回 503 (Retry-After)，不会无限堆积内存。
+每个工作进程一次取走队列里已在等待的若干组 (最多 batch_size 组) 一起处理，
+负载高时减少进程间往返的次数；负载低时不会为了凑批而等待。
+"""
+import os
+import re
+import json
+import time
+import asyncio
+from collections import Counter, deque
+from concurrent.futures import BrokenExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from .encoders import get_profile
+from .inmemory import merge_pair
+from .merge import canvas_pool, resample_filter
+
+DIRECTIONS = {'h': 'horizontal', 'v': 'vertical', 'horizontal': 'horizontal',
+              'vertical': 'vertical'}
+CONTENT_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+# 请求头最多这么多行；每次读取 (含空闲的 keep-alive 连接) 最多等这么久 (秒)。
+# 超时只针对没有数据到达的时间，慢速上传大文件只要一直有数据就不会被断开；
+# 正文大小另由 max_body 限制
+MAX_HEADERS = 100
+IDLE_TIMEOUT = 30.0
+# 读取正文时每次最多读这么多字节
+_BODY_CHUNK = 256 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# --------------------------
+# 工作进程中执行
+# --------------------------
+def _warm_worker():
+    """工作进程启动时先导入 Pillow 并注册插件，第一个请求不用再付这部分时间"""
+    from PIL import Image
+    Image.init()
+
+
+def _merge_batch(jobs):
+    """处理一批 (图1, 图2, 参数)，返回 [(状态码, 结果 bytes 或错误信息)]"""
+    results = []
+    for data1, data2, options in jobs:
+        try:
+            results.append((200, merge_pair(data1, data2, canvas_pool=canvas_pool,
+                                            **options)))
+        except (OSError, ValueError) as e:
+            # 无法识别的图片、尺寸超出格式限制等：请求本身的问题
+            from PIL import UnidentifiedImageError
+
+            if isinstance(e, UnidentifiedImageError):
+                e = "无法识别的图片格式"
+            results.append((400, str(e) or type(e).__name__))
+        except Exception as e:
+            results.append((500, f"{type(e).__name__}: {e}"))
+    return results
+
+
+# --------------------------
+# 请求解析
+# --------------------------
+async def _read_body(reader, length, idle_timeout):
+    """读 length 字节正文；每次 read() 单独计算空闲超时"""
+    chunks = []
+    remaining = length
+    while remaining:
+        chunk = await asyncio.wait_for(reader.read(min(remaining, _BODY_CHUNK)), idle_timeout)
+        if not chunk:
+            raise asyncio.IncompleteReadError(b"".join(chunks), length)
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+async def read_request(reader, max_body, idle_timeout=IDLE_TIMEOUT):
+    """
+    读一个 HTTP/1.x 请求，返回 (方法, 路径, 查询参数, 请求头, 正文)；连接关闭时返回 None。
+    任何一次读取超过 idle_timeout 秒没有数据时抛出 asyncio.TimeoutError。
+    """
+    line = await asyncio.wait_for(reader.readline(), idle_timeout)
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "请求行格式错误") from None
+
+    headers = {}
+    for _ in range(MAX_HEADERS):
+        line = await asyncio.wait_for(reader.readline(), idle_timeout)
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    else:
+        raise HTTPError(400, "请求头过多")
+    headers[":version"] = version
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        raise HTTPError(411, "需要 Content-Length (不支持分块传输)")
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HTTPError(400, "Content-Length 格式错误") from None
+    if length > max_body:
+        raise HTTPError(413, f"请求正文超过 {max_body // (1024 * 1024)} MB")
+    body = await _read_body(reader, length, idle_timeout)
+
+    url = urlsplit(target)
+    query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+    return method.upper(), url.path, query, headers, body
+
+
+_BOUNDARY = re.compile(r'boundary="?([^";]+)"?')
+_FIELD_NAME = re.compile(rb'[;\s]name="([^"]*)"')
+
+
+def parse_multipart(body, content_type):
+    """multipart/form-data → {字段名: bytes}"""
+    match = _BOUNDARY.search(content_type or "")
+    if not content_type.startswith("multipart/form-data") or not match:
+        raise HTTPError(400, "请用 multipart/form-data 上传 image1 和 image2")
+    delimiter = b"--" + match.group(1).encode("latin-1")
+    fields = {}
+    for part in body.split(delimiter)[1:]:
+        if part.startswith(b"--"):
+            break
+        head, sep, data = part.partition(b"\r\n\r\n")
+        name = _FIELD_NAME.search(head)
+        if not sep or not name:
+            continue
+        if data.endswith(b"\r\n"):
+            data = data[:-2]
+        fields[name.group(1).decode("utf-8", "replace")] = data
+    return fields
+
+
+def merge_options(query, fields):
+    """查询参数或表单字段 → merge_pair 的参数；参数不合法时抛出 HTTPError(400)"""
+    def value(name, default=None):
+        raw = fields.get(name)
+        if raw is None:
+            return query.get(name, default)
+        try:
+            return raw.decode("utf-8").strip()
+        except UnicodeDecodeError:
+            raise HTTPError(400, f"{name} 不是 UTF-8 文本") from None
+
+    direction = DIRECTIONS.get(value("direction", "h"))
+    if direction is None:
+        raise HTTPError(400, "direction 只能是 h 或 v")
+    options = {"direction": direction}
+    try:
+        options["encoder"] = get_profile(value("encoder")).name
+        if value("resample"):
+            resample_filter(value("resample"))
+            options["resample"] = value("resample")
+    except ValueError as e:
+        raise HTTPError(400, str(e)) from None
+    return options
+
+
+# --------------------------
+# 指标
+# --------------------------
+class Metrics:
+    """请求计数、最近 window 秒的吞吐量、最近 samples 个请求的延迟分位数"""
+
+    def __init__(self, window=60.0, samples=2048):
+        self.started = time.monotonic()
+        self.window = window
+        self.counters = Counter()
+        self.latencies = deque(maxlen=samples)
+        self._finished = deque()
+
+    def finished(self, status, latency):
+        now = time.monotonic()
+        self.counters["merged" if status == 200 else "failed"] += 1
+        self.latencies.append(latency)
+        self._finished.append(now)
+        while self._finished and self._finished[0] < now - self.window:
+            self._finished.popleft()
+
+    def snapshot(self, **gauges):
+        now = time.monotonic()
+        while self._finished and self._finished[0] < now - self.window:
+            self._finished.popleft()
+        uptime = now - self.started
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))], 4)
+
+        batches = self.counters["batches"]
+        return {
+            "uptime": round(uptime, 1),
+            **dict(self.counters),
+            **gauges,
+            "throughput_per_s": round(len(self._finished) / min(self.window, uptime or 1), 3),
+            "mean_batch_size": round(self.counters["batched"] / batches, 2) if batches else None,
+            "latency_s": {"p50": percentile(50), "p90": percentile(90),
+                          "p99": percentile(99), "max": percentile(100)},
+        }
+
+
+# --------------------------
+# 服务
+# --------------------------
+class _Job:
+    __slots__ = ("args", "future", "start")
+
+    def __init__(self, args, future):
+        self.args = args
+        self.future = future
+        self.start = time.perf_counter()
+
+
+class MergeService:
+    """
+    workers：并行处理的进程 (或线程) 数；pool 为 'process' (默认) 或 'thread'。
+    queue_size：排队等待的请求上限，超出时返回 503。
+    batch_size：一个工作进程一次最多取走的请求数。
+    max_body：单个请求正文的上限 (字节)。
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765, workers=None, pool="process",
+                 queue_size=64, batch_size=4, max_body=64 * 1024 * 1024):
+        self.host = host
+        self.port = port
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.pool = pool
+        self.queue_size = queue_size
+        self.batch_size = max(1, batch_size)
+        self.max_body = max_body
+        self.metrics = Metrics()
+        self.in_flight = 0
+        self.queue = None
+        self.executor = None
+        self._server = None
+        self._dispatchers = []
+
+    def _make_executor(self):
+        if self.pool == "process":
+            # 与批量引擎一样用 spawn；多进程模块只在这里导入
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            return ProcessPoolExecutor(max_workers=self.workers,
+                                       mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_warm_worker)
+        return ThreadPoolExecutor(max_workers=self.workers)
+
+    async def start(self):
+        """启动进程池和监听；port 为 0 时由系统分配，实际端口写回 self.port"""
+        self.executor = self._make_executor()
+        self.queue = asyncio.Queue(self.queue_size)
+        self._dispatchers = [asyncio.create_task(self._dispatch())
+                             for _ in range(self.workers)]
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """停止监听，等排队中的请求处理完，再关闭进程池"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        if self.queue is not None:
+            await self.queue.join()
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    async def run(self, stop=None, on_ready=None):
+        """启动并运行到 stop (asyncio.Event) 被置位；on_ready(service) 在开始监听后调用"""
+        await self.start()
+        try:
+            if on_ready:
+                on_ready(self)
+            await (stop.wait() if stop is not None else asyncio.Future())
+        finally:
+            await self.close()
+
+    # ---- 工作进程调度 ----
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            jobs = [await self.queue.get()]
+            # 只取已经在排队的请求凑成一批，不为凑批等待
+            while len(jobs) < self.batch_size and not self.queue.empty():
+                jobs.append(self.queue.get_nowait())
+            self.in_flight += len(jobs)
+            self.metrics.counters["batches"] += 1
+            self.metrics.counters["batched"] += len(jobs)
+            executor = self.executor
+            try:
+                results = await loop.run_in_executor(executor, _merge_batch,
+                                                     [job.args for job in jobs])
+            except BrokenExecutor as e:
+                # 工作进程崩溃 (例如内存不足被杀)：这一批报错，换一个新的进程池。
+                # 同一个坏掉的池会让几个调度任务同时报错，只由第一个替换并关闭它
+                results = [(500, f"工作进程异常退出: {e}")] * len(jobs)
+                if self.executor is executor:
+                    self.metrics.counters["pool_restarts"] += 1
+                    self.executor = self._make_executor()
+                    executor.shutdown(wait=False, cancel_futures=True)
+            except Exception as e:
+                results = [(500, f"{type(e).__name__}: {e}")] * len(jobs)
+            finally:
+                self.in_flight -= len(jobs)
+            for job, result in zip(jobs, results):
+                if not job.future.done():
+                    job.future.set_result(result)
+                self.queue.task_done()
+
+    async def submit(self, data1, data2, options):
+        """排队拼接一组，返回 (状态码, 结果或错误信息)；队列已满时抛出 HTTPError(503)"""
+        job = _Job((data1, data2, options), asyncio.get_running_loop().create_future())
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.metrics.counters["rejected"] += 1
+            raise HTTPError(503, "队列已满，请稍后重试") from None
+        status, result = await job.future
+        self.metrics.finished(status, time.perf_counter() - job.start)
+        return status, result
+
+    # ---- HTTP ----
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader, self.max_body)
+                except HTTPError as e:
+                    # 请求本身读不完整，回复后关闭连接
+                    await self._respond(writer, e.status, {"error": str(e)}, close=True)
+                    break
+                if request is None:
+                    break
+                headers = request[3]
+                connection = headers.get("connection", "").lower()
+                close = (connection == "close" or (headers[":version"] == "HTTP/1.0"
+                                                   and connection != "keep-alive"))
+                status, body, content_type, extra = await self._route(*request)
+                await self._respond(writer, status, body, content_type, extra, close)
+                if close:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, path, query, headers, body):
+        """返回 (状态码, 正文, Content-Type, 额外响应头)"""
+        self.metrics.counters["requests"] += 1
+        try:
+            if path == "/health":
+                return 200, self.health(), None, {}
+            if path == "/metrics":
+                return 200, self.metrics.snapshot(**self.gauges()), None, {}
+            if path != "/merge":
+                raise HTTPError(404, f"没有这个地址: {path}")
+            if method != "POST":
+                raise HTTPError(405, "请用 POST 上传图片")
+
+            fields = parse_multipart(body, headers.get("content-type", ""))
+            if "image1" not in fields or "image2" not in fields:
+                raise HTTPError(400, "缺少 image1 或 image2")
+            options = merge_options(query, fields)
+            status, result = await self.submit(fields["image1"], fields["image2"], options)
+            if status != 200:
+                return status, {"error": result}, None, {}
+            profile = get_profile(options["encoder"])
+            return 200, result, CONTENT_TYPES.get(profile.format, "application/octet-stream"), {}
+        except HTTPError as e:
+            extra = {"Retry-After": "1"} if e.status == 503 else {}
+            return e.status, {"error": str(e)}, None, extra
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}, None, {}
+
+    async def _respond(self, writer, status, body, content_type=None, extra=None, close=False):
+        if not isinstance(body, (bytes, bytearray)):
+            body = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            content_type = "application/json; charset=utf-8"
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+                f"Content-Type: {content_type}",
+                f"Content-Length: {len(body)}",
+                f"Connection: {'close' if close else 'keep-alive'}"]
+        head += [f"{k}: {v}" for k, v in (extra or {}).items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+        writer.write(body)
+        await writer.drain()
+
+    # ---- 状态 ----
+    def gauges(self):
+        return {"queue_depth": self.queue.qsize(), "queue_size": self.queue_size,
+                "in_flight": self.in_flight, "workers": self.workers, "pool": self.pool}
+
+    def health(self):
+        return {"status": "ok", **self.gauges()}
@@ -0,0 +1,242 @@
+import io
+import os
+import sys
+import hashlib
+import threading
+from collections import OrderedDict
+
+from . import instrument
+from .exif import embedded_thumbnail
+
+THUMB_SIZE = 160
+
+
+# --------------------------
+# 缓存目录
+# --------------------------
+def cache_dir():
+    """用户级缓存目录 (Windows: %LOCALAPPDATA%，其他: $XDG_CACHE_HOME 或 ~/.cache)"""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "2PicMerge")
+
+
+# --------------------------
+# 生成缩略图 (尽量不做全尺寸解码)
+# --------------------------
+def _aspect_matches(a, b, tolerance=0.02):
+    """两个尺寸的宽高比是否一致 (有些相机的内嵌缩略图带黑边)"""
+    ra = a[0] / a[1]
+    rb = b[0] / b[1]
+    return abs(ra - rb) <= tolerance * rb
+
+
+def _exif_thumbnail(img, size):
+    """可用的 EXIF 内嵌缩略图：宽高比与原图一致、且不小于目标尺寸"""
+    data = embedded_thumbnail(img.info.get("exif"))
+    if not data:
+        return None, None
+    from PIL import Image
+
+    try:
+        thumb = Image.open(io.BytesIO(data))
+        thumb.load()
+    except Exception:
+        return None, None
+    if max(thumb.size) < size or not _aspect_matches(thumb.size, img.size):
+        return None, None
+    return data, thumb
+
+
+def _reducible(img):
+    """
+    reduce() 不支持 1 / P / I;16 等模式：调色板图转 RGB(A)，1 位图转 L，
+    16 位灰度按高 8 位转 L。其他模式原样返回。
+    """
+    if img.mode in ("P", "PA"):
+        transparent = img.mode == "PA" or "transparency" in img.info
+        return img.convert("RGBA" if transparent else "RGB")
+    if img.mode == "1":
+        return img.convert("L")
+    if img.mode == "I" or img.mode.startswith("I;16"):
+        return img.convert("I").point(lambda v: v / 256).convert("L")
+    return img
+
+
+def _shrink(img, size):
+    """把已打开的图片缩小到 size×size 以内"""
+    if img.format == "JPEG":
+        # 解码器直接输出 1/2、1/4 或 1/8 尺寸，不小于目标尺寸
+        img.draft("RGB", (size, size))
+    img = _reducible(img)
+
+    # 剩余的大倍数缩小先用 reduce() 做整数倍盒式缩小，保留 2 倍余量给最后的重采样
+    factor = max(img.width, img.height) // (size * 2)
+    if factor > 1:
+        img = img.reduce(factor)
+
+    img.thumbnail((size, size))
+    return img
+
+
+def make_thumbnail(path, size=THUMB_SIZE):
+    """返回编码后的缩略图字节 (带透明通道用 PNG，否则 JPEG)"""
+    from PIL import Image
+
+    img = Image.open(path)
+    if img.format == "JPEG":
+        data, thumb = _exif_thumbnail(img, size)
+        if thumb is not None:
+            img.close()
+            if max(thumb.size) == size:
+                # 内嵌缩略图正好合适时直接使用原始字节，连解码都省了
+                return data
+            img = thumb
+    img = _shrink(img, size)
+
+    buf = io.BytesIO()
+    if img.mode in ("RGBA", "LA"):
+        img.save(buf, "PNG")
+    else:
+        img.convert("RGB").save(buf, "JPEG", quality=90)
+    return buf.getvalue()
+
+
+# --------------------------
+# 缩略图缓存：内存 LRU + 磁盘
+# --------------------------
+class ThumbnailCache:
+    """按 (路径, 文件大小, 修改时间, 缩略图尺寸) 缓存缩略图字节，线程安全"""
+
+    def __init__(self, directory=None, size=THUMB_SIZE,
+                 memory_items=1024, disk_bytes=256 * 1024 * 1024):
+        self.directory = directory or os.path.join(cache_dir(), "thumbs")
+        self.size = size
+        self.memory_items = memory_items
+        self.disk_bytes = disk_bytes
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_usage = None  # 首次写入时再统计
+
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+    def key(self, path):
+        st = os.stat(path)
+        raw = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}|{self.size}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _disk_path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".thumb")
+
+    def get(self, path):
+        """返回缩略图字节；依次查内存、磁盘，都没有时生成并写入两级缓存"""
+        key = self.key(path)
+
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self.hits_memory += 1
+        if data is not None:
+            instrument.count("thumbs.hit")
+            return data
+
+        data = self._read_disk(key)
+        if data is not None:
+            with self._lock:
+                self.hits_disk += 1
+            instrument.count("thumbs.hit")
+            instrument.count("thumbs.disk_hit")
+        else:
+            with instrument.stage("thumbs.make"):
+                data = make_thumbnail(path, self.size)
+            with self._lock:
+                self.misses += 1
+            instrument.count("thumbs.miss")
+            self._write_disk(key, data)
+
+        self._remember(key, data)
+        return data
+
+    def _remember(self, key, data):
+        with self._lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def _read_disk(self, key):
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # 更新修改时间，淘汰时按最近使用排序
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def _write_disk(self, key, data):
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再替换，避免其他线程/进程读到半个文件
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except OSError:
+            return
+
+        with self._lock:
+            if self._disk_usage is None:
+                self._disk_usage = sum(size for _, size, _ in self._scan_disk())
+            else:
+                self._disk_usage += len(data)
+            over = self._disk_usage > self.disk_bytes
+        if over:
+            self._evict_disk()
+
+    def _scan_disk(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith(".thumb"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_size, st.st_mtime
+
+    def _evict_disk(self):
+        """超出容量时删除最久未使用的文件，直到低于上限的 90%"""
+        with self._lock:
+            entries = sorted(self._scan_disk(), key=lambda e: e[2])
+            usage = sum(size for _, size, _ in entries)
+            target = self.disk_bytes * 0.9
+            for path, size, _ in entries:
+                if usage <= target:
+                    break
+                try:
+                    os.remove(path)
+                    usage -= size
+                except OSError:
+                    pass
+            self._disk_usage = usage
+
+    def clear_memory(self):
+        with self._lock:
+            self._memory.clear()
+
+    def stats(self):
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+        }
@@ -0,0 +1,307 @@
+"""
+热文件夹：监视文件夹，新图片写完后自动配对并拼接 (python -m twopicmerge watch)。
+
+沿用批量模式的目录结构和配对规则：按拍摄时间或文件名排序后两两配对，
+结果写入 result/，源图移到 processed/ (或 keep_sources 时留在原处)。
+Linux 上用 inotify 等待目录变化，其他平台定时检查目录的修改时间；没有新文件时几乎不占 CPU。
+"""
+import os
+import sys
+import time
+import select
+import threading
+from collections import deque
+
+from .batch import make_executor, make_pairs, output_name_for, process_pair
+from .derivatives import derivative_key, resolve_derivatives
+from .encoders import get_profile
+from .manifest import BatchManifest, fingerprint
+from .merge import canvas_pool
+from .metadata import MetadataIndex
+from .scan import FolderIndex, prepare_folders, sort_files
+
+# 文件大小和修改时间保持这么久 (秒) 不变才认为写完
+DEFAULT_SETTLE = 1.0
+# 不支持 inotify 时检查目录的间隔 (秒)
+DEFAULT_POLL_INTERVAL = 1.0
+
+# inotify 事件 (<sys/inotify.h>)：新建、写完关闭、移入/移出、删除
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+
+# --------------------------
+# 目录变化通知
+# --------------------------
+def _open_inotify(folder):
+    """监视 folder 的 inotify 文件描述符；不是 Linux 或调用失败时返回 None"""
+    if not sys.platform.startswith("linux"):
+        return None
+    import ctypes
+
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    mask = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+    if libc.inotify_add_watch(fd, os.fsencode(folder), mask) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+class FolderWatcher:
+    """
+    wait(timeout) 阻塞到目录有变化、被 wake() 唤醒或超时，返回目录是否 (可能) 有变化。
+    wake() 可在其他线程调用 (例如任务完成的回调)。
+    """
+
+    def __init__(self, folder, poll_interval=DEFAULT_POLL_INTERVAL, use_inotify=True):
+        self.folder = folder
+        self.poll_interval = poll_interval
+        self._fd = _open_inotify(folder) if use_inotify else None
+        if self._fd is not None:
+            self._wake_r, self._wake_w = os.pipe()
+            os.set_blocking(self._wake_r, False)
+            os.set_blocking(self._wake_w, False)
+        else:
+            self._wake = threading.Event()
+            self._mtime = self._dir_mtime()
+
+    @property
+    def mode(self):
+        return "inotify" if self._fd is not None else "poll"
+
+    def _dir_mtime(self):
+        try:
+            return os.stat(self.folder).st_mtime_ns
+        except OSError:
+            return None
+
+    def wake(self):
+        if self._fd is not None:
+            try:
+                os.write(self._wake_w, b"x")
+            except BlockingIOError:
+                pass  # 管道已满，说明已经有未处理的唤醒
+        else:
+            self._wake.set()
+
+    def wait(self, timeout=None):
+        if self._fd is not None:
+            readable, _, _ = select.select([self._fd, self._wake_r], [], [], timeout)
+            for fd in readable:
+                _drain(fd)
+            return self._fd in readable
+
+        # 轮询：只 stat 目录本身，新建/删除/改名文件都会改变它的修改时间
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            step = self.poll_interval
+            if deadline is not None:
+                step = min(step, max(0.0, deadline - time.monotonic()))
+            woken = self._wake.wait(step)
+            self._wake.clear()
+            mtime = self._dir_mtime()
+            if mtime != self._mtime:
+                self._mtime = mtime
+                return True
+            if woken or (deadline is not None and time.monotonic() >= deadline):
+                return False
+
+    def close(self):
+        if self._fd is not None:
+            for fd in (self._fd, self._wake_r, self._wake_w):
+                os.close(fd)
+            self._fd = None
+
+
+def _drain(fd):
+    try:
+        while os.read(fd, 65536):
+            pass
+    except BlockingIOError:
+        pass
+
+
+# --------------------------
+# 热文件夹
+# --------------------------
+class HotFolder:
+    """
+    持续处理 folder 中新出现的图片，直到 stop() 被调用。
+    新文件的大小和修改时间保持 settle 秒不变才算写完；只在没有还在写的文件时配对，
+    这样晚写完的照片不会和别的照片错配。配好的组立即提交到常驻的进程池 (或线程池)。
+    on_event(事件名, **字段) 汇报 watching / merged / failed / skipped 等事件。
+    拼接失败的图片在文件内容变化之前不再重试。
+    """
+
+    def __init__(self, folder, direction='horizontal', sort_by='time', workers=None,
+                 pool='process', merge_options=None, keep_sources=False,
+                 settle=DEFAULT_SETTLE, poll_interval=DEFAULT_POLL_INTERVAL,
+                 on_event=None, use_inotify=True):
+        self.folder = folder
+        self.direction = direction
+        self.sort_by = sort_by
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.pool = pool
+        self.merge_options = dict(merge_options or {})
+        self.encoder = get_profile(self.merge_options.get("encoder"))
+        self.merge_options["derivatives"] = resolve_derivatives(
+            self.merge_options.get("derivatives"))
+        self.derivatives = derivative_key(self.merge_options["derivatives"])
+        self.keep_sources = keep_sources
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.on_event = on_event or (lambda event, **fields: None)
+        self.use_inotify = use_inotify
+        self.merged = self.failed = 0
+        self._stop = threading.Event()
+        self._watcher = None
+
+    def stop(self):
+        """停止监视；正在拼接的组会完成"""
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.wake()
+
+    def run(self):
+        """阻塞运行到 stop()，返回 (成功数, 失败数)"""
+        processed_folder, result_folder = prepare_folders(self.folder)
+        manifest = BatchManifest(result_folder)
+        for pair in manifest.recover(self.folder, processed_folder):
+            self.on_event("recovered", inputs=list(pair))
+        index = FolderIndex(self.folder, processed_folder, result_folder)
+        metadata = MetadataIndex(self.folder)
+        self._watcher = watcher = FolderWatcher(self.folder, self.poll_interval,
+                                                self.use_inotify)
+        if self._stop.is_set():
+            watcher.wake()
+
+        settling = {}     # 文件名 -> ((大小, mtime_ns), 首次看到这个状态的时间)
+        ready = {}        # 已写完、等待配对的文件名 -> os.stat_result
+        busy = {}         # 已提交的组 -> 输入文件标识
+        skip = {}         # 不再处理的文件名 (失败或 keep_sources 时已完成) -> 文件标识
+        finished = deque()
+
+        self.on_event("watching", folder=self.folder, mode=watcher.mode,
+                      workers=self.workers, pending=len(index.pending()))
+        executor = make_executor(self.pool, self.workers)
+        try:
+            timeout = 0
+            while not self._stop.is_set():
+                # 只监视主文件夹：有变化时只重新列出它；processed/ 和 result/ 只有
+                # 这里完成的组会写入，由 _finish() 直接记入索引
+                if watcher.wait(timeout):
+                    index.refresh([self.folder])
+                if self._stop.is_set():
+                    break
+                while finished:
+                    self._finish(finished.popleft(), busy, skip, manifest, index)
+
+                now = time.monotonic()
+                in_pairs = {name for future in busy for name in future.pair}
+                for name in index.pending():
+                    if name in in_pairs or name in ready:
+                        continue
+                    path = os.path.join(self.folder, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    state = (st.st_size, st.st_mtime_ns)
+                    if skip.get(name) == list(state):
+                        continue
+                    skip.pop(name, None)
+                    seen = settling.get(name)
+                    if seen is None or seen[0] != state:
+                        settling[name] = (state, now)
+                    elif now - seen[1] >= self.settle:
+                        del settling[name]
+                        ready[name] = st
+                # 被删除或移走的文件
+                pending = set(index.pending())
+                for table in (settling, ready):
+                    for name in [n for n in table if n not in pending]:
+                        del table[name]
+
+                if not settling and len(ready) >= 2:
+                    self._submit_pairs(executor, ready, busy, skip, manifest, metadata,
+                                       processed_folder, result_folder,
+                                       lambda f: (finished.append(f), watcher.wake()))
+
+                # 还有文件在写时到下一次检查为止醒来，否则一直等到目录变化或任务完成
+                timeout = None
+                if settling:
+                    oldest = min(since for _, since in settling.values())
+                    timeout = max(0.05, self.settle - (time.monotonic() - oldest))
+        finally:
+            # 正在处理的组照常完成并记入日志
+            executor.shutdown(wait=True)
+            while busy:
+                for future in list(busy):
+                    self._finish(future, busy, skip, manifest, index)
+            watcher.close()
+            self._watcher = None
+            canvas_pool.clear()
+            metadata.close()
+            manifest.close()
+        return self.merged, self.failed
+
+    def _submit_pairs(self, executor, ready, busy, skip, manifest, metadata,
+                      processed_folder, result_folder, on_done):
+        names = sort_files(self.folder, list(ready), self.sort_by, index=metadata,
+                           stats=ready)
+        for pair in make_pairs(names):
+            for name in pair:
+                del ready[name]
+            sources = [fingerprint(os.path.join(self.folder, name)) for name in pair]
+            if manifest.is_current(pair, sources, self.direction, self.encoder.name,
+                                   self.derivatives):
+                # keep_sources 模式下上次已经拼好的组
+                for name, source in zip(pair, sources):
+                    skip[name] = source
+                self.on_event("skipped", inputs=list(pair))
+                continue
+            manifest.started(pair, sources, output_name_for(*pair, self.encoder.extension),
+                             self.direction, self.keep_sources, self.encoder.name,
+                             self.derivatives)
+            future = executor.submit(process_pair, self.folder, processed_folder,
+                                     result_folder, pair[0], pair[1], self.direction,
+                                     self.merge_options, self.keep_sources)
+            future.pair, future.sources, future.start = pair, sources, time.monotonic()
+            busy[future] = sources
+            future.add_done_callback(on_done)
+
+    def _finish(self, future, busy, skip, manifest, index):
+        if busy.pop(future, None) is None:
+            return
+        pair = future.pair
+        try:
+            output_name = future.result()
+        except Exception as e:
+            self.failed += 1
+            manifest.finished(pair, "failed", str(e))
+            # 文件内容变化之前不再重试
+            for name, source in zip(pair, future.sources):
+                skip[name] = source
+            self.on_event("failed", inputs=list(pair), error=str(e))
+            return
+        self.merged += 1
+        manifest.finished(pair)
+        index.add_done(index.result_folder, [output_name])
+        if self.keep_sources:
+            for name, source in zip(pair, future.sources):
+                skip[name] = source
+        else:
+            index.add_done(index.processed_folder, pair)
+        self.on_event("merged", inputs=list(pair), output=output_name,
+                      seconds=round(time.monotonic() - future.start, 3))